@@ -0,0 +1,123 @@
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from schedule import to_timestamp, from_timestamp
+
+# --- Columnar Stage History Archive ---
+# Old stage_history rows are moved into a compact file with two columns:
+# packed int64 timestamps (seconds since 1970-01-01, naive local time, matching
+# the TEXT timestamps in the DB) followed by one byte per stage.
+#
+# Layout: MAGIC | version (u16) | count (u32) | timestamps (count * i64) | stages (count * u8)
+
+MAGIC = b"LSHA"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+EPOCH = datetime(1970, 1, 1)
+
+def to_epoch(timestamp):
+    return int((from_timestamp(timestamp) - EPOCH).total_seconds())
+
+def from_epoch(seconds):
+    return to_timestamp(EPOCH + timedelta(seconds=seconds))
+
+class StageArchive:
+    def __init__(self, path):
+        self.path = path
+        self.timestamps = array("q")
+        self.stages = array("B")
+        self._loaded_sig = None
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        """(Re)reads the file if it changed on disk since the last load."""
+        sig = self._signature()
+        if sig == self._loaded_sig:
+            return self
+        self.timestamps = array("q")
+        self.stages = array("B")
+        if sig is not None:
+            with open(self.path, "rb") as f:
+                magic, version, count = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC or version != VERSION:
+                    raise ValueError(f"Unrecognised stage archive: {self.path}")
+                self.timestamps.fromfile(f, count)
+                self.stages.fromfile(f, count)
+        self._loaded_sig = sig
+        return self
+
+    def __len__(self):
+        return len(self.load().timestamps)
+
+    def last(self):
+        """Returns (epoch_seconds, stage) of the newest archived row, or None."""
+        self.load()
+        if not self.timestamps:
+            return None
+        return self.timestamps[-1], self.stages[-1]
+
+    def append(self, rows):
+        """Adds (timestamp_str, stage) rows and rewrites the file atomically. Rows may predate the archive's tail."""
+        self.load()
+        timestamps = array("q", self.timestamps)
+        stages = array("B", self.stages)
+        in_order = True
+        for timestamp, stage in rows:
+            epoch = to_epoch(timestamp)
+            if timestamps and epoch < timestamps[-1]:
+                in_order = False
+            timestamps.append(epoch)
+            stages.append(stage)
+        if not in_order:
+            # Backfilled history: stable sort keeps same-second rows in insertion order
+            pairs = sorted(zip(timestamps, stages), key=lambda pair: pair[0])
+            timestamps = array("q", (t for t, _ in pairs))
+            stages = array("B", (st for _, st in pairs))
+        self._write(timestamps, stages)
+
+    def truncate(self, count):
+        """Drops everything after the first count rows (used to undo a half-finished compaction)."""
+        self.load()
+        self._write(self.timestamps[:count], self.stages[:count])
+
+    def _write(self, timestamps, stages):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(timestamps)))
+            timestamps.tofile(f)
+            stages.tofile(f)
+        os.replace(tmp_path, self.path)
+        self.timestamps, self.stages = timestamps, stages
+        self._loaded_sig = self._signature()
+
+    def row_before(self, timestamp):
+        """Newest (timestamp_str, stage) strictly before the given timestamp, or None."""
+        self.load()
+        i = bisect_left(self.timestamps, to_epoch(timestamp))
+        return (from_epoch(self.timestamps[i - 1]), self.stages[i - 1]) if i else None
+
+    def rows(self, start=None, end=None):
+        """Yields (timestamp_str, stage) rows with start <= timestamp <= end."""
+        self.load()
+        lo = bisect_left(self.timestamps, to_epoch(start)) if start else 0
+        hi = bisect_right(self.timestamps, to_epoch(end)) if end else len(self.timestamps)
+        for i in range(lo, hi):
+            yield from_epoch(self.timestamps[i]), self.stages[i]
+
+    def summary(self, start, end):
+        """(min_stage, max_stage) over rows with start <= timestamp < end, or None if there are none."""
+        self.load()
+        lo = bisect_left(self.timestamps, to_epoch(start))
+        hi = bisect_left(self.timestamps, to_epoch(end))
+        if lo >= hi:
+            return None
+        stages = self.stages[lo:hi] # Slice of a byte array: min/max run in C
+        return min(stages), max(stages)
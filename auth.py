@@ -0,0 +1,90 @@
+import hmac
+import os
+import time
+from hashlib import pbkdf2_hmac, sha256
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Password Hashing ---
+# Hashes are stored as "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>".
+# Older accounts still hold an unsalted SHA-256 hex digest; those verify once
+# and are upgraded by the caller (see verify_password's needs_upgrade).
+
+ALGORITHM = "pbkdf2_sha256"
+DEFAULT_KDF_ITERATIONS = 600000
+SALT_BYTES = 16
+
+# pbkdf2_hmac releases the GIL, so a small thread pool keeps the Tk loop free
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="auth")
+
+def hash_password(password, iterations=DEFAULT_KDF_ITERATIONS):
+    salt = os.urandom(SALT_BYTES)
+    digest = pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+def _legacy_hash(password):
+    return sha256(password.encode()).hexdigest()
+
+def verify_password(password, stored, iterations=DEFAULT_KDF_ITERATIONS):
+    """Returns (ok, needs_upgrade); legacy and under-cost hashes need an upgrade."""
+    if not stored:
+        return False, False
+    if not stored.startswith(ALGORITHM + "$"):
+        return hmac.compare_digest(_legacy_hash(password), stored), True
+    try:
+        _, stored_iterations, salt_hex, digest_hex = stored.split("$")
+        stored_iterations = int(stored_iterations)
+        digest = pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt_hex), stored_iterations)
+    except ValueError:
+        return False, False
+    return hmac.compare_digest(digest.hex(), digest_hex), stored_iterations < iterations
+
+def verify_missing_user(password, iterations=DEFAULT_KDF_ITERATIONS):
+    # Same work as a real check, so unknown usernames cannot be told apart by timing
+    pbkdf2_hmac("sha256", password.encode(), b"\0" * SALT_BYTES, iterations)
+    return False, False
+
+def submit(fn, *args):
+    return _pool.submit(fn, *args)
+
+def when_done(widget, future, callback, on_error=None, poll_ms=25):
+    """Calls callback(result) on the Tk thread once future finishes (on_error(exception) if it raised), without blocking the loop."""
+    if not future.done():
+        widget.after(poll_ms, lambda: when_done(widget, future, callback, on_error, poll_ms))
+        return
+    error = future.exception()
+    if error is None:
+        callback(future.result())
+    elif on_error is not None:
+        on_error(error)
+    else:
+        print(f"Background task failed: {error}")
+
+# --- Session Cache ---
+
+class SessionCache:
+    """Short-lived cache of user rows so dashboard refreshes skip the users table."""
+    def __init__(self, ttl_seconds=60):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires, user = entry
+        if time.monotonic() > expires:
+            del self._entries[user_id]
+            return None
+        return user
+
+    def put(self, user_id, user):
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._entries)
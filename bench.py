@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# --- Benchmarks ---
+# Each case runs in a fresh subprocess against a throwaway database so peak RSS
+# is measured per path. Usage: python bench.py ingest [--rows N] > bench_output.txt
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+        except ImportError:
+            return None
+
+def write_schedule_csv(path, rows):
+    areas = ["Sandton", "Soweto", "Johannesburg", "Midrand", "Pretoria", "Centurion", "Benoni", "Boksburg"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("area,time_slot\n")
+        for i in range(rows):
+            start = (i * 7) % 22
+            f.write(f"{areas[i % len(areas)]},{start:02d}:00 - {start + 2:02d}:00\n")
+
+def run_case(case, csv_path):
+    """Runs inside the child process (cwd is a temp dir, so the DB is throwaway)."""
+    sys.path.insert(0, PROJECT_DIR)
+    import database
+    database.bootstrap()
+    importer = {"csv": database.import_csv_to_db, "mmap": database.import_csv_to_db_mmap}[case]
+    baseline_rss = peak_rss_mb()
+    started = time.perf_counter()
+    importer(csv_path)
+    elapsed = time.perf_counter() - started
+    database.cursor.execute("SELECT COUNT(*) FROM schedules")
+    rows = database.cursor.fetchone()[0]
+    print(json.dumps({"case": case, "rows": rows, "seconds": elapsed, "baseline_rss_mb": baseline_rss, "peak_rss_mb": peak_rss_mb()}))
+
+def bench_ingest(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "schedule.csv")
+        write_schedule_csv(csv_path, args.rows)
+        size_mb = os.path.getsize(csv_path) / (1024 * 1024)
+        print(f"Schedule ingestion: {args.rows} rows, {size_mb:.1f} MB")
+        print(f"{'path':<6} {'rows/sec':>12} {'seconds':>9} {'peak RSS MB':>12}")
+        for case in ("csv", "mmap"):
+            case_dir = os.path.join(tmp, case)
+            os.makedirs(case_dir)
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "_case", case, csv_path],
+                cwd=case_dir, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            peak = f"{result['peak_rss_mb']:.1f}" if result["peak_rss_mb"] is not None else "n/a"
+            print(f"{case:<6} {result['rows'] / result['seconds']:>12,.0f} {result['seconds']:>9.2f} {peak:>12}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load Shedding Tracker benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="Compare csv.DictReader and memory-mapped schedule ingestion")
+    p.add_argument("--rows", type=int, default=500000)
+    p.set_defaults(func=bench_ingest)
+
+    p = sub.add_parser("_case") # Internal: one measured run in a child process
+    p.add_argument("case")
+    p.add_argument("csv_path")
+    p.set_defaults(func=lambda args: run_case(args.case, args.csv_path))
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
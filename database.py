@@ -1,13 +1,47 @@
 import sqlite3
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date, time
 import csv
-from hashlib import sha256
+import heapq
+from collections import Counter
+import threading
+from time import perf_counter
+import auth
+from schedule import NO_SCHEDULE, compile_slots, daily_outage_minutes, normalize_slot, to_timestamp, from_timestamp
+from archive import StageArchive
+from ingest import ScheduleReader
+from snapshot import ScheduleSnapshot, write_snapshot
 
 # --- Database Setup ---
-conn = sqlite3.connect("load_shedding.db")
+DB_PATH = "load_shedding.db"
+# Bump when the schema changes; stored in PRAGMA user_version and checked by the schedule snapshot
+SCHEMA_VERSION = 1
+
+conn = sqlite3.connect(DB_PATH)
 cursor = conn.cursor()
 
+# Compiled schedules, memory-mapped at startup (see open_schedule_snapshot)
+SNAPSHOT_PATH = "schedules.snapshot"
+schedule_snapshot = None
+_snapshot_lock = threading.Lock()
+_snapshot_epoch = 0 # Bumped by every import in this process
+
+# Stage history older than the retention window lives here (see compact_stage_history)
+stage_archive = StageArchive("stage_history.archive")
+DEFAULT_HISTORY_RETENTION_DAYS = 90
+# Stage writes closer together than this are grouped into one commit
+DEFAULT_STAGE_COMMIT_INTERVAL_MS = 250
+
+# Change feed (see ChangeFeed): rows written by this process carry CHANGE_ORIGIN
+CHANGE_ORIGIN = os.urandom(8).hex()
+DEFAULT_CHANGE_POLL_MS = 250
+CHANGE_LOG_KEEP = 1000
+# Imports touching more areas than this log one "all schedules" change instead
+SCHEDULE_CHANGE_FANOUT = 100
+
+# effective_from of the first schedule ever loaded: it applies to all earlier history
+SCHEDULE_EPOCH = "0001-01-01 00:00:00"
+
 def init_db():
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS users (
@@ -55,6 +89,80 @@ def init_db():
         FOREIGN KEY(user_id) REFERENCES users(id)
     )
     """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_locations_area ON user_locations(area)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_locations_user ON user_locations(user_id)")
+    # Covers range reads of the stage timeline (history queries, chart buckets)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stage_history_timestamp ON stage_history(timestamp, stage)")
+
+    # Area catalog (loaded from areas.csv, see sync_area_catalog)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS areas (
+        id INTEGER PRIMARY KEY,
+        province TEXT,
+        municipality TEXT,
+        name TEXT COLLATE NOCASE,
+        UNIQUE (province, municipality, name)
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_areas_name ON areas(name)")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS area_trigrams (
+        trigram TEXT,
+        area_id INTEGER,
+        PRIMARY KEY (trigram, area_id)
+    ) WITHOUT ROWID
+    """)
+
+    # Change feed read by other instances sharing this database file
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT,
+        subject TEXT,
+        origin TEXT
+    )
+    """)
+
+    # Every schedule an area has had, keyed by when it took effect (see get_schedule_at)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schedule_versions (
+        area TEXT,
+        effective_from TEXT,
+        slots TEXT,
+        PRIMARY KEY (area, effective_from)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_schedule_versions_effective ON schedule_versions(effective_from)")
+
+    # Stage planner inputs, kept current by imports and location edits (see sync_area_impact)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS area_impact (
+        area TEXT PRIMARY KEY,
+        daily_minutes INTEGER,
+        users INTEGER
+    )
+    """)
+
+    # Materialized analytics: the stage in effect per day, and per-area outage minutes
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS daily_stage (
+        date TEXT PRIMARY KEY,
+        end_stage INTEGER,
+        max_stage INTEGER
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS outage_rollup (
+        area TEXT,
+        date TEXT,
+        outage_minutes INTEGER,
+        max_stage INTEGER,
+        PRIMARY KEY (area, date)
+    )
+    """)
     
     # Migrations
     try:
@@ -91,6 +199,8 @@ def init_db():
     except Exception as e:
         print(f"Migration error: {e}")
     
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
     # Seed Settings & History
     cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('current_stage', '0')")
     
@@ -111,22 +221,44 @@ def init_db():
 
     conn.commit()
 
-init_db()
-
 # --- Helper DB Functions ---
 
+def get_kdf_iterations():
+    return int(get_setting('kdf_iterations', auth.DEFAULT_KDF_ITERATIONS))
+
 def hash_password(password):
-    return sha256(password.encode()).hexdigest()
+    """Salted, slow KDF hash. Blocks for the configured cost; UI code should run it via auth.submit."""
+    return auth.hash_password(password, get_kdf_iterations())
+
+# Cached user rows (see get_user); invalidated whenever a user row changes
+user_cache = auth.SessionCache()
+
+def get_user(user_id):
+    user = user_cache.get(user_id)
+    if user is None:
+        cursor.execute("SELECT * FROM users WHERE id=?", (user_id,))
+        user = cursor.fetchone()
+        if user:
+            user_cache.put(user_id, user)
+    return user
+
+def get_user_by_username(username):
+    # username is UNIQUE, so this is an index lookup
+    cursor.execute("SELECT * FROM users WHERE username=?", (username,))
+    return cursor.fetchone()
+
+def set_user_password_hash(user_id, password_hash):
+    cursor.execute("UPDATE users SET password=? WHERE id=?", (password_hash, user_id))
+    record_change("user", user_id)
+    conn.commit()
+    user_cache.invalidate(user_id)
 
 def get_current_stage():
     val = get_setting('current_stage')
     return int(val) if val else 0
 
 def set_current_stage(stage):
-    set_setting('current_stage', str(stage))
-    # Log to history
-    cursor.execute("INSERT INTO stage_history (timestamp, stage) VALUES (?, ?)", (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), stage))
-    conn.commit()
+    stage_writer.write(stage)
 
 def get_setting(key, default=None):
     cursor.execute("SELECT value FROM settings WHERE key=?", (key,))
@@ -138,26 +270,255 @@ def set_setting(key, value):
     conn.commit()
 
 def load_schedule_from_db(area):
+    snapshot = schedule_snapshot
+    if snapshot is not None:
+        return snapshot.slots(area) or [NO_SCHEDULE]
     cursor.execute("SELECT time_slot FROM schedules WHERE area=?", (area,))
     rows = cursor.fetchall()
     if rows:
         return [row[0] for row in rows]
-    return ["No schedule available for this area"]
+    return [NO_SCHEDULE]
+
+def get_compiled_schedule(area):
+    """Sorted (start_minute, end_minute) pairs for an area, straight from the snapshot when available."""
+    snapshot = schedule_snapshot
+    if snapshot is not None:
+        return sorted(snapshot.compiled(area))
+    return compile_slots(load_schedule_from_db(area))
+
+def load_schedules_for_areas(areas):
+    """{area: [time_slot, ...]} for several areas at once: the snapshot when loaded, else one IN query."""
+    areas = list(dict.fromkeys(areas))
+    snapshot = schedule_snapshot
+    if snapshot is not None:
+        return {area: snapshot.slots(area) or [NO_SCHEDULE] for area in areas}
+    slots = {area: [] for area in areas}
+    if areas:
+        placeholders = ",".join("?" * len(areas))
+        cursor.execute(f"SELECT area, time_slot FROM schedules WHERE area IN ({placeholders}) ORDER BY id", areas)
+        for area, slot in cursor.fetchall():
+            slots[area].append(slot)
+    return {area: area_slots or [NO_SCHEDULE] for area, area_slots in slots.items()}
+
+def load_all_schedules():
+    """Returns {area: [time_slot, ...]} for every scheduled area."""
+    cursor.execute("SELECT area, time_slot FROM schedules ORDER BY id")
+    slots = {}
+    for area, slot in cursor.fetchall():
+        slots.setdefault(area, []).append(slot)
+    return slots
+
+def get_schedule_generation():
+    """Bumped on every schedule import; caches keyed on it invalidate themselves."""
+    return int(get_setting('schedule_generation', 0))
+
+def get_user_counts_by_area(areas=None):
+    if areas is None:
+        cursor.execute("SELECT area, COUNT(DISTINCT user_id) FROM user_locations GROUP BY area")
+    else:
+        areas = list(areas)
+        placeholders = ",".join("?" * len(areas))
+        cursor.execute(f"SELECT area, COUNT(DISTINCT user_id) FROM user_locations WHERE area IN ({placeholders}) GROUP BY area", areas)
+    return dict(cursor.fetchall())
 
 def import_csv_to_db(file_path):
+    def insert_rows():
+        with open(file_path, newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                # Stored in the same form as the mmap import writes them
+                cursor.execute("INSERT INTO schedules (area, time_slot) VALUES (?, ?)", (row["area"].strip(), normalize_slot(row["time_slot"])))
+    _replace_schedules(insert_rows)
+
+def import_csv_to_db_mmap(file_path):
+    """Same result as import_csv_to_db, parsed from a memory-mapped file and inserted in batches."""
+    def insert_rows():
+        # Daily totals come straight from the parsed minute offsets, no re-query
+        reader = ScheduleReader(file_path)
+        for batch in reader.rows():
+            cursor.executemany("INSERT INTO schedules (area, time_slot) VALUES (?, ?)", batch)
+        return reader.daily_minutes()
+    _replace_schedules(insert_rows)
+
+def _replace_schedules(insert_rows):
+    stage_writer.flush() # Close any grouped stage transaction first
     try:
         conn.execute("BEGIN TRANSACTION")
+        # The first schedule ever loaded applies to all earlier history; later ones from now on
+        cursor.execute("SELECT 1 FROM schedule_versions LIMIT 1")
+        effective_from = to_timestamp(datetime.now()) if cursor.fetchone() else SCHEDULE_EPOCH
+        old_slots = load_all_schedules()
         cursor.execute("DELETE FROM schedules") # Full replace
         
-        with open(file_path, newline="", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                cursor.execute("INSERT INTO schedules (area, time_slot) VALUES (?, ?)", (row["area"], row["time_slot"]))
+        new_minutes = insert_rows()
+        new_slots = load_all_schedules()
+        
+        old_minutes = {area: daily_outage_minutes(slots) for area, slots in old_slots.items()}
+        if new_minutes is None:
+            new_minutes = {area: daily_outage_minutes(slots) for area, slots in new_slots.items()}
+        _update_rollup_for_schedule(old_minutes, new_minutes, effective_from[:10])
+        _update_impact_for_schedule(old_minutes, new_minutes)
+        cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('schedule_generation', ?)", (str(get_schedule_generation() + 1),))
         
+        # Compared parsed, so rows stored before slots were normalized do not count as changes
+        changed = [area for area in set(old_slots) | set(new_slots) if compile_slots(old_slots.get(area, [])) != compile_slots(new_slots.get(area, []))]
+        _record_schedule_versions(changed, new_slots, effective_from)
+        if len(changed) > SCHEDULE_CHANGE_FANOUT:
+            record_change("schedule")
+        else:
+            for area in changed:
+                record_change("schedule", area)
         conn.commit()
     except Exception as e:
         conn.rollback()
         raise e
+    _write_schedule_snapshot(get_schedule_generation(), new_slots)
+
+# --- Schedule Versions ---
+# schedule_versions keeps each schedule an area has had and when it took effect.
+# Imports add rows only for areas whose slots changed (an empty slot list marks
+# an area being dropped), so versions are per-area deltas. The schedules table
+# still holds the current version; these rows answer "what applied at time T".
+
+def _record_schedule_versions(areas, area_slots, effective_from):
+    """Caller commits."""
+    cursor.executemany(
+        "INSERT OR REPLACE INTO schedule_versions (area, effective_from, slots) VALUES (?, ?, ?)",
+        [(area, effective_from, "\n".join(area_slots.get(area, []))) for area in areas]
+    )
+
+def _unpack_slots(packed):
+    return packed.split("\n") if packed else []
+
+def sync_schedule_versions():
+    """Seeds versioning from the current schedules on databases that predate it."""
+    cursor.execute("SELECT 1 FROM schedule_versions LIMIT 1")
+    if cursor.fetchone() is None:
+        area_slots = load_all_schedules()
+        if area_slots:
+            _record_schedule_versions(area_slots, area_slots, SCHEDULE_EPOCH)
+            conn.commit()
+
+def get_schedule_at(area, timestamp):
+    """Slots of `area` in effect at `timestamp` ([] if none): one primary-key seek, however many versions exist."""
+    cursor.execute(
+        "SELECT slots FROM schedule_versions WHERE area=? AND effective_from <= ? ORDER BY effective_from DESC LIMIT 1",
+        (area, timestamp)
+    )
+    row = cursor.fetchone()
+    return _unpack_slots(row[0]) if row else []
+
+def get_schedules_at(timestamp):
+    """{area: slots} for every area with a schedule in effect at `timestamp`."""
+    cursor.execute(
+        """SELECT v.area, v.slots FROM schedule_versions v
+           JOIN (SELECT area, MAX(effective_from) AS effective_from FROM schedule_versions
+                 WHERE effective_from <= ? GROUP BY area) latest
+           ON v.area = latest.area AND v.effective_from = latest.effective_from""",
+        (timestamp,)
+    )
+    return {area: _unpack_slots(slots) for area, slots in cursor.fetchall() if slots}
+
+def get_schedule_version_at(timestamp):
+    """effective_from of the newest version (of any area) in effect at `timestamp`, or None."""
+    cursor.execute("SELECT MAX(effective_from) FROM schedule_versions WHERE effective_from <= ?", (timestamp,))
+    return cursor.fetchone()[0]
+
+def get_last_schedule_change():
+    cursor.execute("SELECT MAX(effective_from) FROM schedule_versions")
+    return cursor.fetchone()[0]
+
+def get_schedule_changes(start, end, area=None):
+    """[(effective_from, area, slots)] for versions taking effect in (start, end], oldest first."""
+    if area is None:
+        cursor.execute(
+            "SELECT effective_from, area, slots FROM schedule_versions WHERE effective_from > ? AND effective_from <= ? ORDER BY effective_from, area",
+            (start, end)
+        )
+    else:
+        cursor.execute(
+            "SELECT effective_from, area, slots FROM schedule_versions WHERE area=? AND effective_from > ? AND effective_from <= ? ORDER BY effective_from",
+            (area, start, end)
+        )
+    return [(effective_from, area, _unpack_slots(slots)) for effective_from, area, slots in cursor.fetchall()]
+
+# --- Schedule Snapshot ---
+
+def _write_schedule_snapshot(generation, area_slots, epoch=None):
+    global schedule_snapshot, _snapshot_epoch
+    with _snapshot_lock:
+        if epoch is None:
+            _snapshot_epoch += 1
+        elif epoch != _snapshot_epoch:
+            return # An import wrote a newer snapshot while we were rebuilding
+        # Windows cannot replace a file that is still mapped
+        if schedule_snapshot is not None:
+            schedule_snapshot.close()
+            schedule_snapshot = None
+        try:
+            write_snapshot(SNAPSHOT_PATH, SCHEMA_VERSION, generation, area_slots)
+            schedule_snapshot = ScheduleSnapshot(SNAPSHOT_PATH)
+        except Exception as e:
+            print(f"Schedule snapshot write failed: {e}")
+
+def read_schedules():
+    """(schedule generation, {area: [time_slot, ...]}) on a connection of its own, so any thread can call it."""
+    # sqlite3 connections are bound to their creating thread
+    bg_conn = sqlite3.connect(DB_PATH)
+    try:
+        bg_conn.execute("BEGIN") # One read transaction so generation and rows agree
+        res = bg_conn.execute("SELECT value FROM settings WHERE key='schedule_generation'").fetchone()
+        area_slots = {}
+        for area, slot in bg_conn.execute("SELECT area, time_slot FROM schedules ORDER BY id"):
+            area_slots.setdefault(area, []).append(slot)
+        bg_conn.rollback()
+    finally:
+        bg_conn.close()
+    return int(res[0]) if res else 0, area_slots
+
+def _rebuild_snapshot_in_background(epoch):
+    try:
+        generation, area_slots = read_schedules()
+        _write_schedule_snapshot(generation, area_slots, epoch)
+    except Exception as e:
+        print(f"Schedule snapshot rebuild failed: {e}")
+
+def open_schedule_snapshot():
+    """Maps the snapshot if it matches the DB; otherwise serves from SQL while rebuilding in the background."""
+    global schedule_snapshot
+    if schedule_snapshot is not None:
+        return # Already written by this process (e.g. the initial CSV migration)
+    try:
+        snapshot = ScheduleSnapshot(SNAPSHOT_PATH)
+    except FileNotFoundError:
+        snapshot = None
+    except Exception as e:
+        print(f"Ignoring unreadable schedule snapshot: {e}")
+        snapshot = None
+
+    if snapshot is not None and snapshot.matches(SCHEMA_VERSION, get_schedule_generation()):
+        schedule_snapshot = snapshot
+        return
+    if snapshot is not None:
+        snapshot.close()
+    threading.Thread(target=_rebuild_snapshot_in_background, args=(_snapshot_epoch,), daemon=True).start()
+
+def reload_schedule_snapshot():
+    """Re-maps the snapshot after another process's import. Returns True once mapped."""
+    global schedule_snapshot
+    with _snapshot_lock:
+        if schedule_snapshot is not None:
+            schedule_snapshot.close()
+            schedule_snapshot = None
+        try:
+            snapshot = ScheduleSnapshot(SNAPSHOT_PATH)
+        except Exception:
+            return False
+        if not snapshot.matches(SCHEMA_VERSION, get_schedule_generation()):
+            snapshot.close()
+            return False
+        schedule_snapshot = snapshot
+        return True
 
 def seed_admin():
     try:
@@ -185,21 +546,34 @@ def add_user_location(user_id, name, province, municipality, area):
         "INSERT INTO user_locations (user_id, name, province, municipality, area) VALUES (?, ?, ?, ?, ?)",
         (user_id, name, province, municipality, area)
     )
+    _refresh_area_users([area])
+    record_change("locations", user_id)
     conn.commit()
 
 def get_user_locations(user_id):
     cursor.execute("SELECT id, name, province, municipality, area FROM user_locations WHERE user_id=?", (user_id,))
     return cursor.fetchall()
 
+def _location_area(location_id, user_id):
+    cursor.execute("SELECT area FROM user_locations WHERE id=? AND user_id=?", (location_id, user_id))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
 def delete_user_location(location_id, user_id):
+    old_area = _location_area(location_id, user_id)
     cursor.execute("DELETE FROM user_locations WHERE id=? AND user_id=?", (location_id, user_id))
+    _refresh_area_users([old_area])
+    record_change("locations", user_id)
     conn.commit()
 
 def update_user_location(location_id, user_id, name, province, municipality, area):
+    old_area = _location_area(location_id, user_id)
     cursor.execute(
         "UPDATE user_locations SET name=?, province=?, municipality=?, area=? WHERE id=? AND user_id=?",
         (name, province, municipality, area, location_id, user_id)
     )
+    _refresh_area_users([old_area, area])
+    record_change("locations", user_id)
     conn.commit()
 
 # --- Admin User Management ---
@@ -207,20 +581,648 @@ def get_all_users():
     cursor.execute("SELECT id, username, role, province, municipality, area FROM users")
     return cursor.fetchall()
 
+# Bulk versions run as one transaction with a single commit, however many users are selected
+
+def _bulk(statements, user_ids, before_commit=None):
+    params = [(uid,) for uid in user_ids]
+    stage_writer.flush()
+    try:
+        for sql, extra in statements:
+            cursor.executemany(sql, [extra + p for p in params])
+        if before_commit:
+            before_commit()
+        cursor.executemany("INSERT INTO changes (kind, subject, origin) VALUES ('user', ?, ?)", [(str(uid), CHANGE_ORIGIN) for uid in user_ids])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for uid in user_ids:
+        user_cache.invalidate(uid)
+
+def delete_users(user_ids):
+    user_ids = list(user_ids)
+    placeholders = ",".join("?" * len(user_ids))
+    cursor.execute(f"SELECT DISTINCT area FROM user_locations WHERE user_id IN ({placeholders})", user_ids)
+    areas = [row[0] for row in cursor.fetchall()]
+    # Cascade delete locations first (uses idx_user_locations_user)
+    _bulk([
+        ("DELETE FROM user_locations WHERE user_id=?", ()),
+        ("DELETE FROM users WHERE id=?", ())
+    ], user_ids, before_commit=lambda: _refresh_area_users(areas))
+
+def update_users_role(user_ids, new_role):
+    _bulk([("UPDATE users SET role=? WHERE id=?", (new_role,))], user_ids)
+
+def set_users_password_hash(user_ids, password_hash):
+    _bulk([("UPDATE users SET password=? WHERE id=?", (password_hash,))], user_ids)
+
 def delete_user(user_id):
-    # Cascade delete locations first
-    cursor.execute("DELETE FROM user_locations WHERE user_id=?", (user_id,))
-    cursor.execute("DELETE FROM users WHERE id=?", (user_id,))
-    conn.commit()
+    delete_users([user_id])
 
 def update_user_role(user_id, new_role):
-    cursor.execute("UPDATE users SET role=? WHERE id=?", (new_role, user_id))
-    conn.commit()
+    update_users_role([user_id], new_role)
 
 def update_user_password(user_id, new_password):
-    cursor.execute("UPDATE users SET password=? WHERE id=?", (hash_password(new_password), user_id))
+    set_user_password_hash(user_id, hash_password(new_password))
+
+# --- Stage History ---
+# Readers go through these helpers so archived rows are included transparently.
+
+def get_stage_history(start=None, end=None):
+    """Returns [(timestamp, stage)] in order, merging the archive with the live table."""
+    cursor.execute(
+        "SELECT timestamp, stage FROM stage_history WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp, id",
+        (start or "", end or "9999")
+    )
+    live = cursor.fetchall()
+    if not len(stage_archive):
+        return live
+    return list(heapq.merge(stage_archive.rows(start, end), live, key=lambda row: row[0]))
+
+def get_stage_before(timestamp):
+    """Stage in effect immediately before the given timestamp (0 if nothing is recorded)."""
+    cursor.execute("SELECT timestamp, stage FROM stage_history WHERE timestamp < ? ORDER BY timestamp DESC, id DESC LIMIT 1", (timestamp,))
+    candidates = [row for row in (cursor.fetchone(), stage_archive.row_before(timestamp)) if row]
+    return max(candidates, key=lambda row: row[0])[1] if candidates else 0
+
+def _stage_summary(start, end):
+    """(min_stage, max_stage, last_stage) over changes with start <= timestamp < end, or None."""
+    cursor.execute("SELECT MIN(stage), MAX(stage) FROM stage_history WHERE timestamp >= ? AND timestamp < ?", (start, end))
+    ranges = [cursor.fetchone()]
+    if len(stage_archive):
+        ranges.append(stage_archive.summary(start, end))
+    ranges = [r for r in ranges if r and r[0] is not None]
+    if not ranges:
+        return None
+    return min(r[0] for r in ranges), max(r[1] for r in ranges), get_stage_before(end)
+
+def get_stage_buckets(start, end, count):
+    """[(min_stage, max_stage)] for `count` equal slices of [start, end), reading only that range."""
+    step = (end - start) / count
+    stage = get_stage_before(to_timestamp(start))
+    buckets = []
+    for i in range(count):
+        summary = _stage_summary(to_timestamp(start + step * i), to_timestamp(start + step * (i + 1)))
+        if summary is None:
+            buckets.append((stage, stage))
+        else:
+            low, high, last = summary
+            buckets.append((min(stage, low), max(stage, high)))
+            stage = last
+    return buckets
+
+def get_stage_generation():
+    """Changes whenever a stage is written; caches over the stage timeline key on it."""
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM stage_history")
+    return cursor.fetchone()[0]
+
+def get_first_stage_timestamp():
+    cursor.execute("SELECT MIN(timestamp) FROM stage_history")
+    candidates = [ts for ts in (cursor.fetchone()[0], next(stage_archive.rows(), (None,))[0]) if ts]
+    return min(candidates) if candidates else None
+
+def compact_stage_history(retention_days=None):
+    """Drops repeated stages and archives rows past retention. Returns (duplicates_removed, rows_archived)."""
+    if retention_days is None:
+        retention_days = int(get_setting('history_retention_days', DEFAULT_HISTORY_RETENTION_DAYS))
+    cutoff = to_timestamp(datetime.now() - timedelta(days=retention_days))
+
+    # A previous run that wrote the archive but never committed its DELETE left
+    # extra rows at the end of the file; those rows are still in the live table.
+    archived_rows = get_setting('archived_rows')
+    if archived_rows is not None and len(stage_archive) > int(archived_rows):
+        stage_archive.truncate(int(archived_rows))
+
+    cursor.execute("SELECT id, timestamp, stage FROM stage_history ORDER BY timestamp, id")
+    live = cursor.fetchall()
+    if not live:
+        return 0, 0
+
+    # Walk live rows merged with any archived rows in the same span, so duplicates
+    # are judged against the true preceding stage
+    before = stage_archive.row_before(live[0][1])
+    prev_stage = before[1] if before else None
+    archived = ((None, ts, st) for ts, st in stage_archive.rows(live[0][1]))
+    duplicate_ids = []
+    to_archive = []
+    archive_ids = []
+    for row_id, timestamp, stage in heapq.merge(archived, live, key=lambda row: row[1]):
+        if stage == prev_stage:
+            if row_id is not None:
+                duplicate_ids.append(row_id)
+            continue
+        prev_stage = stage
+        if row_id is not None and timestamp < cutoff:
+            to_archive.append((timestamp, stage))
+            archive_ids.append(row_id)
+
+    # Write the archive before deleting, so a crash never loses rows
+    if to_archive:
+        stage_archive.append(to_archive)
+    cursor.executemany("DELETE FROM stage_history WHERE id=?", [(i,) for i in duplicate_ids + archive_ids])
+    cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('archived_rows', ?)", (str(len(stage_archive)),))
+    conn.commit()
+    return len(duplicate_ids), len(to_archive)
+
+# --- Stage Writes ---
+
+class StageWriter:
+    """Writes current_stage and its history row together, grouping writes that arrive close together into one commit."""
+    def __init__(self, commit_interval_ms=0):
+        self.commit_interval_ms = commit_interval_ms
+        self.scheduler = None
+        self.flush_scheduled = False
+        self.last_commit = 0.0
+        self.pending = [] # perf_counter() of each uncommitted write
+        self.pending_stage = None # Latest stage in the uncommitted group
+        self.listeners = [] # listener(stage) once a group's commit lands, with its latest stage
+        # Latency stats (write call -> durable commit), in ms
+        self.writes = 0
+        self.commits = 0
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.total_latency_ms = 0.0
+
+    def write(self, stage, timestamp=None):
+        started = perf_counter()
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('current_stage', ?)", (str(stage),))
+        cursor.execute("INSERT INTO stage_history (timestamp, stage) VALUES (?, ?)", (timestamp or to_timestamp(datetime.now()), stage))
+        _record_today_stage(stage)
+        record_change("stage", stage)
+        self.pending.append(started)
+        self.pending_stage = stage
+
+        wait_ms = self.commit_interval_ms - (started - self.last_commit) * 1000
+        if wait_ms <= 0 or self.scheduler is None:
+            self.flush()
+        elif not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.scheduler(int(wait_ms) + 1, self.flush)
+
+    def flush(self):
+        self.flush_scheduled = False
+        if not self.pending:
+            return
+        try:
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            self.pending = []
+            self.pending_stage = None
+            raise
+        self.last_commit = perf_counter()
+        self.commits += 1
+        for started in self.pending:
+            latency = (self.last_commit - started) * 1000
+            self.writes += 1
+            self.total_latency_ms += latency
+            self.max_latency_ms = max(self.max_latency_ms, latency)
+            self.last_latency_ms = latency
+        self.pending = []
+        stage, self.pending_stage = self.pending_stage, None
+        for listener in self.listeners:
+            listener(stage)
+
+    def stats(self):
+        return {
+            "writes": self.writes,
+            "commits": self.commits,
+            "pending": len(self.pending),
+            "last_ms": self.last_latency_ms,
+            "avg_ms": self.total_latency_ms / self.writes if self.writes else 0.0,
+            "max_ms": self.max_latency_ms
+        }
+
+stage_writer = StageWriter(DEFAULT_STAGE_COMMIT_INTERVAL_MS) # Configured by bootstrap()
+
+def get_stage_write_stats():
+    return stage_writer.stats()
+
+def apply_stage_events(events, offsets=()):
+    """Applies (timestamp, stage) events and feed `offsets` in one transaction, skipping replays. Returns the count applied."""
+    events = sorted(events, key=lambda event: event[0]) # Stable: same-second events keep feed order
+    stage_writer.flush()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        accepted = []
+        if events:
+            # One merge pass against the history the batch spans, instead of a seek per event
+            stage = get_stage_before(events[0][0])
+            history = get_stage_history(events[0][0], events[-1][0])
+            # Rows already stored at each second; a replayed event uses up its match
+            stored = {}
+            for timestamp, row_stage in history:
+                stored.setdefault(timestamp, Counter())[row_stage] += 1
+            i = 0
+            for timestamp, event_stage in events:
+                while i < len(history) and history[i][0] <= timestamp:
+                    stage = history[i][1]
+                    i += 1
+                if stored.get(timestamp, {}).get(event_stage):
+                    stored[timestamp][event_stage] -= 1
+                    continue
+                if event_stage != stage:
+                    accepted.append((timestamp, event_stage))
+                    stage = event_stage
+        if accepted:
+            cursor.executemany("INSERT INTO stage_history (timestamp, stage) VALUES (?, ?)", accepted)
+            current = get_stage_before(to_timestamp(datetime.now() + timedelta(seconds=1)))
+            cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('current_stage', ?)", (str(current),))
+            record_change("stage", current)
+            # Backfilled days may already be rolled up
+            first_day = from_timestamp(accepted[0][0]).date()
+            _roll_days(min(first_day, _rollup_start()), date.today() - timedelta(days=1))
+            _roll_today()
+        cursor.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", offsets)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(accepted)
+
+# --- Change Feed ---
+# Every write that other instances care about adds a row to `changes` in the
+# same transaction. Instances poll PRAGMA data_version (a counter that moves only
+# when another connection commits) and read the new rows only when it moves.
+# Kinds: "stage" (subject = new stage), "schedule" (subject = area, or NULL for
+# all areas), "user" and "locations" (subject = user id), and "reset", raised
+# locally when rows were pruned before this instance read them.
+
+def record_change(kind, subject=None):
+    """Logs a change for other instances. Caller commits (the row rides the caller's transaction)."""
+    cursor.execute(
+        "INSERT INTO changes (kind, subject, origin) VALUES (?, ?, ?)",
+        (kind, None if subject is None else str(subject), CHANGE_ORIGIN)
+    )
+
+def prune_changes(keep=CHANGE_LOG_KEEP):
+    stage_writer.flush()
+    cursor.execute("DELETE FROM changes WHERE id <= (SELECT MAX(id) FROM changes) - ?", (keep,))
+    conn.commit()
+    return cursor.rowcount
+
+class ChangeFeed:
+    """Delivers (kind, subject) changes committed by other processes, after refreshing local caches."""
+    def __init__(self, poll_ms):
+        self.poll_ms = poll_ms
+        self.scheduler = None
+        self.subscribers = []
+        self.data_version = None
+        self.last_id = None
+        self.snapshot_stale = False
+
+    def _data_version(self):
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def catch_up(self):
+        """Skips the changes already logged; delivery starts after them."""
+        self.data_version = self._data_version()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM changes")
+        self.last_id = cursor.fetchone()[0]
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def start(self, scheduler):
+        self.scheduler = scheduler
+        self.scheduler(self.poll_ms, self._tick)
+
+    def _tick(self):
+        try:
+            events = self.poll()
+            if events:
+                for callback in self.subscribers:
+                    callback(events)
+        except Exception as e:
+            print(f"Change feed error: {e}")
+        self.scheduler(self.poll_ms, self._tick)
+
+    def poll(self):
+        if self.last_id is None:
+            self.catch_up()
+            return []
+        if self.snapshot_stale:
+            # The importing process writes its snapshot just after committing
+            self.snapshot_stale = not reload_schedule_snapshot()
+
+        version = self._data_version()
+        if version == self.data_version:
+            return []
+        self.data_version = version
+
+        cursor.execute("SELECT id, kind, subject, origin FROM changes WHERE id > ? ORDER BY id", (self.last_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            return []
+        events = []
+        if rows[0][0] != self.last_id + 1:
+            cursor.execute("SELECT COALESCE(MIN(id), 0) FROM changes")
+            if cursor.fetchone()[0] > self.last_id + 1:
+                events.append(("reset", None)) # Missed pruned rows; refresh everything
+        self.last_id = rows[-1][0]
+        # Our own rows only advance last_id; this process already acted on them
+        events.extend((kind, subject) for _, kind, subject, origin in rows if origin != CHANGE_ORIGIN)
+
+        if any(kind in ("schedule", "reset") for kind, _ in events):
+            self.snapshot_stale = not reload_schedule_snapshot()
+        for kind, subject in events:
+            if kind == "user":
+                user_cache.invalidate(int(subject))
+            elif kind == "reset":
+                user_cache.invalidate()
+        return events
+
+change_feed = ChangeFeed(DEFAULT_CHANGE_POLL_MS) # Configured by bootstrap()
+
+# --- Outage Rollup ---
+# outage_rollup holds one row per (area, date) for closed days, so analytics
+# become a range-sum over the primary key instead of a day-by-day walk of
+# stage_history. Today is still open: stage writes only touch its daily_stage
+# row, and queries add each area's area_impact.daily_minutes while that row's
+# end_stage is above 0. 'rollup_through' in settings is the last day rolled up.
+
+def _daily_minutes_by_area():
+    return {area: daily_outage_minutes(slots) for area, slots in load_all_schedules().items()}
+
+def _rollup_start():
+    through = get_setting('rollup_through')
+    if through is None:
+        first = get_first_stage_timestamp()
+        return from_timestamp(first).date() if first else date.today()
+    # Older databases rolled today up too; it is rolled again once closed
+    return min(date.fromisoformat(through) + timedelta(days=1), date.today())
+
+def _roll_days(start_date, end_date):
+    """Rolls up every day in [start_date, end_date] under the schedule in effect at its end. Caller commits."""
+    if start_date > end_date:
+        return 0
+    first_day_end = to_timestamp(datetime.combine(start_date, time(23, 59, 59)))
+    area_minutes = {area: daily_outage_minutes(slots) for area, slots in get_schedules_at(first_day_end).items()}
+    schedule_changes = get_schedule_changes(first_day_end, to_timestamp(datetime.combine(end_date, time(23, 59, 59))))
+
+    # Stage carried into the first day, then every change inside the window
+    day_start = to_timestamp(datetime.combine(start_date, time.min))
+    stage = get_stage_before(day_start)
+    changes = get_stage_history(day_start, to_timestamp(datetime.combine(end_date, time(23, 59, 59))))
+
+    daily_rows = []
+    rollup_rows = []
+    i = j = 0
+    day = start_date
+    while day <= end_date:
+        day_end = to_timestamp(datetime.combine(day, time(23, 59, 59)))
+        while j < len(schedule_changes) and schedule_changes[j][0] <= day_end:
+            _, area, slots = schedule_changes[j]
+            if slots:
+                area_minutes[area] = daily_outage_minutes(slots)
+            else:
+                area_minutes.pop(area, None)
+            j += 1
+        max_stage = stage
+        while i < len(changes) and changes[i][0] <= day_end:
+            stage = changes[i][1]
+            max_stage = max(max_stage, stage)
+            i += 1
+        day_str = day.isoformat()
+        daily_rows.append((day_str, stage, max_stage))
+        for area, minutes in area_minutes.items():
+            rollup_rows.append((area, day_str, minutes if stage > 0 else 0, max_stage))
+        day += timedelta(days=1)
+
+    cursor.executemany("INSERT OR REPLACE INTO daily_stage (date, end_stage, max_stage) VALUES (?, ?, ?)", daily_rows)
+    cursor.executemany("INSERT OR REPLACE INTO outage_rollup (area, date, outage_minutes, max_stage) VALUES (?, ?, ?, ?)", rollup_rows)
+    cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('rollup_through', ?)", (end_date.isoformat(),))
+    return len(daily_rows)
+
+def _roll_today():
+    """Rewrites today's daily_stage row from today's stage changes. Caller commits."""
+    today = date.today()
+    day_start = to_timestamp(datetime.combine(today, time.min))
+    stage = max_stage = get_stage_before(day_start)
+    for _, stage in get_stage_history(day_start, to_timestamp(datetime.combine(today, time(23, 59, 59)))):
+        max_stage = max(max_stage, stage)
+    cursor.execute("INSERT OR REPLACE INTO daily_stage (date, end_stage, max_stage) VALUES (?, ?, ?)", (today.isoformat(), stage, max_stage))
+
+def _record_today_stage(stage):
+    """Folds a stage written now into today's daily_stage row. Caller commits."""
+    cursor.execute("UPDATE daily_stage SET end_stage=?, max_stage=MAX(max_stage, ?) WHERE date=?", (stage, stage, date.today().isoformat()))
+    if cursor.rowcount == 0:
+        _roll_today() # First write of the day also needs the stage carried in
+
+def _update_rollup_for_schedule(old_minutes, new_minutes, from_date):
+    # Only areas whose daily total changed need their rows rewritten, and only
+    # from the day the new schedule takes effect; earlier days keep the old one
+    changed = [area for area in set(old_minutes) | set(new_minutes) if old_minutes.get(area) != new_minutes.get(area)]
+    today = date.today().isoformat()
+    for area in changed:
+        cursor.execute("DELETE FROM outage_rollup WHERE area=? AND date >= ?", (area, from_date))
+        if area in new_minutes:
+            cursor.execute(
+                """INSERT INTO outage_rollup (area, date, outage_minutes, max_stage)
+                   SELECT ?, date, CASE WHEN end_stage > 0 THEN ? ELSE 0 END, max_stage FROM daily_stage WHERE date >= ? AND date < ?""",
+                (area, new_minutes[area], from_date, today)
+            )
+
+def refresh_rollup():
+    """Rolls up any days that have closed since the last refresh (normally none or one)."""
+    yesterday = date.today() - timedelta(days=1)
+    start = _rollup_start()
+    rolled = start <= yesterday
+    if rolled:
+        _roll_days(start, yesterday)
+    cursor.execute("SELECT 1 FROM daily_stage WHERE date=?", (date.today().isoformat(),))
+    if rolled or cursor.fetchone() is None:
+        _roll_today()
+        if not stage_writer.pending:
+            conn.commit() # Otherwise these rows go out with the pending stage group
+
+def backfill_rollup():
+    """Rebuilds the rollup from the full stage history. Returns the number of days rolled."""
+    cursor.execute("DELETE FROM daily_stage")
+    cursor.execute("DELETE FROM outage_rollup")
+    cursor.execute("DELETE FROM settings WHERE key='rollup_through'")
+    days = _roll_days(_rollup_start(), date.today() - timedelta(days=1))
+    _roll_today()
+    conn.commit()
+    return days
+
+def _closed_range(start_date, end_date):
+    """The closed-day part of [start_date, end_date] as ISO strings, and whether today falls inside it."""
+    today = date.today()
+    return start_date.isoformat(), min(end_date, today - timedelta(days=1)).isoformat(), start_date <= today <= end_date
+
+def get_outage_minutes(area, start_date, end_date):
+    refresh_rollup()
+    start, end, includes_today = _closed_range(start_date, end_date)
+    cursor.execute(
+        "SELECT COALESCE(SUM(outage_minutes), 0) FROM outage_rollup WHERE area=? AND date BETWEEN ? AND ?",
+        (area, start, end)
+    )
+    minutes = cursor.fetchone()[0]
+    if includes_today:
+        cursor.execute(
+            "SELECT daily_minutes FROM area_impact WHERE area=? AND (SELECT end_stage FROM daily_stage WHERE date=?) > 0",
+            (area, date.today().isoformat())
+        )
+        row = cursor.fetchone()
+        minutes += row[0] if row else 0
+    return minutes
+
+def get_outage_minutes_by_area(start_date, end_date):
+    """{area: outage minutes} over [start_date, end_date] for every area, in one grouped scan."""
+    refresh_rollup()
+    start, end, includes_today = _closed_range(start_date, end_date)
+    cursor.execute(
+        "SELECT area, SUM(outage_minutes) FROM outage_rollup WHERE date BETWEEN ? AND ? GROUP BY area",
+        (start, end)
+    )
+    totals = dict(cursor.fetchall())
+    if includes_today:
+        cursor.execute(
+            "SELECT area, daily_minutes FROM area_impact WHERE (SELECT end_stage FROM daily_stage WHERE date=?) > 0",
+            (date.today().isoformat(),)
+        )
+        for area, minutes in cursor.fetchall():
+            totals[area] = totals.get(area, 0) + minutes
+    return totals
+
+# --- Stage Planner ---
+# area_impact holds each scheduled area's daily outage minutes and how many users
+# have a location there. Imports rewrite only the areas whose minutes changed and
+# location edits recount only the areas they touch, so previews never rescan.
+
+def _refresh_area_users(areas):
+    """Recounts users for the given areas. Caller commits."""
+    cursor.executemany(
+        "UPDATE area_impact SET users=(SELECT COUNT(DISTINCT user_id) FROM user_locations WHERE area=?) WHERE area=?",
+        [(area, area) for area in set(areas) if area]
+    )
+
+def _update_impact_for_schedule(old_minutes, new_minutes):
+    """Caller commits."""
+    changed = [area for area in set(old_minutes) | set(new_minutes) if old_minutes.get(area) != new_minutes.get(area)]
+    for area in changed:
+        if area in new_minutes:
+            cursor.execute(
+                "INSERT OR REPLACE INTO area_impact (area, daily_minutes, users) VALUES (?, ?, (SELECT COUNT(DISTINCT user_id) FROM user_locations WHERE area=?))",
+                (area, new_minutes[area], area)
+            )
+        else:
+            cursor.execute("DELETE FROM area_impact WHERE area=?", (area,))
+
+def sync_area_impact():
+    """Builds area_impact on first run; afterwards only recounts users (locations can be migrated at startup)."""
+    cursor.execute("SELECT COUNT(*) FROM area_impact")
+    if cursor.fetchone()[0] == 0:
+        _update_impact_for_schedule({}, _daily_minutes_by_area())
+    counts = get_user_counts_by_area()
+    cursor.execute("SELECT area FROM area_impact")
+    cursor.executemany("UPDATE area_impact SET users=? WHERE area=?", [(counts.get(area, 0), area) for (area,) in cursor.fetchall()])
     conn.commit()
 
+def get_area_impact():
+    """[(area, daily_outage_minutes, users)] for every scheduled area, most minutes first."""
+    cursor.execute("SELECT area, daily_minutes, users FROM area_impact ORDER BY daily_minutes DESC, area")
+    return cursor.fetchall()
+
+def get_dark_user_count():
+    """Distinct users with at least one location in an area that has outages scheduled."""
+    cursor.execute("SELECT COUNT(DISTINCT user_id) FROM user_locations WHERE area IN (SELECT area FROM area_impact WHERE daily_minutes > 0)")
+    return cursor.fetchone()[0]
+
+# --- Area Catalog ---
+# Province / municipality / area rows live in the areas table, loaded from
+# areas.csv whenever that file changes. Pickers query one level at a time and
+# search through a trigram index, so the catalog can hold national scale.
+
+AREA_CATALOG_PATH = "areas.csv"
+
+def _trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def sync_area_catalog(path=AREA_CATALOG_PATH):
+    """Reloads the catalog if the data file changed since the last load."""
+    if not os.path.exists(path):
+        return False
+    st = os.stat(path)
+    signature = f"{st.st_mtime_ns}:{st.st_size}"
+    if get_setting('area_catalog_signature') == signature:
+        return False
+
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        cursor.execute("DELETE FROM areas")
+        cursor.execute("DELETE FROM area_trigrams")
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            rows = [(row["province"].strip(), row["municipality"].strip(), row["area"].strip()) for row in reader]
+        cursor.executemany("INSERT OR IGNORE INTO areas (province, municipality, name) VALUES (?, ?, ?)", rows)
+        cursor.execute("SELECT id, name FROM areas")
+        cursor.executemany(
+            "INSERT OR IGNORE INTO area_trigrams (trigram, area_id) VALUES (?, ?)",
+            [(tri, area_id) for area_id, name in cursor.fetchall() for tri in _trigrams(name)]
+        )
+        cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('area_catalog_signature', ?)", (signature,))
+        cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('area_catalog_generation', ?)", (str(get_area_catalog_generation() + 1),))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+def get_area_catalog_generation():
+    return int(get_setting('area_catalog_generation', 0))
+
+def get_provinces():
+    cursor.execute("SELECT DISTINCT province FROM areas ORDER BY province")
+    return [row[0] for row in cursor.fetchall()]
+
+def get_municipalities(province):
+    cursor.execute("SELECT DISTINCT municipality FROM areas WHERE province=? ORDER BY municipality", (province,))
+    return [row[0] for row in cursor.fetchall()]
+
+def get_catalog_areas(province, municipality):
+    cursor.execute("SELECT name FROM areas WHERE province=? AND municipality=? ORDER BY name", (province, municipality))
+    return [row[0] for row in cursor.fetchall()]
+
+def get_all_area_names():
+    cursor.execute("SELECT DISTINCT name FROM areas")
+    return [row[0] for row in cursor.fetchall()]
+
+def search_areas(text, limit=20):
+    """Autocomplete: [(area, municipality, province)] by name prefix, or by substring from three characters."""
+    text = text.strip()
+    if not text:
+        return []
+    grams = _trigrams(text)
+    if not grams:
+        cursor.execute(
+            "SELECT name, municipality, province FROM areas WHERE name >= ? AND name < ? ORDER BY name LIMIT ?",
+            (text, text + "\uffff", limit)
+        )
+        return cursor.fetchall()
+
+    placeholders = ",".join("?" * len(grams))
+    cursor.execute(
+        f"""SELECT a.name, a.municipality, a.province FROM areas a
+            JOIN (SELECT area_id FROM area_trigrams WHERE trigram IN ({placeholders})
+                  GROUP BY area_id HAVING COUNT(*) = ?) t ON t.area_id = a.id
+            ORDER BY a.name""",
+        (*grams, len(grams))
+    )
+    # Trigrams can match out of order; confirm the substring
+    needle = text.lower()
+    matches = []
+    for row in cursor:
+        if needle in row[0].lower():
+            matches.append(row)
+            if len(matches) >= limit:
+                break
+    return matches
+
 # Initial Migration from CSV on Startup if DB is empty
 def migrate_csv_to_db_if_empty():
     cursor.execute("SELECT COUNT(*) FROM schedules")
@@ -235,5 +1237,28 @@ def migrate_csv_to_db_if_empty():
             except Exception as e:
                 print(f"Migration failed: {e}")
 
-migrate_csv_to_db_if_empty()
-seed_admin()
+# --- Startup ---
+# Importing this module only opens the connection. The process that owns the
+# app (main.py, manage.py) calls bootstrap() once. Pool workers re-import the
+# launching script on Windows, so keeping this out of import time means they
+# never migrate, compact or prune behind the parent's back.
+
+_bootstrapped = False
+
+def bootstrap():
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    _bootstrapped = True
+    init_db()
+    stage_writer.commit_interval_ms = int(get_setting('stage_commit_interval_ms', DEFAULT_STAGE_COMMIT_INTERVAL_MS))
+    change_feed.poll_ms = int(get_setting('change_poll_ms', DEFAULT_CHANGE_POLL_MS))
+    sync_area_catalog()
+    sync_schedule_versions()
+    migrate_csv_to_db_if_empty()
+    open_schedule_snapshot()
+    sync_area_impact()
+    seed_admin()
+    compact_stage_history()
+    prune_changes()
+    change_feed.catch_up()
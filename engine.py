@@ -0,0 +1,251 @@
+import os
+import zlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from datetime import datetime, timedelta, time
+from schedule import MINUTES_PER_DAY
+from ics import calendar_header, dtstamp_now, file_name, format_event, CALENDAR_FOOTER, MIN_EVENT_SECONDS
+
+# --- Sharded Computation Engine ---
+# Recomputes every area's upcoming outages (and optionally its .ics feed) across
+# worker processes. Areas are split into shards by a stable hash of their name;
+# each shard is a one-process pool whose worker keeps its areas' compiled
+# schedules and the stage timeline in module globals. A stage change ships only
+# the new timeline, a recompute only the horizon; schedules are resent to a
+# shard only after an import.
+#
+# Workers only run the worker-side functions below, so this module imports
+# database and utils lazily on the parent side. Spawned workers (always on
+# Windows) also re-import the launching script; that is harmless because
+# database does nothing at import time (see database.bootstrap).
+
+DEFAULT_WEEKS = 4
+DEFAULT_POLL_MS = 1000
+SECONDS_PER_DAY = MINUTES_PER_DAY * 60
+
+# --- Worker Side ---
+_schedules = {} # area -> compiled (start, end) minute pairs
+_spans = []     # (span_start, span_end, stage) over the horizon
+
+def _load_shard(area_slots):
+    global _schedules
+    _schedules = area_slots
+
+def _set_spans(spans):
+    global _spans
+    _spans = spans
+
+def area_outages(slots, spans):
+    """Sorted (start, end, stage) second offsets of one area's outages under `spans`."""
+    outages = []
+    for span_start, span_end, stage in spans:
+        # Start a day early for slots crossing midnight into the span
+        for day in range(span_start // SECONDS_PER_DAY - 1, (span_end - 1) // SECONDS_PER_DAY + 1):
+            base = day * SECONDS_PER_DAY
+            for slot_start, slot_end in slots:
+                lo = base + slot_start * 60
+                hi = lo + (slot_end - slot_start) % MINUTES_PER_DAY * 60
+                if lo < span_start:
+                    lo = span_start
+                if hi > span_end:
+                    hi = span_end
+                if lo < hi:
+                    outages.append((lo, hi, stage))
+    outages.sort()
+    return outages
+
+def _compute(version, start, end, now, export_dir):
+    """Returns (version, {area: result}) for every area in this worker's shard."""
+    total = int((end - start).total_seconds())
+    spans = []
+    for span_start, span_end, stage in _spans:
+        lo = max(0, int((span_start - start).total_seconds()))
+        hi = min(total, int((span_end - start).total_seconds()))
+        if stage > 0 and lo < hi:
+            spans.append((lo, hi, stage))
+    now_offset = (now - start).total_seconds()
+    dtstamp = dtstamp_now()
+    results = {}
+    for area, slots in _schedules.items():
+        outages = area_outages(slots, spans)
+        upcoming = next((outage for outage in outages if outage[1] > now_offset), None)
+        results[area] = {
+            "next": upcoming and (start + timedelta(seconds=upcoming[0]), start + timedelta(seconds=upcoming[1]), upcoming[2]),
+            "active": upcoming is not None and upcoming[0] <= now_offset,
+            "outages": len(outages),
+            "minutes": sum(hi - lo for lo, hi, _ in outages) // 60
+        }
+        if export_dir:
+            with open(os.path.join(export_dir, file_name(area)), "w", encoding="utf-8", newline="") as f:
+                f.write(calendar_header(f"Load Shedding - {area}"))
+                for lo, hi, stage in outages:
+                    if hi <= now_offset or hi - lo < MIN_EVENT_SECONDS:
+                        continue # Same rule as export.write_ics
+                    f.write(format_event(area, start + timedelta(seconds=lo), start + timedelta(seconds=hi), stage, dtstamp))
+                f.write(CALENDAR_FOOTER)
+    return version, results
+
+# --- Parent Side ---
+
+class Engine:
+    """Keeps `results` ({area: {...}}) current; each shard's results are merged as it finishes."""
+    def __init__(self, workers=None, weeks=DEFAULT_WEEKS, export_dir=None):
+        self.shard_count = workers or os.cpu_count() or 1
+        self.weeks = weeks
+        self.export_dir = export_dir
+        if export_dir:
+            os.makedirs(export_dir, exist_ok=True)
+        self.pools = [ProcessPoolExecutor(max_workers=1) for _ in range(self.shard_count)]
+        self.pending = [None] * self.shard_count
+        self.shard_versions = [0] * self.shard_count
+        self.shard_schedules = [None] * self.shard_count # Schedule generation each shard holds
+        self.shard_data = [0] * self.shard_count # data_version whose spans (and .ics files) each shard has
+        self.version = 0      # Bumped by data changes and by the minute tick
+        self.data_version = 0 # Bumped by schedule and stage changes only
+        self.key = None  # (schedule generation, stage generation, horizon start) of data_version
+        self.tick = None # (key, minute) of version
+        self.schedule_generation = None
+        self.shards = []
+        self.loader = None
+        self.loaded = None
+        self.spans = []
+        self.analytics = {}
+        self.results = {}
+        self.lock = threading.Lock()
+        self.updated = False
+        self.errors = 0
+        self.scheduler = None
+        self.poll_ms = DEFAULT_POLL_MS
+        self.subscribers = []
+
+    def shard_of(self, area):
+        return zlib.crc32(area.encode("utf-8")) % self.shard_count
+
+    def subscribe(self, callback):
+        """callback(results) runs on the scheduler's thread after shards report in."""
+        self.subscribers.append(callback)
+
+    def start(self, scheduler, poll_ms=DEFAULT_POLL_MS):
+        self.scheduler = scheduler
+        self.poll_ms = poll_ms
+        self.scheduler(0, self._tick)
+
+    def _tick(self):
+        try:
+            self.refresh()
+            if self.updated:
+                with self.lock:
+                    self.updated = False
+                    results = dict(self.results)
+                for callback in self.subscribers:
+                    callback(results)
+        except Exception as e:
+            print(f"Engine error: {e}")
+        self.scheduler(self.poll_ms, self._tick)
+
+    def _load(self):
+        # Loader thread: reading and compiling every schedule takes seconds at national scale
+        from database import read_schedules
+        from schedule import compile_slots
+        try:
+            generation, area_slots = read_schedules()
+            shards = [{} for _ in range(self.shard_count)]
+            for area, slots in area_slots.items():
+                shards[self.shard_of(area)][area] = compile_slots(slots)
+            self.loaded = (generation, shards)
+        except Exception as e:
+            print(f"Engine schedule load failed: {e}")
+            self.errors += 1
+
+    def _pick_up_schedules(self, schedule_generation):
+        """Starts a load when an import happened; swaps the shards in once it is done. Returns True while loading."""
+        if self.loader is not None:
+            if self.loader.is_alive():
+                return True
+            self.loader = None
+            if self.loaded is not None:
+                self.schedule_generation, self.shards = self.loaded
+                self.loaded = None
+                with self.lock:
+                    self.results = {area: result for area, result in self.results.items() if area in self.shards[self.shard_of(area)]}
+        if schedule_generation != self.schedule_generation:
+            self.loader = threading.Thread(target=self._load, daemon=True)
+            self.loader.start()
+            return True
+        return False
+
+    def refresh(self):
+        """Picks up schedule/stage changes and the minute, and hands the newest state to every idle shard."""
+        from database import get_schedule_generation, get_stage_generation
+        from utils import get_all_analytics, get_stage_spans
+
+        loading = self._pick_up_schedules(get_schedule_generation())
+        if self.schedule_generation is None:
+            return # First load still running
+        if loading and self.version:
+            return # Shards get the new schedules once they are compiled
+
+        now = datetime.now()
+        start = datetime.combine(now.date(), time.min)
+        end = start + timedelta(weeks=self.weeks)
+        key = (self.schedule_generation, get_stage_generation(), start)
+        if key != self.key:
+            self.spans = get_stage_spans(start, end)
+            self.analytics = get_all_analytics()
+            self.key = key
+            self.data_version += 1
+        # `next` and `active` depend on the time too, so results are redone every minute
+        tick = (key, now.replace(second=0, microsecond=0))
+        if tick != self.tick:
+            self.tick = tick
+            self.version += 1
+
+        for shard, pool in enumerate(self.pools):
+            busy = self.pending[shard] is not None and not self.pending[shard].done()
+            if busy or self.shard_versions[shard] == self.version:
+                continue
+            if self.shard_schedules[shard] != self.schedule_generation:
+                pool.submit(_load_shard, self.shards[shard])
+                self.shard_schedules[shard] = self.schedule_generation
+            export_dir = None
+            if self.shard_data[shard] != self.data_version:
+                # Timeline and .ics files only change with the data; minute ticks just recompute results
+                pool.submit(_set_spans, self.spans)
+                self.shard_data[shard] = self.data_version
+                export_dir = self.export_dir
+            future = pool.submit(_compute, self.version, start, end, now, export_dir)
+            future.add_done_callback(lambda f, shard=shard: self._merge(shard, f))
+            self.pending[shard] = future
+            self.shard_versions[shard] = self.version
+
+    def _merge(self, shard, future):
+        # Runs on the pool's management thread
+        try:
+            version, results = future.result()
+        except Exception as e:
+            # Its areas keep their previous results until the next change
+            print(f"Engine shard {shard} failed: {e}")
+            self.errors += 1
+            return
+        analytics = self.analytics
+        with self.lock:
+            for area, result in results.items():
+                result["analytics"] = analytics.get(area)
+                self.results[area] = result
+            self.updated = True
+
+    def run(self):
+        """Refreshes and blocks until every shard has the newest results (headless use)."""
+        while True:
+            self.refresh()
+            if self.loader is not None:
+                self.loader.join()
+                continue
+            pending = [f for f in self.pending if f is not None and not f.done()]
+            if not pending:
+                return self.results
+            wait(pending)
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown(wait=False, cancel_futures=True)
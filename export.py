@@ -0,0 +1,64 @@
+import os
+from datetime import datetime, timedelta, time
+from functools import lru_cache
+from database import get_schedule_generation, get_stage_generation, get_user_locations
+from utils import outages_between
+from ics import calendar_header, dtstamp_now, file_name, format_event, CALENDAR_FOOTER, MIN_EVENT_SECONDS
+
+# --- iCalendar Export ---
+# Feeds are written event by event to a file object. Each area's rendered
+# events are cached by (area, schedule generation, stage generation, start day,
+# weeks), so repeated exports of popular areas only pay for the file writes.
+# Only outages still to come (or under way) are written.
+
+DEFAULT_WEEKS = 4
+
+@lru_cache(maxsize=2048)
+def _area_events(area, schedule_generation, stage_generation, start_date, weeks):
+    """((outage_end, event_text), ...) from `start_date`'s midnight, so an outage under way keeps its real start (and UID)."""
+    start = datetime.combine(start_date, time.min)
+    end = start + timedelta(weeks=weeks)
+    dtstamp = dtstamp_now()
+    return tuple(
+        (outage_end, format_event(area, outage_start, outage_end, outage_stage, dtstamp))
+        for outage_start, outage_end, outage_stage in outages_between(area, start, end)
+        if (outage_end - outage_start).total_seconds() >= MIN_EVENT_SECONDS
+    )
+
+def write_ics(fileobj, areas, weeks=DEFAULT_WEEKS, name="Load Shedding"):
+    """Streams a VCALENDAR with every upcoming outage for `areas` into `fileobj`. Returns the event count."""
+    now = datetime.now()
+    schedule_generation = get_schedule_generation()
+    stage_generation = get_stage_generation()
+
+    fileobj.write(calendar_header(name))
+    count = 0
+    for area in dict.fromkeys(areas): # De-duplicate, keep order
+        for outage_end, event in _area_events(area, schedule_generation, stage_generation, now.date(), weeks):
+            if outage_end > now: # Skip outages that already ended today
+                fileobj.write(event)
+                count += 1
+    fileobj.write(CALENDAR_FOOTER)
+    return count
+
+def export_area_ics(file_path, area, weeks=DEFAULT_WEEKS):
+    with open(file_path, "w", encoding="utf-8", newline="") as f:
+        return write_ics(f, [area], weeks, name=f"Load Shedding - {area}")
+
+def export_user_ics(file_path, user_id, weeks=DEFAULT_WEEKS):
+    areas = [loc[4] for loc in get_user_locations(user_id)]
+    with open(file_path, "w", encoding="utf-8", newline="") as f:
+        return write_ics(f, areas, weeks, name="Load Shedding - My Locations")
+
+def export_bulk_ics(out_dir, areas, weeks=DEFAULT_WEEKS):
+    """Writes one <area>.ics per area into out_dir. Returns (files, events)."""
+    os.makedirs(out_dir, exist_ok=True)
+    files = events = 0
+    written = {}
+    for area in dict.fromkeys(areas):
+        name = file_name(area)
+        if written.setdefault(name, area) != area:
+            raise ValueError(f"Areas '{written[name]}' and '{area}' would both be written to {name}")
+        events += export_area_ics(os.path.join(out_dir, name), area, weeks)
+        files += 1
+    return files, events
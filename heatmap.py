@@ -0,0 +1,63 @@
+from datetime import datetime, time, timedelta
+import numpy as np
+from schedule import MINUTES_PER_DAY
+
+# --- Weekday x Hour Heatmap ---
+# Outage minutes bucketed by [weekday, hour]. The stage timeline becomes a
+# per-minute on/off mask and each area's schedule a per-minute-of-day coverage
+# count, so the whole range reduces to array products and sums.
+# Needs NumPy (optional dependency: pip install numpy).
+
+# Days processed per block; bounds peak memory on multi-year ranges
+CHUNK_DAYS = 366
+
+def daily_coverage(compiled_slots):
+    """int32[1440]: how many slots cover each minute of the day (slots crossing midnight wrap)."""
+    delta = np.zeros(MINUTES_PER_DAY + 1, dtype=np.int32)
+    slots = np.asarray(compiled_slots, dtype=np.int32).reshape(-1, 2)
+    starts, ends = slots[:, 0], slots[:, 1]
+    keep = starts != ends
+    starts, ends = starts[keep], ends[keep]
+    wrap = ends < starts
+    np.add.at(delta, starts, 1)
+    np.add.at(delta, np.where(wrap, MINUTES_PER_DAY, ends), -1)
+    # The part of a wrapped slot after midnight: [00:00, end)
+    delta[0] += np.count_nonzero(wrap)
+    np.add.at(delta, ends[wrap], -1)
+    return np.cumsum(delta[:-1], dtype=np.int32)
+
+def _stage_mask(stage_spans, origin, minutes):
+    """bool[minutes]: True where the stage timeline is above 0, minute 0 being `origin`."""
+    bounds = [
+        (int((span_start - origin).total_seconds() // 60), int((span_end - origin).total_seconds() // 60))
+        for span_start, span_end, stage in stage_spans if stage > 0
+    ]
+    delta = np.zeros(minutes + 1, dtype=np.int8)
+    if bounds:
+        bounds = np.clip(np.asarray(bounds, dtype=np.int64), 0, minutes)
+        # Spans never overlap, so the running sum stays within 0..1
+        np.add.at(delta, bounds[:, 0], 1)
+        np.add.at(delta, bounds[:, 1], -1)
+    return np.cumsum(delta[:-1], dtype=np.int8) > 0
+
+def weekday_hour_minutes(coverage, stage_spans, start, end):
+    """int64[7, 24] outage minutes by [weekday (Mon=0), hour] within [start, end)."""
+    result = np.zeros((7, 24), dtype=np.int64)
+    if end <= start:
+        return result
+    origin = datetime.combine(start.date(), time.min)
+    days = (end - origin + timedelta(days=1) - timedelta(microseconds=1)).days
+    minutes = days * MINUTES_PER_DAY
+    mask = _stage_mask(stage_spans, origin, minutes)
+    # Minutes outside [start, end) in the padded first/last day never count
+    mask[:int((start - origin).total_seconds() // 60)] = False
+    mask[int((end - origin).total_seconds() // 60):] = False
+
+    weekdays = (origin.weekday() + np.arange(days)) % 7
+    hourly_coverage = coverage.reshape(24, 60)
+    for first in range(0, days, CHUNK_DAYS):
+        last = min(first + CHUNK_DAYS, days)
+        block = mask[first * MINUTES_PER_DAY:last * MINUTES_PER_DAY].reshape(last - first, 24, 60)
+        hours = (block * hourly_coverage).sum(axis=2, dtype=np.int64) # [day, hour]
+        np.add.at(result, weekdays[first:last], hours)
+    return result
@@ -0,0 +1,70 @@
+import re
+import zlib
+from datetime import datetime, timezone
+
+# --- iCalendar Formatting ---
+# Plain text helpers shared by export.py and the engine's worker processes,
+# so they carry no database imports.
+
+CRLF = "\r\n"
+MAX_LINE_OCTETS = 75
+# Shorter pieces (stage flapping mid-outage) are left out of feeds
+MIN_EVENT_SECONDS = 60
+
+def fold(line):
+    """Splits a content line longer than 75 octets; continuation lines start with a space (RFC 5545 3.1)."""
+    if len(line.encode("utf-8")) <= MAX_LINE_OCTETS:
+        return line
+    parts = []
+    current, size = "", 0
+    for ch in line:
+        octets = len(ch.encode("utf-8"))
+        if size + octets > MAX_LINE_OCTETS:
+            parts.append(current)
+            current, size = " ", 1
+        current += ch
+        size += octets
+    parts.append(current)
+    return CRLF.join(parts)
+
+def escape(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def ics_time(dt):
+    # Floating local time, matching how the tracker stores timestamps
+    return dt.strftime("%Y%m%dT%H%M%S")
+
+def dtstamp_now():
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def file_name(area):
+    safe = re.sub(r"[^A-Za-z0-9_-]+", "_", area)
+    if safe != area:
+        # Replacing characters can map two areas to one name ("St. James", "St James")
+        safe += f"-{zlib.crc32(area.encode('utf-8')):08x}"
+    return safe + ".ics"
+
+def calendar_header(name):
+    return CRLF.join([
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Load Shedding Tracker//EN",
+        "CALSCALE:GREGORIAN",
+        fold(f"X-WR-CALNAME:{escape(name)}")
+    ]) + CRLF
+
+CALENDAR_FOOTER = "END:VCALENDAR" + CRLF
+
+def format_event(area, outage_start, outage_end, outage_stage, dtstamp):
+    uid_area = re.sub(r"[^A-Za-z0-9]+", "-", area).strip("-")
+    return CRLF.join(fold(line) for line in [
+        "BEGIN:VEVENT",
+        f"UID:{uid_area}-{ics_time(outage_start)}@load-shedding-tracker",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART:{ics_time(outage_start)}",
+        f"DTEND:{ics_time(outage_end)}",
+        f"SUMMARY:{escape(f'Load Shedding - {area}')}",
+        f"DESCRIPTION:{escape(f'Stage {outage_stage} outage')}",
+        "TRANSP:OPAQUE",
+        "END:VEVENT"
+    ]) + CRLF
@@ -0,0 +1,135 @@
+import csv
+import mmap
+from collections import Counter
+from schedule import format_slot, slot_duration
+
+# --- Memory-Mapped Schedule Ingestion ---
+# Parses schedule CSVs straight out of a memory-mapped file. Columns are found
+# by header name, like validation and the csv import; other columns are ignored.
+# Areas are interned to small integer ids and slots to (start, end) minute
+# offsets; repeated lines share one parsed tuple, so rows cost no dict or
+# string allocations of their own.
+
+DEFAULT_BATCH_SIZE = 5000
+BLOCK_SIZE = 1024 * 1024
+
+def _digits(buf, i):
+    return (buf[i] - 48) * 10 + (buf[i + 1] - 48)
+
+def parse_slot_bytes(raw):
+    """Parses b"HH:MM - HH:MM" (single-digit hours and loose spacing allowed) into minute offsets."""
+    start_raw, sep, end_raw = raw.partition(b"-")
+    if not sep:
+        raise ValueError(f"Invalid time slot {raw!r}")
+    return _parse_time_bytes(start_raw.strip()), _parse_time_bytes(end_raw.strip())
+
+def _parse_time_bytes(raw):
+    if len(raw) == 5 and raw[2] == 58: # b":"
+        hours, minutes = _digits(raw, 0), _digits(raw, 3)
+    elif len(raw) == 4 and raw[1] == 58:
+        hours, minutes = raw[0] - 48, _digits(raw, 2)
+    else:
+        raise ValueError(f"Invalid time {raw!r}")
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time {raw!r}")
+    return hours * 60 + minutes
+
+class ScheduleReader:
+    """Iterates a schedule CSV in batches of (area_id, start_minute, end_minute); see `areas`."""
+    def __init__(self, file_path, batch_size=DEFAULT_BATCH_SIZE):
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.areas = []
+        self._area_ids = {}
+        self.area_idx, self.slot_idx = 0, 1
+
+    def _area_id(self, raw):
+        raw = raw.strip() # Same name however it was padded, as validation sees it
+        area_id = self._area_ids.get(raw)
+        if area_id is None:
+            area_id = len(self.areas)
+            self._area_ids[raw] = area_id
+            self.areas.append(raw.decode("utf-8"))
+        return area_id
+
+    def batches(self):
+        with open(self.file_path, "rb") as f:
+            if f.seek(0, 2) == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from self._parse(mm)
+
+    def _parse(self, mm):
+        size = len(mm)
+        pos = mm.find(b"\n")
+        if pos < 0:
+            return
+        header = next(csv.reader([mm[:pos].decode("utf-8-sig").strip()]), [])
+        if "area" not in header or "time_slot" not in header:
+            raise ValueError("CSV missing 'area' or 'time_slot' columns")
+        self.area_idx, self.slot_idx = header.index("area"), header.index("time_slot")
+        pos += 1
+
+        # Schedules repeat the same (area, slot) lines heavily, so each distinct
+        # line is parsed once and its tuple reused for every later occurrence
+        parsed_lines = {}
+        batch = []
+        line_num = 1
+        while pos < size:
+            # Split a block of whole lines at C speed rather than seeking per line
+            end = mm.find(b"\n", min(pos + BLOCK_SIZE, size - 1))
+            end = size if end < 0 else end + 1
+            lines = mm[pos:end].split(b"\n")
+            if lines[-1] == b"":
+                lines.pop()
+            pos = end
+            for line in lines:
+                line_num += 1
+                row = parsed_lines.get(line)
+                if row is None:
+                    if not line.rstrip(b"\r"):
+                        continue # Blank line
+                    try:
+                        row = parsed_lines[line] = self._parse_line(line.rstrip(b"\r"))
+                    except ValueError as e:
+                        raise ValueError(f"Row {line_num}: {e}") from None
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def _parse_line(self, line):
+        if b'"' in line:
+            # Quoted field: rare, so fall back to the csv module for this row
+            fields = [field.encode("utf-8") for field in next(csv.reader([line.decode("utf-8")]))]
+        else:
+            fields = line.split(b",")
+        if max(self.area_idx, self.slot_idx) >= len(fields):
+            raise ValueError("Missing 'area' or 'time_slot' field")
+        start, end = parse_slot_bytes(fields[self.slot_idx])
+        return self._area_id(fields[self.area_idx]), start, end
+
+    def rows(self):
+        """Yields batches of (area, time_slot) for executemany; daily_minutes() is ready afterwards."""
+        row_text = {}
+        self._minutes = []
+        for batch in self.batches():
+            out = []
+            for row in batch:
+                text = row_text.get(row)
+                if text is None:
+                    area_id, start, end = row
+                    text = row_text[row] = (self.areas[area_id], format_slot(start, end))
+                out.append(text)
+            yield out
+            # Tally durations per distinct row rather than per line
+            for row, count in Counter(batch).items():
+                area_id, start, end = row
+                if area_id >= len(self._minutes):
+                    self._minutes.extend([0] * (area_id + 1 - len(self._minutes)))
+                self._minutes[area_id] += count * slot_duration(start, end)
+
+    def daily_minutes(self):
+        return {area: self._minutes[area_id] for area_id, area in enumerate(self.areas) if area_id < len(self._minutes)}
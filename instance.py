@@ -0,0 +1,95 @@
+import os
+import hmac
+import socket
+import threading
+
+# --- Single Instance Guard ---
+# The first launch binds a localhost port; holding that port is the lock. Later
+# launches connect, hand over their command ("show", "stage N") and exit.
+# Kept free of database/ui imports so a second launch never runs the DB bootstrap.
+# A token file next to the database keeps other local programs from sending commands.
+
+HOST = "127.0.0.1"
+PORT = 47651
+TOKEN_PATH = "instance.token"
+TIMEOUT_SECONDS = 1.0
+MAX_COMMAND_BYTES = 256
+
+class InstanceServer:
+    def __init__(self, sock, token):
+        self.sock = sock
+        self.token = token
+        self.handler = None
+
+    def serve(self, handler):
+        """Calls handler(command) on a background thread for each command received."""
+        self.handler = handler
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return # Closed
+            try:
+                self._handle(client)
+            except Exception as e:
+                print(f"Instance command error: {e}") # One bad client must not stop the guard
+            finally:
+                client.close()
+
+    def _handle(self, client):
+        client.settimeout(TIMEOUT_SECONDS)
+        line = client.makefile("rb").readline(MAX_COMMAND_BYTES).strip()
+        token, _, command = line.partition(b" ")
+        if not hmac.compare_digest(token, self.token.encode("ascii")):
+            client.sendall(b"denied\n")
+            return
+        client.sendall(b"ok\n")
+        self.handler(command.decode("utf-8", "replace"))
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR) # Wakes the accept thread on Linux
+        except OSError:
+            pass
+        self.sock.close()
+        try:
+            os.remove(TOKEN_PATH)
+        except OSError:
+            pass
+
+def acquire():
+    """Returns an InstanceServer if this is the only running instance, else None."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if os.name == "nt":
+        # Windows lets SO_REUSEADDR steal a bound port; this makes the bind exclusive
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+    else:
+        # Lets a restart bind straight away; Linux still refuses a second listener
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        sock.bind((HOST, PORT))
+        sock.listen(5)
+    except OSError:
+        sock.close()
+        return None
+
+    token = os.urandom(16).hex()
+    tmp_path = TOKEN_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(token)
+    os.replace(tmp_path, TOKEN_PATH)
+    return InstanceServer(sock, token)
+
+def send(command):
+    """Forwards a command to the running instance. Returns True once it has acknowledged."""
+    try:
+        with open(TOKEN_PATH) as f:
+            token = f.read().strip()
+        with socket.create_connection((HOST, PORT), timeout=TIMEOUT_SECONDS) as sock:
+            sock.sendall(f"{token} {command}\n".encode("utf-8"))
+            return sock.makefile("rb").readline().strip() == b"ok"
+    except OSError:
+        return False
@@ -1,8 +1,42 @@
+import sys
+import argparse
+import instance
+
+# --- Single Instance Guard ---
+# Runs before ui/database are imported: a second launch forwards its command to
+# the running instance and exits without opening the DB or a second tray icon.
+
+def parse_command(argv):
+    parser = argparse.ArgumentParser(description="Load Shedding Tracker")
+    parser.add_argument("--stage", type=int, choices=range(0, 9), help="Set the current stage (admin session required)")
+    parser.add_argument("--memstats", action="store_true", help="Write a memory report from the running copy to memstats.txt")
+    args = parser.parse_args(argv)
+    if args.memstats:
+        return "memstats"
+    return f"stage {args.stage}" if args.stage is not None else "show"
+
+instance_server = None
+if __name__ == "__main__":
+    startup_command = parse_command(sys.argv[1:])
+    instance_server = instance.acquire()
+    if instance_server is None:
+        if instance.send(startup_command):
+            sys.exit(0)
+        print("Another instance holds the lock but did not respond; starting anyway.")
+
 import tkinter as tk
 from tkinter import ttk
 from ui import LoginScreen, RegisterScreen, Dashboard
 from tray import TrayIcon
-from database import get_setting
+import memstats
+from utils import live_analytics
+from stagefeed import StageFeed, DEFAULT_POLL_MS as STAGE_FEED_POLL_MS
+from database import bootstrap, get_setting, set_current_stage, compact_stage_history, prune_changes, stage_writer, change_feed
+
+# Stage history compaction while the app runs for days in the tray
+MAINTENANCE_INTERVAL_MS = 24 * 60 * 60 * 1000
+# Poller cadence while hidden in the tray (tray status and alerts only)
+BACKGROUND_POLL_MS = 5000
 
 # --- Main Application Class ---
 class LoadSheddingApp(tk.Tk):
@@ -24,6 +58,80 @@ class LoadSheddingApp(tk.Tk):
         # Apply Theme
         self.apply_theme()
 
+        # Grouped stage commits are flushed from the Tk event loop
+        stage_writer.scheduler = self.after
+        live_analytics.scheduler = self.after
+        self.after(MAINTENANCE_INTERVAL_MS, self.run_maintenance)
+
+        # Stage, schedule and account changes made by other running instances
+        change_feed.subscribe(self.on_changes)
+        change_feed.start(self.after)
+
+        # Stage announcements from the upstream JSON-lines feed, if configured
+        self.stage_feed = None
+        feed_path = get_setting('stage_feed_path')
+        if feed_path:
+            self.stage_feed = StageFeed(feed_path, int(get_setting('stage_feed_poll_ms', STAGE_FEED_POLL_MS)))
+            self.stage_feed.subscribe(self.on_changes)
+            self.stage_feed.start(self.after)
+
+        # National deployments: keep every area's outages and .ics feeds current in worker processes
+        self.engine = None
+        engine_workers = int(get_setting('engine_workers', 0))
+        if engine_workers > 0:
+            from engine import Engine
+            self.engine = Engine(engine_workers, export_dir=get_setting('engine_export_dir') or None)
+            self.engine.subscribe(self.frames[Dashboard].on_engine_results)
+            self.engine.start(self.after)
+
+        # Normal cadences, restored when the window comes back from the tray
+        self.poll_intervals = [(poller, poller.poll_ms) for poller in (change_feed, self.stage_feed, self.engine) if poller is not None]
+
+        # Memory reports diff against this point; off unless configured (tracing slows allocation)
+        tracemalloc_frames = int(get_setting('tracemalloc_frames', 0))
+        if tracemalloc_frames > 0:
+            memstats.start_tracing(tracemalloc_frames)
+
+        # Commands forwarded by later launches arrive on the server thread
+        if instance_server is not None:
+            instance_server.serve(lambda command: self.after(0, lambda: self.handle_command(command)))
+
+    def handle_command(self, command):
+        if command == "show":
+            self.restore_from_tray()
+            self.lift()
+            self.focus_force()
+        elif command.startswith("stage "):
+            user = self.current_user
+            if not user or len(user) < 5 or user[4] != "admin":
+                print("Ignoring forwarded stage change: no admin is logged in.")
+                return
+            set_current_stage(int(command.split()[1]))
+            self.frames[Dashboard].on_changes([("stage", command.split()[1])])
+        elif command == "memstats":
+            self.write_memstats()
+        else:
+            print(f"Unknown forwarded command: {command}")
+
+    def write_memstats(self):
+        if not memstats.tracemalloc.is_tracing():
+            memstats.start_tracing() # First request: later ones report growth from here
+        text = memstats.format_report(memstats.report(self))
+        with open(memstats.MEMSTATS_PATH, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(text)
+
+    def run_maintenance(self):
+        try:
+            compact_stage_history()
+            prune_changes()
+        except Exception as e:
+            print(f"Maintenance error: {e}")
+        self.after(MAINTENANCE_INTERVAL_MS, self.run_maintenance)
+
+    def on_changes(self, events):
+        self.frames[Dashboard].on_changes(events)
+
     def apply_theme(self):
         theme = get_setting('theme', 'Light')
         
@@ -89,12 +197,31 @@ class LoadSheddingApp(tk.Tk):
 
     def minimize_to_tray(self):
         self.withdraw()
+        # Hidden: poll less often and stop repainting widgets
+        for poller, poll_ms in self.poll_intervals:
+            poller.poll_ms = max(poll_ms, BACKGROUND_POLL_MS)
+        self.frames[Dashboard].enter_background()
+
+    def restore_from_tray(self):
+        for poller, poll_ms in self.poll_intervals:
+            poller.poll_ms = poll_ms
+        if self.state() == "withdrawn":
+            self.frames[Dashboard].leave_background() # Rebuild while still hidden, then show once
+        self.deiconify()
         
     def quit_app(self):
+        stage_writer.flush()
+        if self.engine is not None:
+            self.engine.close()
+        if instance_server is not None:
+            instance_server.close()
         if hasattr(self.tray, 'stop'):
             self.tray.stop()
         self.destroy()
 
 if __name__ == "__main__":
+    bootstrap()
     app = LoadSheddingApp()
+    if startup_command != "show":
+        app.handle_command(startup_command)
     app.mainloop()
@@ -0,0 +1,87 @@
+import argparse
+from time import perf_counter
+import database
+
+# --- Maintenance Commands ---
+# Usage: python manage.py <command> [options]
+
+def cmd_backfill_rollup(args):
+    days = database.backfill_rollup()
+    print(f"Outage rollup rebuilt for {days} day(s).")
+
+def cmd_compact_history(args):
+    duplicates, archived = database.compact_stage_history(args.retention_days)
+    print(f"Removed {duplicates} duplicate stage row(s), archived {archived} row(s).")
+
+def cmd_export_ics(args):
+    import export
+    if args.all:
+        areas = sorted(database.load_all_schedules())
+        files, events = export.export_bulk_ics(args.out, areas, args.weeks)
+        print(f"Wrote {events} outage(s) across {files} file(s) to {args.out}")
+    elif args.user:
+        events = export.export_user_ics(args.out, args.user, args.weeks)
+        print(f"Wrote {events} outage(s) to {args.out}")
+    elif args.area:
+        events = export.export_area_ics(args.out, args.area, args.weeks)
+        print(f"Wrote {events} outage(s) to {args.out}")
+    else:
+        print("Specify --area, --user or --all")
+
+def cmd_ingest_stage_feed(args):
+    from stagefeed import StageFeed
+    path = args.path or database.get_setting('stage_feed_path')
+    if not path:
+        print("Specify a feed path or set the stage_feed_path setting")
+        return
+    feed = StageFeed(path)
+    applied = feed.drain()
+    print(f"Applied {applied} stage change(s); skipped {feed.rejected} malformed line(s).")
+
+def cmd_recompute(args):
+    from engine import Engine
+    engine = Engine(args.workers, args.weeks, args.out)
+    try:
+        started = perf_counter()
+        results = engine.run()
+        elapsed = perf_counter() - started
+    finally:
+        engine.close()
+    active = sum(1 for result in results.values() if result["active"])
+    print(f"Recomputed {len(results)} area(s) across {engine.shard_count} shard(s) in {elapsed:.2f}s; {active} in outage now.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load Shedding Tracker maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("backfill-rollup", help="Rebuild the daily outage rollup from stage history")
+    p.set_defaults(func=cmd_backfill_rollup)
+
+    p = sub.add_parser("compact-history", help="Collapse duplicate stages and archive old stage history")
+    p.add_argument("--retention-days", type=int, default=None, help="Keep this many days in the live table (default: setting or 90)")
+    p.set_defaults(func=cmd_compact_history)
+
+    p = sub.add_parser("export-ics", help="Export upcoming outages as iCalendar (.ics)")
+    p.add_argument("--area", help="Export a single area")
+    p.add_argument("--user", type=int, help="Export all locations of a user id")
+    p.add_argument("--all", action="store_true", help="Export every scheduled area, one file each (--out is a directory)")
+    p.add_argument("--weeks", type=int, default=4)
+    p.add_argument("--out", required=True, help="Output file, or directory with --all")
+    p.set_defaults(func=cmd_export_ics)
+
+    p = sub.add_parser("ingest-stage-feed", help="Apply pending events from the JSON-lines stage feed")
+    p.add_argument("path", nargs="?", help="Feed file or directory of .jsonl files (default: stage_feed_path setting)")
+    p.set_defaults(func=cmd_ingest_stage_feed)
+
+    p = sub.add_parser("recompute", help="Recompute every area's upcoming outages across worker processes")
+    p.add_argument("--workers", type=int, default=None, help="Shards / worker processes (default: CPU count)")
+    p.add_argument("--weeks", type=int, default=4)
+    p.add_argument("--out", help="Also write one .ics file per area into this directory")
+    p.set_defaults(func=cmd_recompute)
+
+    args = parser.parse_args(argv)
+    database.bootstrap()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
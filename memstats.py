@@ -0,0 +1,102 @@
+import gc
+import sys
+import tracemalloc
+import tkinter as tk
+from collections import Counter
+
+# --- Memory Instrumentation ---
+# On-demand numbers for the long-running tray process: Python heap (tracemalloc),
+# live Tk widgets and canvas items, and the size of every cache that can grow.
+# `python main.py --memstats` asks the running instance for a report.
+
+MEMSTATS_PATH = "memstats.txt"
+TOP_ALLOCATIONS = 15
+
+_baseline = None
+
+def start_tracing(frames=1):
+    """Starts tracemalloc (if needed) and records the baseline later reports diff against."""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    _baseline = tracemalloc.take_snapshot()
+
+def traced_bytes():
+    """(current, peak) bytes allocated by Python since tracing started."""
+    return tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+
+def top_growth(limit=TOP_ALLOCATIONS):
+    """Source lines whose allocations grew most since the baseline, as text lines."""
+    if _baseline is None:
+        return []
+    stats = tracemalloc.take_snapshot().compare_to(_baseline, "lineno")
+    return [str(stat) for stat in stats[:limit]]
+
+def widget_counts(root):
+    """Counter of live Tk widgets by class, walking the Tcl widget tree from `root`."""
+    counts = Counter()
+    pending = [str(root)]
+    while pending:
+        path = pending.pop()
+        counts[root.tk.call("winfo", "class", path)] += 1
+        pending.extend(str(child) for child in root.tk.splitlist(root.tk.call("winfo", "children", path)))
+    return counts
+
+def canvas_items(root):
+    """Total items across every live canvas."""
+    total = 0
+    pending = [root]
+    while pending:
+        widget = pending.pop()
+        if isinstance(widget, tk.Canvas):
+            total += len(widget.find_all())
+        pending.extend(widget.winfo_children())
+    return total
+
+def python_widgets():
+    """tkinter widget objects still referenced from Python, destroyed or not (leaks show up here)."""
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, tk.Misc))
+
+def cache_sizes():
+    import database
+    import utils
+    sizes = {
+        "expand_day": utils._expand_day.cache_info().currsize,
+        "week_blocks": utils._week_blocks.cache_info().currsize,
+        "outage_heatmap": utils._outage_heatmap.cache_info().currsize,
+        "historical_index": utils._historical_index.cache_info().currsize,
+        "session_users": len(database.user_cache),
+        "live_analytics_areas": len(utils.live_analytics.accumulators),
+        "stage_writer_listeners": len(database.stage_writer.listeners),
+        "change_feed_subscribers": len(database.change_feed.subscribers),
+    }
+    export = sys.modules.get("export")
+    if export is not None:
+        sizes["ics_events"] = export._area_events.cache_info().currsize
+    return sizes
+
+def report(root):
+    current, peak = traced_bytes()
+    widgets = widget_counts(root)
+    return {
+        "traced_kb": current // 1024,
+        "traced_peak_kb": peak // 1024,
+        "widgets": sum(widgets.values()),
+        "python_widgets": python_widgets(),
+        "canvas_items": canvas_items(root),
+        "widget_classes": dict(widgets.most_common()),
+        "caches": cache_sizes(),
+        "top_growth": top_growth(),
+    }
+
+def format_report(stats):
+    lines = [
+        f"Traced Python memory: {stats['traced_kb']} KB (peak {stats['traced_peak_kb']} KB)",
+        f"Tk widgets: {stats['widgets']} live, {stats['python_widgets']} Python objects; canvas items: {stats['canvas_items']}",
+        "Widgets by class: " + ", ".join(f"{name} {count}" for name, count in stats["widget_classes"].items()),
+        "Caches: " + ", ".join(f"{name} {size}" for name, size in stats["caches"].items()),
+    ]
+    if stats["top_growth"]:
+        lines.append("Top growth since baseline:")
+        lines.extend("  " + line for line in stats["top_growth"])
+    return "\n".join(lines)
@@ -0,0 +1,83 @@
+from bisect import bisect_right
+from datetime import datetime
+
+# --- Slot Parsing ---
+# Schedule slots are stored as "HH:MM - HH:MM" strings. These helpers turn them
+# into minute-of-day offsets so callers can do arithmetic without strptime.
+
+MINUTES_PER_DAY = 24 * 60
+NO_SCHEDULE = "No schedule available for this area"
+
+def parse_slot(slot):
+    """Returns (start_minute, end_minute) for a slot string, or None if malformed."""
+    try:
+        start_str, end_str = slot.split("-") # Spacing around the dash varies in CSVs
+        start_h, start_m = map(int, start_str.split(":"))
+        end_h, end_m = map(int, end_str.split(":"))
+    except (ValueError, AttributeError):
+        return None
+    return start_h * 60 + start_m, end_h * 60 + end_m
+
+def slot_duration(start, end):
+    # Slots that cross midnight (e.g. 22:00 - 00:30) wrap into the next day
+    return (end - start) % MINUTES_PER_DAY
+
+def compile_slots(slots):
+    """Parses a list of slot strings into sorted (start, end) minute pairs."""
+    compiled = []
+    for slot in slots:
+        parsed = parse_slot(slot)
+        if parsed:
+            compiled.append(parsed)
+    compiled.sort()
+    return compiled
+
+def daily_outage_minutes(slots):
+    return sum(slot_duration(start, end) for start, end in compile_slots(slots))
+
+def format_slot(start, end):
+    return f"{start // 60:02d}:{start % 60:02d} - {end // 60:02d}:{end % 60:02d}"
+
+def normalize_slot(slot):
+    """The stored form of a CSV slot ("8:00-10:00" -> "08:00 - 10:00"), as every importer writes it."""
+    parsed = parse_slot(slot)
+    return format_slot(*parsed) if parsed else slot.strip()
+
+def to_timestamp(dt):
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+def from_timestamp(value):
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+# --- Inverted Time Index ---
+
+class OutageIndex:
+    """Maps minute-of-day to the areas in outage: a bisect plus the size of the answer."""
+    def __init__(self, area_slots):
+        deltas = {}
+        for area, slots in area_slots.items():
+            for start, end in compile_slots(slots):
+                if start == end:
+                    continue
+                # Slots crossing midnight split into [start, 24:00) and [00:00, end)
+                spans = [(start, end)] if start < end else [(start, MINUTES_PER_DAY), (0, end)]
+                for span_start, span_end in spans:
+                    if span_end > span_start:
+                        deltas.setdefault(span_start, []).append((area, 1))
+                        deltas.setdefault(span_end, []).append((area, -1))
+
+        self.boundaries = sorted(set(deltas) | {0})
+        self.segments = []
+        active = {}
+        for minute in self.boundaries:
+            for area, delta in deltas.get(minute, ()):
+                count = active.get(area, 0) + delta
+                if count:
+                    active[area] = count
+                else:
+                    active.pop(area, None)
+            self.segments.append(tuple(sorted(active)))
+
+    def areas_at(self, minute):
+        i = bisect_right(self.boundaries, minute % MINUTES_PER_DAY) - 1
+        return self.segments[i]
@@ -0,0 +1,96 @@
+import os
+import mmap
+import struct
+from array import array
+from schedule import compile_slots, format_slot
+
+# --- Compiled Schedule Snapshot ---
+# A binary image of the schedules table, memory-mapped at startup so the first
+# dashboard paint needs neither SQL nor slot parsing.
+#
+# Layout (little-endian):
+#   header  MAGIC | format (u16) | schema_version (u32) | generation (u32)
+#           | area_count (u32) | slot_count (u32) | names_len (u32) | 2 pad bytes
+#   offsets (area_count + 1) * u32   -- slot index where each area starts
+#   slots   slot_count * 2 * u16     -- (start_minute, end_minute) pairs
+#   names   names_len bytes          -- area names, UTF-8, newline separated
+#
+# Schedules are not keyed by stage in this schema, so there is no stage table;
+# any stage above 0 applies an area's full slot list.
+
+MAGIC = b"LSSS"
+FORMAT = 1
+HEADER = struct.Struct("<4sHIIIIIxx") # Padded so the arrays below stay 4-byte aligned
+
+def write_snapshot(path, schema_version, generation, area_slots):
+    """Writes {area: [slot strings]} atomically. Slot order per area is preserved."""
+    names = []
+    offsets = array("I", [0])
+    slots = array("H")
+    for area, area_slots in area_slots.items():
+        for slot in area_slots:
+            parsed = compile_slots([slot])
+            if parsed:
+                slots.extend(parsed[0])
+        names.append(area)
+        offsets.append(len(slots) // 2)
+    names_blob = "\n".join(names).encode("utf-8")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT, schema_version, generation, len(names), len(slots) // 2, len(names_blob)))
+        offsets.tofile(f)
+        slots.tofile(f)
+        f.write(names_blob)
+    os.replace(tmp_path, path)
+
+class ScheduleSnapshot:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, fmt, self.schema_version, self.generation, area_count, slot_count, names_len = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or fmt != FORMAT:
+                raise ValueError(f"Unrecognised schedule snapshot: {path}")
+            pos = HEADER.size
+            # Zero-copy views straight onto the mapped file
+            view = memoryview(self._mm)
+            self._offsets = view[pos:pos + (area_count + 1) * 4].cast("I")
+            pos += (area_count + 1) * 4
+            self._slots = view[pos:pos + slot_count * 4].cast("H")
+            pos += slot_count * 4
+            names = bytes(view[pos:pos + names_len]).decode("utf-8")
+            self._area_index = {name: i for i, name in enumerate(names.split("\n"))} if area_count else {}
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        # Views must be released before the map can close
+        for attr in ("_offsets", "_slots"):
+            view = self.__dict__.pop(attr, None)
+            if view is not None:
+                view.release()
+        if getattr(self, "_mm", None) is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass
+        self._file.close()
+
+    def matches(self, schema_version, generation):
+        return self.schema_version == schema_version and self.generation == generation
+
+    def areas(self):
+        return list(self._area_index)
+
+    def compiled(self, area):
+        """(start, end) minute pairs for an area, in stored order; [] if unknown."""
+        i = self._area_index.get(area)
+        if i is None:
+            return []
+        lo, hi = self._offsets[i] * 2, self._offsets[i + 1] * 2
+        return [(self._slots[j], self._slots[j + 1]) for j in range(lo, hi, 2)]
+
+    def slots(self, area):
+        return [format_slot(start, end) for start, end in self.compiled(area)]
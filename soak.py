@@ -0,0 +1,126 @@
+import argparse
+import gc
+import importlib.util
+import sys
+import tkinter as tk
+from tkinter import ttk
+
+# --- Window Soak Test ---
+# Opens and closes every dashboard window over and over in one process, then
+# fails if Python memory, live Tk widgets or tkinter objects grew. Needs a
+# display; on a headless box run it under Xvfb:
+#   xvfb-run python soak.py [--cycles N] [--budget-kb K]
+# Logs in as the seeded admin against the database in the current directory;
+# windows are only opened and closed, so nothing is written beyond the
+# rollup refreshes the app does anyway.
+
+DEFAULT_CYCLES = 2000
+WARMUP_CYCLES = 50 # Lets bounded caches and Tk's own lazily created state fill first
+DEFAULT_BUDGET_KB = 1024
+
+class SoakApp(tk.Tk):
+    """What main.LoadSheddingApp gives the dashboard, minus the tray icon and instance lock."""
+    def __init__(self):
+        super().__init__()
+        from ui import LoginScreen, Dashboard
+        ttk.Style(self).theme_use('clam')
+        self.current_user = None
+        self.tray = self
+        container = ttk.Frame(self)
+        container.pack(fill="both", expand=True)
+        self.frames = {}
+        for F in (LoginScreen, Dashboard):
+            self.frames[F] = F(container, self)
+            self.frames[F].grid(row=0, column=0, sticky="nsew")
+
+    def update_status(self, is_power_on):
+        pass # No tray icon
+
+    def set_user(self, user):
+        self.current_user = user
+
+    def show_frame(self, cont):
+        frame = self.frames[cont]
+        frame.on_show()
+        frame.tkraise()
+
+def analytics_button(dashboard, text):
+    """Opens a window the way a user does: through its button in the analytics window."""
+    def open_window():
+        dashboard.show_analytics()
+        area = dashboard.current_location_data['area']
+        top = dashboard.windows[("analytics", area)]
+        next(button for button in top.winfo_children() if isinstance(button, ttk.Button) and button.cget("text") == text).invoke()
+    return open_window
+
+def window_openers(dashboard):
+    openers = {
+        "settings": dashboard.open_settings,
+        "add_location": dashboard.open_add_location,
+        "analytics": dashboard.show_analytics,
+        "calendar": dashboard.show_calendar,
+        "all_locations": dashboard.open_all_locations,
+        "stage_chart": analytics_button(dashboard, "Stage History Chart"),
+        "user_management": dashboard.open_user_management,
+        "dark_areas": dashboard.open_dark_areas,
+        "stage_planner": dashboard.open_stage_planner,
+        "simulator": dashboard.open_simulator,
+    }
+    if importlib.util.find_spec("numpy"):
+        openers["heatmap"] = analytics_button(dashboard, "Weekday × Hour Heatmap")
+    return openers
+
+def measure(app):
+    import memstats
+    gc.collect()
+    app.update()
+    stats = memstats.report(app)
+    return stats["traced_kb"], stats["widgets"], stats["python_widgets"]
+
+def run_cycles(app, dashboard, openers, cycles):
+    for _ in range(cycles):
+        for open_window in openers.values():
+            open_window()
+            app.update()
+        dashboard.close_windows()
+        app.update()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Open and close every window repeatedly and check for growth")
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES)
+    parser.add_argument("--budget-kb", type=int, default=DEFAULT_BUDGET_KB, help="Allowed growth in traced Python memory")
+    args = parser.parse_args(argv)
+
+    import memstats
+    from database import bootstrap, get_user_by_username, load_all_schedules
+    from ui import Dashboard
+
+    bootstrap()
+    app = SoakApp()
+    app.set_user(get_user_by_username("admin"))
+    app.show_frame(Dashboard)
+    dashboard = app.frames[Dashboard]
+    if not dashboard.current_location_data:
+        # The seeded admin has no saved locations; borrow any scheduled area (not saved)
+        area = next(iter(load_all_schedules()), "")
+        dashboard.current_location_data = {'id': None, 'name': "Soak", 'province': "", 'municipality': "", 'area': area}
+    openers = window_openers(dashboard)
+
+    run_cycles(app, dashboard, openers, WARMUP_CYCLES)
+    memstats.start_tracing()
+    before = measure(app)
+    run_cycles(app, dashboard, openers, args.cycles)
+    after = measure(app)
+
+    traced, widgets, python_widgets = (a - b for a, b in zip(after, before))
+    print(f"{args.cycles} cycles x {len(openers)} windows: traced memory {traced:+d} KB, "
+          f"Tk widgets {widgets:+d}, tkinter objects {python_widgets:+d}")
+    failed = traced > args.budget_kb or widgets > 0 or python_widgets > 0
+    if failed:
+        print("FAIL: memory grew")
+        print("\n".join(memstats.top_growth()))
+    app.destroy()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
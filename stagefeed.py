@@ -0,0 +1,141 @@
+import os
+import json
+from datetime import datetime
+from schedule import to_timestamp
+from database import apply_stage_events, get_setting
+from utils import MAX_STAGE
+
+# --- Stage Feed Ingestion ---
+# Upstream publishes stage announcements as JSON lines, one event per line:
+#   {"timestamp": "2024-05-01 16:00:00", "stage": 4}
+# The feed path is a single file or a directory of *.jsonl files (read in name
+# order). Each file is read from its saved offset; a line is only consumed once
+# its newline has been written, and offsets are committed together with the
+# events they cover. Files that shrink or are replaced are read again from the
+# start; replayed events are dropped by apply_stage_events.
+
+DEFAULT_POLL_MS = 1000
+DEFAULT_BATCH_SIZE = 5000
+READ_BYTES = 1024 * 1024
+OFFSET_KEY_PREFIX = "stage_feed_offset:"
+
+def parse_event(line):
+    """Returns (timestamp, stage) for one feed line; raises ValueError if it is malformed."""
+    try:
+        event = json.loads(line)
+        when = datetime.fromisoformat(str(event["timestamp"]))
+        stage = event["stage"]
+    except (KeyError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Malformed event {line[:80]!r}: {e}") from None
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None) # Stored timestamps are naive local time
+    if not isinstance(stage, int) or isinstance(stage, bool) or not 0 <= stage <= MAX_STAGE:
+        raise ValueError(f"Invalid stage {stage!r}")
+    return to_timestamp(when.replace(microsecond=0)), stage
+
+class StageFeed:
+    """Tails the feed and applies new events in batched transactions."""
+    def __init__(self, path, poll_ms=DEFAULT_POLL_MS, batch_size=DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.poll_ms = poll_ms
+        self.batch_size = batch_size
+        self.scheduler = None
+        self.subscribers = []
+        self.offsets = {} # file path -> (inode, offset), as last committed
+        self.applied = 0
+        self.rejected = 0
+
+    def subscribe(self, callback):
+        """callback([("stage", stage)]) runs after a batch changes the stage timeline."""
+        self.subscribers.append(callback)
+
+    def start(self, scheduler):
+        self.scheduler = scheduler
+        self.scheduler(0, self._tick)
+
+    def _tick(self):
+        pending = False
+        try:
+            pending = self.poll()
+        except Exception as e:
+            print(f"Stage feed error: {e}")
+        self.scheduler(1 if pending else self.poll_ms, self._tick)
+
+    def drain(self):
+        """Applies everything currently in the feed. Returns the number of events applied."""
+        before = self.applied
+        while self.poll():
+            pass
+        return self.applied - before
+
+    def _files(self):
+        if os.path.isdir(self.path):
+            return [os.path.join(self.path, name) for name in sorted(os.listdir(self.path)) if name.endswith(".jsonl")]
+        return [self.path] if os.path.exists(self.path) else []
+
+    def _offset(self, file_path, st):
+        if file_path not in self.offsets:
+            saved = get_setting(OFFSET_KEY_PREFIX + os.path.abspath(file_path))
+            inode, _, offset = (saved or "0:0").partition(":")
+            self.offsets[file_path] = (int(inode), int(offset))
+        inode, offset = self.offsets[file_path]
+        if inode != st.st_ino or offset > st.st_size:
+            return 0 # Rotated or truncated
+        return offset
+
+    def poll(self):
+        """Applies at most one batch. Returns True if unread events may remain."""
+        events = []
+        committed = {}
+        full = False
+        for file_path in self._files():
+            try:
+                st = os.stat(file_path)
+                offset = self._offset(file_path, st)
+                if offset == st.st_size:
+                    continue # Idle: nothing new, no read
+                with open(file_path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read(READ_BYTES)
+            except OSError as e:
+                print(f"Stage feed: cannot read {file_path}: {e}")
+                continue
+            end = data.rfind(b"\n") + 1 # Bytes up to the last complete line
+            pos = 0
+            if end == 0 and len(data) == READ_BYTES:
+                # No newline in a whole read: drop it rather than stall the feed
+                self.rejected += 1
+                print(f"Stage feed: skipping oversized line in {file_path}")
+                pos = end = len(data)
+            while pos < end:
+                line_end = data.index(b"\n", pos) + 1
+                line = data[pos:line_end].strip()
+                pos = line_end
+                if not line:
+                    continue
+                try:
+                    events.append(parse_event(line.decode("utf-8")))
+                except (ValueError, UnicodeDecodeError) as e:
+                    self.rejected += 1
+                    print(f"Stage feed: skipping line in {file_path}: {e}")
+                if len(events) >= self.batch_size:
+                    break
+            if pos:
+                committed[file_path] = (st.st_ino, offset + pos)
+            if len(events) >= self.batch_size or len(data) == READ_BYTES:
+                full = True
+                break
+        if not committed:
+            return False
+
+        applied = apply_stage_events(events, [
+            (OFFSET_KEY_PREFIX + os.path.abspath(file_path), f"{inode}:{offset}")
+            for file_path, (inode, offset) in committed.items()
+        ])
+        self.offsets.update(committed)
+        self.applied += applied
+        if applied:
+            stage = get_setting('current_stage', '0')
+            for callback in self.subscribers:
+                callback([("stage", stage)])
+        return full
@@ -0,0 +1,62 @@
+import importlib
+import os
+import sys
+from datetime import date, datetime
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEDULE_CSV = """area,time_slot
+Sandton,09:00 - 11:00
+Sandton,15:00 - 17:00
+Soweto,12:00 - 14:00
+Soweto,22:00 - 00:30
+Midrand,23:00 - 01:00
+"""
+
+class FrozenDatetime(datetime):
+    current = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current if cls.current is not None else datetime.now(tz)
+
+class FrozenDate(date):
+    @classmethod
+    def today(cls):
+        return FrozenDatetime.current.date() if FrozenDatetime.current is not None else date.today()
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A bootstrapped database with SCHEDULE_CSV loaded, in an empty directory (database opens its files relative to the cwd)."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "load_shedding_schedule.csv").write_text(SCHEDULE_CSV)
+    import database
+    database.conn.close()
+    database = importlib.reload(database)
+    for name in ("utils", "export"):
+        importlib.reload(importlib.import_module(name)) # Their caches key on generations that restart with the database
+    database.bootstrap()
+    yield database
+    database.conn.close()
+
+@pytest.fixture
+def clock(db, monkeypatch):
+    """Pins datetime.now() and date.today() in database, utils and export; set clock.current to a datetime."""
+    import export
+    import utils
+    monkeypatch.setattr(db, "datetime", FrozenDatetime)
+    monkeypatch.setattr(db, "date", FrozenDate)
+    monkeypatch.setattr(utils, "datetime", FrozenDatetime)
+    monkeypatch.setattr(export, "datetime", FrozenDatetime)
+    yield FrozenDatetime
+    FrozenDatetime.current = None
+
+@pytest.fixture
+def import_schedule(db, tmp_path):
+    """import_schedule(csv_text) replaces the schedules through import_csv_to_db."""
+    def import_schedule(text):
+        path = tmp_path / "import.csv"
+        path.write_text(text)
+        db.import_csv_to_db(str(path))
+    return import_schedule
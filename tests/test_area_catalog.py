@@ -0,0 +1,44 @@
+import os
+
+CATALOG = [
+    ("Gauteng", "City of Johannesburg", "Sandton"),
+    ("Gauteng", "City of Johannesburg", "Soweto"),
+    ("Gauteng", "City of Johannesburg", "Midrand"),
+    ("Gauteng", "City of Tshwane", "Pretoria East"),
+    ("Gauteng", "City of Tshwane", "Ga-Rankuwa Zone 16"),
+    ("Western Cape", "City of Cape Town", "Sea Point"),
+    ("Western Cape", "City of Cape Town", "St. James"),
+    ("Western Cape", "City of Cape Town", "Kenilworth"),
+]
+
+def load_catalog(db, rows=CATALOG):
+    with open("areas.csv", "w", encoding="utf-8") as f:
+        f.write("province,municipality,area\n")
+        f.writelines(f"{province},{municipality}, {area}\n" for province, municipality, area in rows)
+    return db.sync_area_catalog()
+
+def test_catalog_reloads_only_when_the_file_changes(db):
+    assert load_catalog(db)
+    generation = db.get_area_catalog_generation()
+    assert not db.sync_area_catalog()
+    assert db.get_provinces() == ["Gauteng", "Western Cape"]
+    assert db.get_municipalities("Gauteng") == ["City of Johannesburg", "City of Tshwane"]
+
+    os.utime("areas.csv", ns=(1, 1)) # Same size, new mtime
+    assert load_catalog(db, CATALOG[:3])
+    assert db.get_area_catalog_generation() == generation + 1
+    assert sorted(db.get_all_area_names()) == ["Midrand", "Sandton", "Soweto"]
+
+def test_search_matches_a_brute_force_filter(db):
+    load_catalog(db)
+    names = sorted(area for _, _, area in CATALOG)
+    for text in ("S", "So", "ton", "TON", "ea", "a P", "zone 1", "James", "xyz", "  Mid "):
+        needle = text.strip()
+        if len(needle) < 3:
+            expected = [name for name in names if name.startswith(needle)]
+        else:
+            expected = [name for name in names if needle.lower() in name.lower()]
+        assert [row[0] for row in db.search_areas(text)] == expected, text
+    assert db.search_areas("") == []
+    assert len(db.search_areas("e", limit=2)) <= 2
+    assert db.search_areas("Sea Point") == [("Sea Point", "City of Cape Town", "Western Cape")]
@@ -0,0 +1,58 @@
+from concurrent.futures import Future
+from hashlib import sha256
+import auth
+
+COST = 1000 # Keeps the KDF fast in tests
+
+def test_hash_verifies_and_is_salted():
+    stored = auth.hash_password("hunter2", COST)
+    assert stored.startswith(f"pbkdf2_sha256${COST}$")
+    assert stored != auth.hash_password("hunter2", COST)
+    assert auth.verify_password("hunter2", stored, COST) == (True, False)
+    assert auth.verify_password("hunter3", stored, COST) == (False, False)
+
+def test_legacy_and_under_cost_hashes_need_an_upgrade():
+    legacy = sha256(b"hunter2").hexdigest()
+    assert auth.verify_password("hunter2", legacy, COST) == (True, True)
+    assert auth.verify_password("nope", legacy, COST) == (False, True)
+    cheap = auth.hash_password("hunter2", COST // 2)
+    assert auth.verify_password("hunter2", cheap, COST) == (True, True)
+
+def test_unusable_hashes_never_verify():
+    for stored in ("", None, "pbkdf2_sha256$x$00$00", "pbkdf2_sha256$1000$zz$00"):
+        assert auth.verify_password("hunter2", stored, COST) == (False, False)
+    assert auth.verify_missing_user("hunter2", COST) == (False, False)
+
+class FakeWidget:
+    def __init__(self):
+        self.pending = []
+
+    def after(self, delay_ms, callback):
+        self.pending.append(callback)
+
+def test_when_done_delivers_results_and_errors_on_the_widget_loop():
+    widget = FakeWidget()
+    future = Future()
+    results, errors = [], []
+    auth.when_done(widget, future, results.append, errors.append)
+    assert results == [] and len(widget.pending) == 1
+    future.set_result((True, False))
+    widget.pending.pop()()
+    assert results == [(True, False)] and errors == []
+
+    failing = Future()
+    failing.set_exception(ValueError("boom"))
+    auth.when_done(widget, failing, results.append, errors.append)
+    assert [str(error) for error in errors] == ["boom"] and len(results) == 1
+
+def test_session_cache_expires_and_invalidates(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(auth.time, "monotonic", lambda: now[0])
+    cache = auth.SessionCache(ttl_seconds=60)
+    cache.put(1, ("row",))
+    assert cache.get(1) == ("row",)
+    now[0] += 61
+    assert cache.get(1) is None and len(cache) == 0
+    cache.put(2, ("row",))
+    cache.invalidate(2)
+    assert cache.get(2) is None
@@ -0,0 +1,53 @@
+import pytest
+
+def add_users(db, count):
+    user_ids = []
+    for n in range(count):
+        db.cursor.execute(
+            "INSERT INTO users (username, password, area, role, province, municipality) VALUES (?, ?, ?, ?, ?, ?)",
+            (f"user{n}", "x", "Sandton", "user", "Gauteng", "Johannesburg")
+        )
+        user_ids.append(db.cursor.lastrowid)
+        db.add_user_location(user_ids[-1], "Home", "Gauteng", "Johannesburg", "Sandton")
+    return user_ids
+
+def count_commits(db):
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    return lambda: sum(1 for sql in statements if sql.strip().upper() == "COMMIT")
+
+def impact_users(db, area):
+    return {row[0]: row[2] for row in db.get_area_impact()}[area]
+
+def test_bulk_updates_commit_once(db):
+    user_ids = add_users(db, 5)
+    commits = count_commits(db)
+    db.update_users_role(user_ids, "admin")
+    db.set_users_password_hash(user_ids, "new-hash")
+    assert commits() == 2
+    db.cursor.execute(f"SELECT DISTINCT role, password FROM users WHERE id IN ({','.join('?' * len(user_ids))})", user_ids)
+    assert db.cursor.fetchall() == [("admin", "new-hash")]
+    db.cursor.execute("SELECT COUNT(*) FROM changes WHERE kind='user'")
+    assert db.cursor.fetchone()[0] == 10
+
+def test_bulk_delete_removes_locations_and_recounts(db):
+    user_ids = add_users(db, 4)
+    assert impact_users(db, "Sandton") == 4
+    commits = count_commits(db)
+    db.delete_users(user_ids[:3])
+    assert commits() == 1
+    db.cursor.execute("SELECT user_id FROM user_locations")
+    assert db.cursor.fetchall() == [(user_ids[3],)]
+    assert impact_users(db, "Sandton") == 1
+    assert db.get_user(user_ids[0]) is None
+
+def test_failed_bulk_delete_changes_nothing(db, monkeypatch):
+    user_ids = add_users(db, 3)
+    def fail(areas):
+        raise RuntimeError("recount failed")
+    monkeypatch.setattr(db, "_refresh_area_users", fail)
+    with pytest.raises(RuntimeError):
+        db.delete_users(user_ids)
+    db.cursor.execute("SELECT COUNT(*) FROM user_locations")
+    assert db.cursor.fetchone()[0] == 3
+    assert all(db.get_user(uid) is not None for uid in user_ids)
@@ -0,0 +1,40 @@
+import sqlite3
+
+def other_process(db):
+    """A second connection writing under its own origin, as another instance would."""
+    connection = sqlite3.connect(db.DB_PATH)
+    def write(*changes):
+        connection.executemany("INSERT INTO changes (kind, subject, origin) VALUES (?, ?, 'other')", changes)
+        connection.commit()
+    return write
+
+def test_feed_delivers_other_instances_changes_only(db):
+    feed = db.ChangeFeed(1000)
+    write = other_process(db)
+    write(("stage", "1")) # Logged before the feed started: skipped
+    assert feed.poll() == []
+    assert feed.poll() == [] # Nothing committed elsewhere since
+
+    db.record_change("stage", 2)
+    db.conn.commit()
+    write(("stage", "4"), ("locations", "7"))
+    assert feed.poll() == [("stage", "4"), ("locations", "7")]
+    assert feed.poll() == []
+
+def test_user_change_invalidates_the_cache(db):
+    admin = db.get_user_by_username("admin")
+    feed = db.ChangeFeed(1000)
+    feed.poll()
+    db.get_user(admin[0])
+    assert len(db.user_cache) == 1
+    other_process(db)(("user", str(admin[0])))
+    assert feed.poll() == [("user", str(admin[0]))]
+    assert len(db.user_cache) == 0
+
+def test_missed_pruned_rows_raise_reset(db):
+    feed = db.ChangeFeed(1000)
+    feed.poll()
+    write = other_process(db)
+    write(*[("stage", str(stage)) for stage in range(1, 6)])
+    db.prune_changes(keep=2)
+    assert feed.poll() == [("reset", None), ("stage", "4"), ("stage", "5")]
@@ -0,0 +1,43 @@
+from datetime import datetime, time, timedelta
+from schedule import to_timestamp
+
+def csv_for(area):
+    return f"area,time_slot\n{area},10:00 - 11:00\n"
+
+def dark(utils, when):
+    return [area for area, _ in utils.get_dark_areas(when)[1]]
+
+def test_dark_areas_now_and_in_the_past(db, clock, import_schedule):
+    import utils
+    start = datetime.combine(datetime.now().date() - timedelta(days=1), time(10))
+    clock.current = start - timedelta(hours=2)
+    db.set_current_stage(2)
+    import_schedule(csv_for("Sandton"))
+    clock.current = start + timedelta(hours=1)
+    import_schedule(csv_for("Soweto"))
+    clock.current = start + timedelta(hours=3)
+
+    assert dark(utils, start + timedelta(minutes=30)) == ["Sandton"] # Under the older schedule
+    assert dark(utils, start + timedelta(days=1, minutes=30)) == ["Soweto"]
+    assert dark(utils, start + timedelta(minutes=90)) == []
+    db.apply_stage_events([(to_timestamp(start + timedelta(minutes=20)), 0)])
+    assert utils.get_dark_areas(start + timedelta(minutes=30)) == (0, [])
+
+def test_historical_index_sees_a_version_replaced_in_the_same_second(db, clock, import_schedule):
+    import utils
+    start = datetime.combine(datetime.now().date() - timedelta(days=1), time(10))
+    clock.current = start - timedelta(hours=2)
+    db.set_current_stage(2)
+    clock.current = start
+    import_schedule(csv_for("Sandton"))
+    clock.current = start + timedelta(hours=1)
+    import_schedule(csv_for("Soweto"))
+    clock.current = start + timedelta(hours=3)
+    assert dark(utils, start + timedelta(minutes=30)) == ["Sandton"]
+
+    # A second import stamped with the same second replaces the version at `start`
+    clock.current = start
+    import_schedule("area,time_slot\nSandton,10:00 - 10:15\n")
+    clock.current = start + timedelta(hours=3)
+    assert dark(utils, start + timedelta(minutes=5)) == ["Sandton"]
+    assert dark(utils, start + timedelta(minutes=30)) == []
@@ -0,0 +1,42 @@
+import os
+from datetime import datetime, time, timedelta
+import pytest
+from ics import file_name
+
+@pytest.fixture
+def run_engine(db):
+    engines = []
+    def run_engine(workers, export_dir=None):
+        from engine import Engine
+        engines.append(Engine(workers, weeks=1, export_dir=export_dir))
+        return engines[-1].run()
+    yield run_engine
+    for engine in engines:
+        engine.close()
+
+def expected_for(area, before, after):
+    """What one area's result should hold, from outages_between; `next` may be judged at either moment."""
+    import utils
+    start = datetime.combine(before.date(), time.min)
+    outages = list(utils.outages_between(area, start, start + timedelta(weeks=1)))
+    upcoming = {next((outage for outage in outages if outage[1] > now), None) for now in (before, after)}
+    return len(outages), sum(int((hi - lo).total_seconds()) for lo, hi, _ in outages) // 60, upcoming
+
+def test_shards_match_outages_between(db, run_engine, tmp_path):
+    db.set_current_stage(4)
+    before = datetime.now()
+    results = run_engine(2, export_dir=str(tmp_path / "ics"))
+    after = datetime.now()
+    assert sorted(results) == sorted(db.load_all_schedules())
+    for area, result in results.items():
+        count, minutes, upcoming = expected_for(area, before, after)
+        assert (result["outages"], result["minutes"]) == (count, minutes)
+        assert result["next"] in upcoming
+        assert result["outages"] > 0
+    assert sorted(os.listdir(tmp_path / "ics")) == sorted(file_name(area) for area in results)
+
+def test_shard_count_does_not_change_results(db, run_engine):
+    db.set_current_stage(2)
+    single = run_engine(1)
+    sharded = run_engine(3)
+    assert {area: (r["outages"], r["minutes"]) for area, r in single.items()} == {area: (r["outages"], r["minutes"]) for area, r in sharded.items()}
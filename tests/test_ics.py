@@ -0,0 +1,51 @@
+import io
+import re
+from datetime import datetime, time, timedelta
+from ics import CRLF, MAX_LINE_OCTETS, fold
+
+def unfold(text):
+    return text.replace(CRLF + " ", "")
+
+def test_fold_splits_on_octets_not_characters():
+    line = "SUMMARY:Load Shedding - " + "Ga-Rankuwa Zone 16 Ému " * 5
+    folded = fold(line)
+    assert unfold(folded) == line
+    assert all(len(part.encode("utf-8")) <= MAX_LINE_OCTETS for part in folded.split(CRLF))
+    assert fold("DTSTART:20260101T100000") == "DTSTART:20260101T100000"
+
+def events(text):
+    return re.findall(r"BEGIN:VEVENT\r\n(.*?)END:VEVENT", unfold(text), re.S)
+
+def field(event, name):
+    return re.search(rf"^{name}:(.*)$", event, re.M).group(1).rstrip("\r")
+
+def test_feed_lists_upcoming_outages_with_stable_uids(db, clock):
+    import export
+    today = datetime.combine(datetime.now().date(), time.min)
+    db.cursor.execute("DELETE FROM stage_history") # Sample rows sit at the real clock
+    clock.current = today + timedelta(hours=8)
+    db.set_current_stage(2)
+    clock.current = today + timedelta(hours=10) # Sandton is out 09:00-11:00 and 15:00-17:00
+
+    first, second = io.StringIO(), io.StringIO()
+    count = export.write_ics(first, ["Sandton", "Sandton"], weeks=1)
+    export.write_ics(second, ["Sandton"], weeks=1)
+
+    found = events(first.getvalue())
+    assert count == len(found) > 0
+    starts = [field(event, "DTSTART") for event in found]
+    assert starts[0] == today.strftime("%Y%m%dT090000") # Under way: keeps its real start
+    assert all(field(event, "DTEND") > clock.current.strftime("%Y%m%dT%H%M%S") for event in found)
+    uids = [field(event, "UID") for event in found]
+    assert len(set(uids)) == len(uids)
+    assert uids == [field(event, "UID") for event in events(second.getvalue())]
+    assert first.getvalue().startswith("BEGIN:VCALENDAR" + CRLF) and first.getvalue().endswith("END:VCALENDAR" + CRLF)
+
+def test_bulk_export_keeps_areas_with_similar_names_apart(db, tmp_path):
+    import export
+    from ics import file_name
+    assert file_name("Sandton") == "Sandton.ics"
+    assert file_name("St. James") != file_name("St James")
+    files, _ = export.export_bulk_ics(str(tmp_path / "out"), ["St. James", "St James", "Sandton"])
+    assert files == 3
+    assert len(list((tmp_path / "out").iterdir())) == 3
@@ -0,0 +1,46 @@
+import pytest
+from ingest import ScheduleReader
+
+def read(tmp_path, text, batch_size=2):
+    path = tmp_path / "schedule.csv"
+    path.write_bytes(text.encode("utf-8"))
+    reader = ScheduleReader(str(path), batch_size)
+    rows = [row for batch in reader.rows() for row in batch]
+    return rows, reader.daily_minutes()
+
+def test_columns_are_found_by_header(tmp_path):
+    text = (
+        "time_slot,notes,area\r\n"
+        "08:00 - 10:00,,Sandton\r\n"
+        '22:00 - 00:30,"late, crosses midnight", Soweto \r\n'
+        "\r\n"
+        "8:00-10:00,x,Sandton\r\n"
+    )
+    rows, minutes = read(tmp_path, text)
+    assert rows == [("Sandton", "08:00 - 10:00"), ("Soweto", "22:00 - 00:30"), ("Sandton", "08:00 - 10:00")]
+    assert minutes == {"Sandton": 240, "Soweto": 150}
+
+def test_repeated_lines_share_one_tuple(tmp_path):
+    rows, _ = read(tmp_path, "area,time_slot\n" + "Sandton,09:00 - 11:00\n" * 5, batch_size=10)
+    assert len(rows) == 5 and all(row is rows[0] for row in rows)
+
+@pytest.mark.parametrize("text, message", [
+    ("area,slot\nSandton,09:00 - 11:00\n", "CSV missing 'area' or 'time_slot' columns"),
+    ("area,time_slot\nSandton,09:00 - 11:00\nSoweto,25:00 - 26:00\n", "Row 3: Invalid time"),
+    ("area,time_slot\nSandton\n", "Row 2: Missing 'area' or 'time_slot' field"),
+])
+def test_bad_input_names_the_row(tmp_path, text, message):
+    with pytest.raises(ValueError, match=message):
+        read(tmp_path, text)
+
+def test_both_importers_store_the_same_rows(db, tmp_path):
+    path = tmp_path / "loose.csv"
+    path.write_text("area,time_slot\nSandton,8:00 - 10:00\nSoweto , 22:00-00:30\nMidrand,09:15 -  9:45\n")
+    db.import_csv_to_db(str(path))
+    stored = db.cursor.execute("SELECT area, time_slot FROM schedules ORDER BY id").fetchall()
+    versions = db.cursor.execute("SELECT COUNT(*) FROM schedule_versions").fetchone()[0]
+    assert stored == [("Sandton", "08:00 - 10:00"), ("Soweto", "22:00 - 00:30"), ("Midrand", "09:15 - 09:45")]
+
+    db.import_csv_to_db_mmap(str(path))
+    assert db.cursor.execute("SELECT area, time_slot FROM schedules ORDER BY id").fetchall() == stored
+    assert db.cursor.execute("SELECT COUNT(*) FROM schedule_versions").fetchone()[0] == versions
@@ -0,0 +1,42 @@
+import socket
+import instance
+
+def start_server(tmp_path, monkeypatch, handler):
+    monkeypatch.chdir(tmp_path)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind((instance.HOST, 0))
+    sock.listen(5)
+    server = instance.InstanceServer(sock, "secret")
+    server.serve(handler)
+    return server, sock.getsockname()[1]
+
+def send_line(port, line):
+    with socket.create_connection((instance.HOST, port), timeout=instance.TIMEOUT_SECONDS) as sock:
+        sock.sendall(line)
+        return sock.makefile("rb").readline().strip()
+
+def test_bad_tokens_are_denied_and_the_guard_keeps_serving(tmp_path, monkeypatch):
+    commands = []
+    server, port = start_server(tmp_path, monkeypatch, commands.append)
+    try:
+        assert send_line(port, "sécret show\n".encode("utf-8")) == b"denied"
+        assert send_line(port, b"\xff\xfe show\n") == b"denied"
+        assert send_line(port, b"wrong show\n") == b"denied"
+        assert send_line(port, b"secret stage 4\n") == b"ok"
+    finally:
+        server.close()
+    assert commands == ["stage 4"]
+
+def test_failing_handler_does_not_stop_the_guard(tmp_path, monkeypatch):
+    commands = []
+    def handler(command):
+        commands.append(command)
+        if command == "boom":
+            raise ValueError(command)
+    server, port = start_server(tmp_path, monkeypatch, handler)
+    try:
+        assert send_line(port, b"secret boom\n") == b"ok"
+        assert send_line(port, b"secret show\n") == b"ok"
+    finally:
+        server.close()
+    assert commands == ["boom", "show"]
@@ -0,0 +1,63 @@
+from datetime import datetime, time, timedelta
+from schedule import compile_slots, to_timestamp
+
+NEW_SCHEDULE_CSV = """area,time_slot
+Sandton,10:00 - 12:00
+Soweto,23:30 - 02:00
+Midrand,06:00 - 06:00
+"""
+
+def in_slot(slots, minute):
+    for start, end in slots:
+        if start < end and start <= minute < end:
+            return True
+        if start > end and (minute >= start or minute < end):
+            return True
+    return False
+
+def minute_walk(db, area, start, end):
+    """{minute: stage} for every minute in [start, end) that is in an outage, one lookup per minute."""
+    outage = {}
+    moment = start
+    while moment < end:
+        stamp = to_timestamp(moment)
+        stage = db.get_stage_before(to_timestamp(moment + timedelta(seconds=1)))
+        if stage > 0 and in_slot(compile_slots(db.get_schedule_at(area, stamp)), moment.hour * 60 + moment.minute):
+            outage[moment] = stage
+        moment += timedelta(minutes=1)
+    return outage
+
+def outage_minutes(outages):
+    minutes = {}
+    for lo, hi, stage in outages:
+        assert lo < hi
+        moment = lo
+        while moment < hi:
+            minutes[moment] = stage
+            moment += timedelta(minutes=1)
+    return minutes
+
+def test_outages_between_matches_minute_walk(db, clock, import_schedule):
+    import utils
+    base = datetime.combine(datetime.now().date(), time.min) - timedelta(days=10)
+    clock.current = base + timedelta(days=3, hours=1)
+    db.cursor.execute("DELETE FROM stage_history") # Sample rows sit at the real clock's seconds
+    db.backfill_rollup()
+    db.apply_stage_events([
+        (to_timestamp(base + timedelta(hours=10, minutes=30)), 2),
+        (to_timestamp(base + timedelta(days=1, hours=16)), 0),
+        (to_timestamp(base + timedelta(days=1, hours=23, minutes=15)), 4),
+        (to_timestamp(base + timedelta(days=2, hours=0, minutes=45)), 6),
+    ])
+    # A new schedule from a minute boundary on day 3; earlier moments keep the old one
+    clock.current = base + timedelta(days=3, hours=11)
+    import_schedule(NEW_SCHEDULE_CSV)
+    clock.current = base + timedelta(days=6)
+
+    start, end = base + timedelta(hours=8), base + timedelta(days=5)
+    for area in ("Sandton", "Soweto", "Midrand"):
+        outages = list(utils.outages_between(area, start, end))
+        assert outages
+        assert outages == sorted(outages)
+        assert all(outages[i][1] <= outages[i + 1][0] for i in range(len(outages) - 1))
+        assert outage_minutes(outages) == minute_walk(db, area, start, end)
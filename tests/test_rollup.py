@@ -0,0 +1,74 @@
+import random
+from datetime import date, datetime, time, timedelta
+import pytest
+from schedule import daily_outage_minutes, to_timestamp
+
+def random_events(start, end, seed):
+    rng = random.Random(seed)
+    events = []
+    moment = start
+    while True:
+        moment += timedelta(minutes=rng.randint(200, 3000))
+        if moment >= end:
+            return events
+        events.append((to_timestamp(moment), rng.choice([0, 2, 4])))
+
+def day_walk(db, area, start_date, end_date):
+    """Outage minutes the slow way: each day counts in full when it ended above stage 0."""
+    minutes = daily_outage_minutes(db.load_schedule_from_db(area))
+    total = 0
+    day = start_date
+    while day <= end_date:
+        if db.get_stage_before(to_timestamp(datetime.combine(day, time(23, 59, 59)) + timedelta(seconds=1))) > 0:
+            total += minutes
+        day += timedelta(days=1)
+    return total
+
+def ranges(today):
+    return [
+        (today - timedelta(days=today.weekday()), today),
+        (today.replace(day=1), today),
+        (today - timedelta(days=100), today - timedelta(days=40)),
+        (today - timedelta(days=1), today),
+        (today, today)
+    ]
+
+def test_rollup_matches_day_walk(db):
+    now = datetime.now().replace(microsecond=0)
+    db.apply_stage_events(random_events(now - timedelta(days=120), now - timedelta(hours=1), seed=3))
+    db.set_current_stage(3)
+    areas = sorted(db.load_all_schedules())
+    for start, end in ranges(now.date()):
+        by_area = db.get_outage_minutes_by_area(start, end)
+        for area in areas:
+            expected = day_walk(db, area, start, end)
+            assert db.get_outage_minutes(area, start, end) == expected
+            assert by_area.get(area, 0) == expected
+
+def test_backfilled_events_update_the_rollup(db):
+    now = datetime.now().replace(microsecond=0)
+    db.apply_stage_events(random_events(now - timedelta(days=60), now - timedelta(hours=1), seed=4))
+    db.get_outage_minutes("Sandton", now.date() - timedelta(days=60), now.date()) # Rolls everything up
+    db.apply_stage_events(random_events(now - timedelta(days=90), now - timedelta(days=10), seed=5))
+    start = now.date() - timedelta(days=90)
+    assert db.get_outage_minutes("Sandton", start, now.date()) == day_walk(db, "Sandton", start, now.date())
+
+
+# Sunday into Monday, month end, and a plain weekday
+@pytest.mark.parametrize("day", [date(2026, 5, 31), date(2026, 6, 30), date(2026, 3, 11)])
+def test_accumulator_rolls_over_midnight(db, clock, day):
+    import utils
+    clock.current = datetime.combine(day, time(23, 30))
+    db.apply_stage_events(random_events(clock.current - timedelta(days=70), clock.current - timedelta(hours=2), seed=day.toordinal()))
+    db.apply_stage_events([(to_timestamp(clock.current - timedelta(hours=1)), 2)])
+    db.backfill_rollup()
+    accumulator = utils.AnalyticsAccumulator("Soweto")
+    assert accumulator.totals() == utils.get_analytics("Soweto")
+
+    clock.current = datetime.combine(day + timedelta(days=1), time(0, 30))
+    accumulator.roll(clock.current.date())
+    assert accumulator.totals() == utils.get_analytics("Soweto")
+
+    db.set_current_stage(0)
+    accumulator.set_stage(0)
+    assert accumulator.totals() == utils.get_analytics("Soweto")
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from schedule import to_timestamp
+
+SEED = {
+    "Sandton": ["09:00 - 11:00", "15:00 - 17:00"],
+    "Soweto": ["12:00 - 14:00", "22:00 - 00:30"],
+    "Midrand": ["23:00 - 01:00"]
+}
+
+def test_schedules_answer_for_any_moment(db, clock, import_schedule):
+    first = datetime(2024, 3, 1, 8)
+    second = first + timedelta(days=7)
+    clock.current = first
+    import_schedule("area,time_slot\nSandton,10:00 - 12:00\nSoweto,12:00 - 14:00\nSoweto,22:00 - 00:30\nMidrand,23:00 - 01:00\n")
+    clock.current = second
+    import_schedule("area,time_slot\nSandton,10:00 - 12:00\nSoweto,06:00 - 08:00\n")
+
+    before, during, after = (to_timestamp(moment) for moment in (first - timedelta(seconds=1), first, second + timedelta(days=1)))
+    assert db.get_schedule_at("Sandton", before) == SEED["Sandton"]
+    assert db.get_schedule_at("Sandton", during) == ["10:00 - 12:00"]
+    assert db.get_schedule_at("Sandton", after) == ["10:00 - 12:00"]
+    assert db.get_schedule_at("Midrand", after) == []
+    assert db.get_schedule_at("Nowhere", after) == []
+
+    assert db.get_schedules_at(before) == SEED
+    assert db.get_schedules_at(during) == dict(SEED, Sandton=["10:00 - 12:00"])
+    assert db.get_schedules_at(after) == {"Sandton": ["10:00 - 12:00"], "Soweto": ["06:00 - 08:00"]}
+    assert db.get_schedule_version_at(before) == db.SCHEDULE_EPOCH
+    assert db.get_schedule_version_at(after) == to_timestamp(second)
+
+def test_schedule_changes_list_each_new_version(db, clock, import_schedule):
+    first = datetime(2024, 3, 1, 8)
+    clock.current = first
+    import_schedule("area,time_slot\nSandton,10:00 - 12:00\nSoweto,12:00 - 14:00\nSoweto,22:00 - 00:30\n")
+    clock.current = first + timedelta(days=1)
+    import_schedule("area,time_slot\nSandton,10:00 - 12:00\nSoweto,12:00 - 14:00\nSoweto,22:00 - 00:30\nMidrand,00:00 - 02:00\n")
+
+    changes = db.get_schedule_changes(db.SCHEDULE_EPOCH, to_timestamp(first + timedelta(days=2)))
+    assert changes == [
+        (to_timestamp(first), "Midrand", []),
+        (to_timestamp(first), "Sandton", ["10:00 - 12:00"]),
+        (to_timestamp(first + timedelta(days=1)), "Midrand", ["00:00 - 02:00"])
+    ]
+    assert db.get_schedule_changes(to_timestamp(first), to_timestamp(first + timedelta(days=2)), area="Sandton") == []
@@ -0,0 +1,35 @@
+import pytest
+from snapshot import ScheduleSnapshot, write_snapshot
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "schedules.snapshot")
+    area_slots = {"Sandton": ["15:00 - 17:00", "09:00 - 11:00"], "Ga-Rankuwa Zone 16 Ému": ["22:00 - 00:30"], "Empty": []}
+    write_snapshot(path, 3, 42, area_slots)
+    snapshot = ScheduleSnapshot(path)
+    try:
+        assert snapshot.matches(3, 42) and not snapshot.matches(3, 43) and not snapshot.matches(4, 42)
+        assert snapshot.areas() == list(area_slots)
+        assert snapshot.slots("Sandton") == ["15:00 - 17:00", "09:00 - 11:00"] # Stored order
+        assert snapshot.compiled("Ga-Rankuwa Zone 16 Ému") == [(1320, 30)]
+        assert snapshot.slots("Empty") == [] and snapshot.slots("Atlantis") == []
+    finally:
+        snapshot.close()
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "schedules.snapshot"
+    path.write_bytes(b"NOPE" + bytes(64))
+    with pytest.raises(ValueError):
+        ScheduleSnapshot(str(path))
+
+def test_warm_start_maps_the_snapshot_written_by_an_import(db, import_schedule):
+    from schedule import compile_slots
+    import_schedule("area,time_slot\nSandton,10:00 - 12:00\nSoweto,23:30 - 02:00\nSoweto,06:00 - 07:00\n")
+    db.schedule_snapshot.close()
+    db.schedule_snapshot = None
+    from_sql = {area: db.load_schedule_from_db(area) for area in ("Sandton", "Soweto", "Atlantis")}
+
+    db.open_schedule_snapshot() # As at the next start: the file matches the database
+    assert db.schedule_snapshot is not None
+    for area, slots in from_sql.items():
+        assert db.load_schedule_from_db(area) == slots
+        assert db.get_compiled_schedule(area) == compile_slots(slots)
@@ -0,0 +1,88 @@
+import importlib
+import json
+import os
+from datetime import datetime
+import pytest
+
+EVENTS = [
+    ("2024-05-01 08:00:00", 3),
+    ("2024-05-01 08:00:00", 5),
+    ("2024-05-01 09:30:00", 2),
+    ("2024-05-01 09:30:00", 2),
+    ("2024-05-01 12:00:00", 0),
+    ("2024-05-01 12:00:00", 4),
+    ("2024-05-01 12:00:00", 0)
+]
+
+def empty_history(db, clock):
+    clock.current = datetime(2024, 5, 2, 8)
+    db.cursor.execute("DELETE FROM stage_history")
+    db.conn.commit()
+
+def test_replayed_batch_changes_nothing(db, clock):
+    empty_history(db, clock)
+    assert db.apply_stage_events(EVENTS) == 6
+    history = db.get_stage_history()
+    assert [stage for _, stage in history] == [3, 5, 2, 0, 4, 0]
+
+    assert db.apply_stage_events(EVENTS) == 0
+    assert db.apply_stage_events(list(reversed(EVENTS[:2])) + EVENTS[2:]) == 0
+    assert db.get_stage_history() == history
+    assert db.get_current_stage() == 0
+
+def test_new_event_in_a_stored_second_is_still_applied(db, clock):
+    empty_history(db, clock)
+    db.apply_stage_events(EVENTS[:2])
+    assert db.apply_stage_events(EVENTS[:2] + [("2024-05-01 08:00:00", 1)]) == 1
+    assert [stage for _, stage in db.get_stage_history()] == [3, 5, 1]
+
+@pytest.fixture
+def stagefeed(db):
+    import stagefeed
+    return importlib.reload(stagefeed) # Binds to the freshly reloaded database
+
+def write_lines(path, events, mode="a"):
+    with open(path, mode) as f:
+        for timestamp, stage in events:
+            f.write(json.dumps({"timestamp": timestamp, "stage": stage}) + "\n")
+
+def test_feed_resumes_from_saved_offsets(db, clock, stagefeed, tmp_path):
+    empty_history(db, clock)
+    path = tmp_path / "feed.jsonl"
+    write_lines(path, EVENTS[:4])
+    with open(path, "a") as f:
+        f.write('{"timestamp": "2024-05-01 12:00:00", "st') # Still being written
+    assert stagefeed.StageFeed(str(path)).drain() == 3
+
+    restarted = stagefeed.StageFeed(str(path))
+    assert restarted.drain() == 0
+    with open(path, "a") as f:
+        f.write('age": 0}\n')
+    write_lines(path, EVENTS[5:])
+    assert restarted.drain() == 3
+    assert [stage for _, stage in db.get_stage_history()] == [3, 5, 2, 0, 4, 0]
+
+def test_rewritten_feed_is_read_again_without_duplicates(db, clock, stagefeed, tmp_path):
+    empty_history(db, clock)
+    path = tmp_path / "feed.jsonl"
+    write_lines(path, EVENTS)
+    stagefeed.StageFeed(str(path)).drain()
+    history = db.get_stage_history()
+    replacement = tmp_path / "feed.new"
+    write_lines(replacement, EVENTS[:2], mode="w")
+    os.replace(replacement, path)
+    feed = stagefeed.StageFeed(str(path))
+    assert feed.drain() == 0 and feed.offsets[str(path)][1] == path.stat().st_size
+    assert db.get_stage_history() == history
+
+def test_offsets_commit_with_their_events(db, clock, stagefeed, tmp_path, monkeypatch):
+    empty_history(db, clock)
+    path = tmp_path / "feed.jsonl"
+    write_lines(path, EVENTS[:2])
+    def fail():
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(db, "_roll_today", fail)
+    with pytest.raises(RuntimeError):
+        stagefeed.StageFeed(str(path)).poll()
+    assert db.get_stage_history() == []
+    assert db.get_setting(stagefeed.OFFSET_KEY_PREFIX + str(path)) is None
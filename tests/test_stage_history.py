@@ -0,0 +1,49 @@
+import random
+from datetime import datetime, timedelta
+from schedule import to_timestamp
+
+def write_history(db, days, seed):
+    """Stage writes every few hours over the last `days` days, repeats included, as the app records them."""
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    moment = now - timedelta(days=days)
+    while True:
+        moment += timedelta(minutes=rng.randint(60, 2000))
+        if moment >= now:
+            break
+        db.stage_writer.write(rng.choice([0, 2, 2, 4]), to_timestamp(moment))
+    db.stage_writer.flush()
+
+def merged(spans):
+    # Repeated stages split a span in two; compaction joins them again
+    out = []
+    for span in spans:
+        if out and out[-1][2] == span[2] and out[-1][1] == span[0]:
+            out[-1] = (out[-1][0], span[1], span[2])
+        else:
+            out.append(span)
+    return out
+
+def test_compaction_keeps_the_stage_timeline(db):
+    import utils
+    write_history(db, 200, seed=1)
+    now = datetime.now()
+    windows = [(now - timedelta(days=200), now), (now - timedelta(days=120), now - timedelta(days=60)), (now - timedelta(days=30), now + timedelta(days=7))]
+    before = [merged(utils.get_stage_spans(start, end)) for start, end in windows]
+    history = db.get_stage_history()
+
+    duplicates, archived = db.compact_stage_history(90)
+
+    assert duplicates > 0 and archived > 0
+    assert len(db.stage_archive) == archived
+    assert db.cursor.execute("SELECT MIN(timestamp) FROM stage_history").fetchone()[0] >= to_timestamp(now - timedelta(days=91))
+    assert [merged(utils.get_stage_spans(start, end)) for start, end in windows] == before
+    expected = [row for i, row in enumerate(history) if i == 0 or row[1] != history[i - 1][1]]
+    assert db.get_stage_history() == expected
+
+def test_compaction_is_idempotent(db):
+    write_history(db, 200, seed=2)
+    db.compact_stage_history(90)
+    history = db.get_stage_history()
+    assert db.compact_stage_history(90) == (0, 0)
+    assert db.get_stage_history() == history
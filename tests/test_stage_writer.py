@@ -0,0 +1,36 @@
+import sqlite3
+
+def other_connection(db):
+    return sqlite3.connect(db.DB_PATH)
+
+def stage_rows(connection):
+    stage = connection.execute("SELECT value FROM settings WHERE key='current_stage'").fetchone()[0]
+    history = connection.execute("SELECT stage FROM stage_history ORDER BY id").fetchall()
+    return int(stage), [row[0] for row in history]
+
+def test_writes_close_together_share_one_commit(db):
+    flushes = []
+    db.stage_writer.scheduler = lambda delay_ms, callback: flushes.append(callback)
+    db.stage_writer.commit_interval_ms = 60 * 1000
+    db.set_current_stage(1) # Long since the last commit: goes out at once
+    reader = other_connection(db)
+    before = stage_rows(reader)
+    commits = db.stage_writer.commits
+
+    db.set_current_stage(3)
+    db.set_current_stage(5)
+    assert len(flushes) == 1
+    assert stage_rows(reader) == before # Neither row is visible until the group commits
+    assert db.get_current_stage() == 5
+
+    flushes[0]()
+    assert db.stage_writer.commits == commits + 1
+    assert stage_rows(reader) == (5, before[1] + [3, 5])
+    assert db.get_stage_write_stats()["pending"] == 0
+
+def test_write_without_scheduler_commits_at_once(db):
+    reader = other_connection(db)
+    db.set_current_stage(4)
+    assert not db.conn.in_transaction
+    stage, history = stage_rows(reader)
+    assert stage == 4 and history[-1] == 4
@@ -0,0 +1,49 @@
+import validation
+
+AREAS = frozenset({"Sandton", "Soweto"})
+
+def write_csv(tmp_path, rows):
+    path = tmp_path / "schedule.csv"
+    path.write_text("area,time_slot\n" + "".join(row + "\n" for row in rows))
+    return str(path)
+
+def rows_with_errors(count):
+    rows = []
+    for i in range(count):
+        if i % 97 == 5:
+            rows.append("Atlantis,09:00 - 11:00")
+        elif i % 89 == 7:
+            rows.append("Soweto,25:00 - 26:00")
+        else:
+            rows.append("Sandton,09:00 - 11:00" if i % 2 else "Soweto,12:00 - 14:00")
+    return rows
+
+def test_errors_carry_file_row_numbers(tmp_path):
+    path = write_csv(tmp_path, ["Sandton,09:00 - 11:00", "Atlantis,09:00 - 11:00", "", "Soweto,9am"])
+    ok, errors = validation.validate_csv_report(path, AREAS, workers=1)
+    assert not ok
+    assert errors == [(3, "Unknown area 'Atlantis'"), (5, "Invalid time format '9am'. Expected HH:MM - HH:MM")]
+
+def test_parallel_report_matches_serial(tmp_path, monkeypatch):
+    rows = rows_with_errors(5000)
+    path = write_csv(tmp_path, rows)
+    serial = validation.validate_csv_report(path, AREAS, workers=1)
+    monkeypatch.setattr(validation, "PARALLEL_THRESHOLD_BYTES", 0)
+    parallel = validation.validate_csv_report(path, AREAS, workers=3)
+    assert parallel == serial
+    assert [row for row, _ in serial[1]] == [i + 2 for i, row in enumerate(rows) if not row.startswith(("Sandton", "Soweto,12"))]
+
+def test_missing_columns(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("region,slot\nSandton,09:00 - 11:00\n")
+    assert validation.validate_csv_report(str(path), AREAS) == (False, [(1, "CSV missing 'area' or 'time_slot' columns")])
+
+def test_empty_area_set_is_used_as_given_off_the_db_thread(db, tmp_path):
+    import threading
+    import utils
+    path = write_csv(tmp_path, ["Sandton,09:00 - 11:00"])
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(report=utils.validate_csv_full(path, valid_areas=frozenset())))
+    worker.start()
+    worker.join()
+    assert result["report"] == (False, [(2, "Unknown area 'Sandton'")])
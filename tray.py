@@ -45,7 +45,7 @@ class TrayIcon:
             self.icon.icon = self.create_image(color)
 
     def show_app(self, icon, item):
-        self.app.after(0, self.app.deiconify)
+        self.app.after(0, self.app.restore_from_tray)
 
     def exit_app(self, icon, item):
         self.icon.stop()
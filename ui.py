@@ -2,15 +2,108 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import sqlite3
 import random
-from database import cursor, conn, hash_password, get_current_stage, set_current_stage, load_schedule_from_db, import_csv_to_db, add_user_location, get_user_locations, delete_user_location, update_user_location, get_setting, set_setting, get_all_users, delete_user, update_user_role, update_user_password
-from utils import LOCATIONS, validate_csv, calculate_next_outage, get_analytics
+import threading
+import auth
+from database import cursor, conn, user_cache, get_user, get_user_by_username, set_user_password_hash, get_kdf_iterations, get_current_stage, set_current_stage, load_schedule_from_db, load_schedules_for_areas, get_schedule_generation, import_csv_to_db_mmap, add_user_location, get_user_locations, delete_user_location, update_user_location, get_setting, set_setting, get_all_users, delete_users, update_users_role, set_users_password_hash, get_stage_write_stats, get_first_stage_timestamp, get_stage_buckets, get_provinces, get_municipalities, get_catalog_areas, search_areas
+from export import export_user_ics
+from utils import validate_csv_full, get_valid_areas, calculate_next_outage, live_analytics, get_dark_areas, StagePlan, get_week_blocks, get_outage_heatmap
 import sys 
 import os
-import winshell
-from win32com.client import Dispatch
-from datetime import datetime
+from datetime import datetime, timedelta
+
+# While minimized to the tray the dashboard only wakes for the next alert or
+# outage boundary, and at least this often (clock changes, missed events)
+BACKGROUND_MAX_SLEEP_MS = 15 * 60 * 1000
+ALERT_LEAD_SECONDS = 1800
+# "All my locations" countdown refresh; only cells whose text changed are touched
+ALL_LOCATIONS_TICK_MS = 5000
+ALL_LOCATIONS_BACKGROUND_TICK_MS = 60 * 1000
+
+class LocationPickerMixin:
+    """Cascading province / municipality / area combos with type-to-search on the area field."""
+    def bind_location_pickers(self, parent_frame):
+        self.province_cb['values'] = get_provinces()
+        self.province_cb.bind("<<ComboboxSelected>>", self.on_province_change)
+        self.municipality_cb.bind("<<ComboboxSelected>>", self.on_municipality_change)
+
+        # Type-to-search on the area field; suggestions overlay the widgets below it
+        self.area_cb.configure(state="normal")
+        self.area_cb.bind("<KeyRelease>", self.on_area_typed)
+        self.area_cb.bind("<Down>", self.focus_suggestions)
+        self.suggest_list = tk.Listbox(parent_frame, height=6, font=("Segoe UI", 9), activestyle="dotbox")
+        self.suggest_list.bind("<ButtonRelease-1>", self.pick_suggestion)
+        self.suggest_list.bind("<Return>", self.pick_suggestion)
+        self.suggest_list.bind("<Escape>", lambda event: self.hide_suggestions())
+        self.suggestions = []
+        self.search_after_id = None
+
+    def on_province_change(self, event):
+        province = self.province_cb.get()
+        self.municipality_cb['values'] = get_municipalities(province) if province else []
+        self.municipality_cb.set('')
+        self.area_cb['values'] = []
+        self.area_cb.set('')
 
-class BaseFrame(ttk.Frame):
+    def on_municipality_change(self, event):
+        province = self.province_cb.get()
+        municipality = self.municipality_cb.get()
+        if province and municipality:
+            self.area_cb['values'] = get_catalog_areas(province, municipality)
+            self.area_cb.set('')
+
+    def set_location(self, province, municipality, area):
+        self.province_cb.set(province)
+        self.municipality_cb['values'] = get_municipalities(province)
+        self.municipality_cb.set(municipality)
+        self.area_cb['values'] = get_catalog_areas(province, municipality)
+        self.area_cb.set(area)
+
+    def on_area_typed(self, event):
+        if event.keysym in ("Down", "Up", "Return", "Escape", "Tab"):
+            return
+        # Debounce so fast typing runs one search
+        if self.search_after_id:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(150, self.run_area_search)
+
+    def run_area_search(self):
+        self.search_after_id = None
+        text = self.area_cb.get()
+        self.suggestions = search_areas(text)
+        if not self.suggestions or (len(self.suggestions) == 1 and self.suggestions[0][0] == text):
+            self.hide_suggestions()
+            return
+        self.suggest_list.delete(0, tk.END)
+        for area, municipality, province in self.suggestions:
+            self.suggest_list.insert(tk.END, f"{area} — {municipality}, {province}")
+        self.suggest_list.place(in_=self.area_cb, x=0, rely=1.0, relwidth=1.0)
+        self.suggest_list.lift()
+
+    def focus_suggestions(self, event):
+        if self.suggestions:
+            self.suggest_list.focus_set()
+            self.suggest_list.selection_clear(0, tk.END)
+            self.suggest_list.selection_set(0)
+            self.suggest_list.activate(0)
+            return "break"
+
+    def pick_suggestion(self, event):
+        selection = self.suggest_list.curselection()
+        if selection:
+            area, municipality, province = self.suggestions[selection[0]]
+            self.set_location(province, municipality, area)
+        self.hide_suggestions()
+        self.area_cb.focus_set()
+
+    def hide_suggestions(self):
+        self.suggestions = []
+        self.suggest_list.place_forget()
+
+    def location_is_valid(self, province, municipality, area):
+        return area in get_catalog_areas(province, municipality)
+
+
+class BaseFrame(LocationPickerMixin, ttk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent, padding="20 20 20 20")
         self.controller = controller
@@ -25,37 +118,20 @@ class BaseFrame(ttk.Frame):
     def setup_cascading_combos(self, parent_frame, row_start):
         # Province
         ttk.Label(parent_frame, text="Province").grid(row=row_start, column=0, sticky="e", padx=5, pady=5)
-        self.province_cb = ttk.Combobox(parent_frame, state="readonly", values=list(LOCATIONS.keys()))
+        self.province_cb = ttk.Combobox(parent_frame, state="readonly")
         self.province_cb.grid(row=row_start, column=1, sticky="w", padx=5, pady=5)
-        self.province_cb.bind("<<ComboboxSelected>>", self.on_province_change)
 
         # Municipality
         ttk.Label(parent_frame, text="Municipality").grid(row=row_start+1, column=0, sticky="e", padx=5, pady=5)
         self.municipality_cb = ttk.Combobox(parent_frame, state="readonly")
         self.municipality_cb.grid(row=row_start+1, column=1, sticky="w", padx=5, pady=5)
-        self.municipality_cb.bind("<<ComboboxSelected>>", self.on_municipality_change)
 
         # Area
         ttk.Label(parent_frame, text="Area / Suburb").grid(row=row_start+2, column=0, sticky="e", padx=5, pady=5)
-        self.area_cb = ttk.Combobox(parent_frame, state="readonly")
+        self.area_cb = ttk.Combobox(parent_frame)
         self.area_cb.grid(row=row_start+2, column=1, sticky="w", padx=5, pady=5)
 
-    def on_province_change(self, event):
-        province = self.province_cb.get()
-        if province in LOCATIONS:
-            municipalities = list(LOCATIONS[province].keys())
-            self.municipality_cb['values'] = municipalities
-            self.municipality_cb.set('')
-            self.area_cb['values'] = []
-            self.area_cb.set('')
-
-    def on_municipality_change(self, event):
-        province = self.province_cb.get()
-        municipality = self.municipality_cb.get()
-        if province in LOCATIONS and municipality in LOCATIONS[province]:
-            areas = LOCATIONS[province][municipality]
-            self.area_cb['values'] = areas
-            self.area_cb.set('')
+        self.bind_location_pickers(parent_frame)
 
 
 class LoginScreen(BaseFrame):
@@ -80,27 +156,49 @@ class LoginScreen(BaseFrame):
         btn_frame = ttk.Frame(self)
         btn_frame.grid(row=3, column=0, columnspan=2, pady=20)
         
-        ttk.Button(btn_frame, text="Login", command=self.login_user).pack(side="left", padx=5)
+        self.login_btn = ttk.Button(btn_frame, text="Login", command=self.login_user)
+        self.login_btn.pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Register", command=lambda: controller.show_frame(RegisterScreen)).pack(side="left", padx=5)
 
     def on_show(self):
         self.clear_entries([self.username_entry, self.password_entry])
 
     def login_user(self):
+        if str(self.login_btn['state']) == "disabled":
+            return # Verification already running
         username = self.username_entry.get()
         password = self.password_entry.get()
 
-        cursor.execute(
-            "SELECT * FROM users WHERE username=? AND password=?",
-            (username, hash_password(password))
-        )
-        user = cursor.fetchone()
-
+        # Look up by username only; the slow KDF check runs on the auth pool
+        user = get_user_by_username(username)
+        iterations = get_kdf_iterations()
         if user:
-            self.controller.set_user(user)
-            self.controller.show_frame(Dashboard)
+            future = auth.submit(auth.verify_password, password, user[2], iterations)
         else:
+            future = auth.submit(auth.verify_missing_user, password, iterations)
+
+        self.login_btn.config(state="disabled")
+        auth.when_done(self, future, lambda result: self.finish_login(user, password, result), self.login_failed)
+
+    def login_failed(self, error):
+        self.login_btn.config(state="normal")
+        messagebox.showerror("Error", f"Login failed: {error}")
+
+    def finish_login(self, user, password, result):
+        self.login_btn.config(state="normal")
+        ok, needs_upgrade = result
+        if not ok:
             messagebox.showerror("Error", "Invalid username or password")
+            return
+
+        if needs_upgrade:
+            # Re-hash legacy / under-cost passwords in the background
+            user_id = user[0]
+            auth.when_done(self, auth.submit(auth.hash_password, password, get_kdf_iterations()),
+                           lambda new_hash: set_user_password_hash(user_id, new_hash))
+
+        self.controller.set_user(user)
+        self.controller.show_frame(Dashboard)
 
 
 class RegisterScreen(BaseFrame):
@@ -127,7 +225,8 @@ class RegisterScreen(BaseFrame):
         btn_frame = ttk.Frame(self)
         btn_frame.grid(row=6, column=0, columnspan=2, pady=20)
 
-        ttk.Button(btn_frame, text="Sign Up", command=self.register_user).pack(side="left", padx=5)
+        self.signup_btn = ttk.Button(btn_frame, text="Sign Up", command=self.register_user)
+        self.signup_btn.pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Back to Login", command=lambda: controller.show_frame(LoginScreen)).pack(side="left", padx=5)
 
     def on_show(self):
@@ -140,6 +239,8 @@ class RegisterScreen(BaseFrame):
         self.area_cb['values'] = []
 
     def register_user(self):
+        if str(self.signup_btn['state']) == "disabled":
+            return # Hash already running
         username = self.username_entry.get()
         password = self.password_entry.get()
         province = self.province_cb.get()
@@ -149,11 +250,32 @@ class RegisterScreen(BaseFrame):
         if not username or not password or not area or not province or not municipality:
             messagebox.showerror("Error", "All fields are required")
             return
+        if not self.location_is_valid(province, municipality, area):
+            messagebox.showerror("Error", "Please pick an area from the list")
+            return
 
+        if get_user_by_username(username):
+            messagebox.showerror("Error", "Username already exists")
+            return
+
+        # Hash off the Tk thread, then insert
+        self.config(cursor="watch")
+        self.signup_btn.config(state="disabled")
+        future = auth.submit(auth.hash_password, password, get_kdf_iterations())
+        auth.when_done(self, future, lambda password_hash: self.finish_register(username, password_hash, area, province, municipality), self.register_failed)
+
+    def register_failed(self, error):
+        self.config(cursor="")
+        self.signup_btn.config(state="normal")
+        messagebox.showerror("Error", f"Registration failed: {error}")
+
+    def finish_register(self, username, password_hash, area, province, municipality):
+        self.config(cursor="")
+        self.signup_btn.config(state="normal")
         try:
             cursor.execute(
                 "INSERT INTO users (username, password, area, role, province, municipality) VALUES (?, ?, ?, ?, ?, ?)",
-                (username, hash_password(password), area, 'user', province, municipality)
+                (username, password_hash, area, 'user', province, municipality)
             )
             conn.commit()
             messagebox.showinfo("Success", "Registration successful!")
@@ -166,6 +288,9 @@ class Dashboard(BaseFrame):
     def __init__(self, parent, controller):
         super().__init__(parent, controller)
         self.columnconfigure(0, weight=1)
+        self.background = False # True while the window is hidden in the tray
+        self.needs_full_refresh = False
+        self.engine_results = {} # {area: result} from engine.Engine, when the app runs one
 
         self.welcome_label = ttk.Label(self, text="", style="Title.TLabel")
         self.welcome_label.grid(row=0, column=0, pady=(0, 5))
@@ -185,6 +310,8 @@ class Dashboard(BaseFrame):
         
         ttk.Button(loc_frame, text="+", width=3, command=self.open_add_location).pack(side="left", padx=2)
         ttk.Button(loc_frame, text="-", width=3, command=self.delete_current_location).pack(side="left", padx=2)
+        ttk.Button(loc_frame, text="All", width=4, command=self.open_all_locations).pack(side="left", padx=2)
+        self.windows = {} # Open tool windows by key; see open_window
         
         # Countdown Label
         self.countdown_label = ttk.Label(self, text="", font=("Segoe UI", 12, "bold"), foreground="red")
@@ -215,16 +342,45 @@ class Dashboard(BaseFrame):
         # Analytics Button
         ttk.Button(self, text="View History & Analytics", command=self.show_analytics).grid(row=5, column=0, pady=(10, 5))
         
-        # Calendar Button
-        ttk.Button(self, text="View Calendar", command=self.show_calendar).grid(row=6, column=0, pady=5)
+        # Calendar Buttons
+        cal_frame = ttk.Frame(self)
+        cal_frame.grid(row=6, column=0, pady=5)
+        ttk.Button(cal_frame, text="View Calendar", command=self.show_calendar).pack(side="left", padx=5)
+        ttk.Button(cal_frame, text="Export to Calendar (.ics)", command=self.export_calendar).pack(side="left", padx=5)
+
+        ttk.Button(self, text="Logout", command=self.logout).grid(row=7, column=0, pady=10)
+
+    def logout(self):
+        self.close_windows()
+        user_cache.invalidate()
+        self.controller.set_user(None)
+        self.controller.show_frame(LoginScreen)
+
+    def open_window(self, key, factory):
+        """Brings the open window for `key` to the front, or creates it with factory()."""
+        self.windows = {k: w for k, w in self.windows.items() if w.winfo_exists()}
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = factory()
+        else:
+            window.deiconify()
+            window.lift()
+        return window
 
-        ttk.Button(self, text="Logout", command=lambda: controller.show_frame(LoginScreen)).grid(row=7, column=0, pady=10)
+    def close_windows(self):
+        for window in self.windows.values():
+            if window.winfo_exists():
+                window.destroy()
+        self.windows = {}
 
     def open_add_location(self):
-        AddLocationWindow(self)
+        self.open_window("add_location", lambda: AddLocationWindow(self))
 
     def open_settings(self):
-        SettingsWindow(self)
+        self.open_window("settings", lambda: SettingsWindow(self))
+
+    def open_all_locations(self):
+        self.open_window("all_locations", lambda: AllLocationsWindow(self, getattr(self, 'locations', [])))
 
     def delete_current_location(self):
         if not self.current_location_data:
@@ -254,16 +410,8 @@ class Dashboard(BaseFrame):
         data = self.current_location_data
         
         # Pre-fill update combos
-        self.province_cb.set(data['province'] if data['province'] in LOCATIONS else '')
-        self.municipality_cb.set(data['municipality']) 
-        
-        # Trigger updates
-        if data['province'] in LOCATIONS:
-            self.on_province_change(None)
-            self.municipality_cb.set(data['municipality'])
-            if data['municipality'] in LOCATIONS[data['province']]:
-                 self.on_municipality_change(None)
-                 self.area_cb.set(data['area'])
+        self.hide_suggestions()
+        self.set_location(data['province'], data['municipality'], data['area'])
 
         current_stage = get_current_stage()
         self.load_schedule(data['area'], current_stage)
@@ -273,25 +421,35 @@ class Dashboard(BaseFrame):
         if not self.current_location_data:
              return
         user_area = self.current_location_data['area']
-        CalendarWindow(self, user_area)
+        self.open_window(("calendar", user_area), lambda: CalendarWindow(self, user_area))
+
+    def export_calendar(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".ics", filetypes=[("iCalendar Files", "*.ics")], initialfile="load_shedding.ics")
+        if file_path:
+            try:
+                count = export_user_ics(file_path, self.user_id)
+                messagebox.showinfo("Success", f"Exported {count} upcoming outage(s) for all your locations.")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to export calendar: {e}")
 
     def show_analytics(self):
         if not self.current_location_data:
              return
         user_area = self.current_location_data['area']
-        stats = get_analytics(user_area)
-        
-        # Create Toplevel Window
+        self.open_window(("analytics", user_area), lambda: self.build_analytics_window(user_area))
+
+    def build_analytics_window(self, user_area):
         top = tk.Toplevel(self)
         top.title("Outage History & Analytics")
-        top.geometry("400x400")
+        top.geometry("400x480")
+        week_var, this_month_var, last_month_var, diff_var = (tk.StringVar() for _ in range(4))
         
         ttk.Label(top, text="Outage Statistics", font=("Segoe UI", 16, "bold")).pack(pady=20)
         
         # This Week
         f1 = ttk.LabelFrame(top, text="This Week (Since Mon)", padding=10)
         f1.pack(fill="x", padx=20, pady=5)
-        ttk.Label(f1, text=f"{stats['this_week']:.1f} Hours", font=("Segoe UI", 14, "bold"), foreground="Orange").pack()
+        ttk.Label(f1, textvariable=week_var, font=("Segoe UI", 14, "bold"), foreground="Orange").pack()
         
         # Month Comparison
         f2 = ttk.LabelFrame(top, text="Monthly Comparison", padding=10)
@@ -299,17 +457,35 @@ class Dashboard(BaseFrame):
         
         # Grid layout for month compare
         ttk.Label(f2, text="This Month:").grid(row=0, column=0, sticky="e", padx=5)
-        ttk.Label(f2, text=f"{stats['this_month']:.1f} Hours", font=("Segoe UI", 12, "bold")).grid(row=0, column=1, sticky="w")
+        ttk.Label(f2, textvariable=this_month_var, font=("Segoe UI", 12, "bold")).grid(row=0, column=1, sticky="w")
         
         ttk.Label(f2, text="Last Month:").grid(row=1, column=0, sticky="e", padx=5)
-        ttk.Label(f2, text=f"{stats['last_month']:.1f} Hours", font=("Segoe UI", 12, "bold")).grid(row=1, column=1, sticky="w")
+        ttk.Label(f2, textvariable=last_month_var, font=("Segoe UI", 12, "bold")).grid(row=1, column=1, sticky="w")
         
-        # Comparison logic
-        diff = stats['this_month'] - stats['last_month']
-        color = "red" if diff > 0 else "green"
-        indicator = "▲" if diff > 0 else "▼" if diff < 0 else "="
-        
-        ttk.Label(f2, text=f"Diff: {diff:+.1f}h {indicator}", foreground=color).grid(row=2, column=0, columnspan=2, pady=5)
+        diff_label = ttk.Label(f2, textvariable=diff_var)
+        diff_label.grid(row=2, column=0, columnspan=2, pady=5)
+
+        # Live totals (see utils.LiveAnalytics); Tk skips redraws when a value is unchanged
+        def show(stats):
+            week_var.set(f"{stats['this_week']:.1f} Hours")
+            this_month_var.set(f"{stats['this_month']:.1f} Hours")
+            last_month_var.set(f"{stats['last_month']:.1f} Hours")
+            # Comparison logic
+            diff = stats['this_month'] - stats['last_month']
+            indicator = "▲" if diff > 0 else "▼" if diff < 0 else "="
+            diff_var.set(f"Diff: {diff:+.1f}h {indicator}")
+            diff_label.config(foreground="red" if diff > 0 else "green")
+
+        def on_destroy(event):
+            if event.widget is top: # Children's <Destroy> events bubble up to the Toplevel too
+                live_analytics.unsubscribe(user_area, show)
+
+        live_analytics.subscribe(user_area, show)
+        top.bind("<Destroy>", on_destroy, add="+")
+
+        ttk.Button(top, text="Weekday × Hour Heatmap", command=lambda: self.open_window(("heatmap", user_area), lambda: HeatmapWindow(self, user_area))).pack(pady=(15, 5))
+        ttk.Button(top, text="Stage History Chart", command=lambda: self.open_window("stage_chart", lambda: StageChartWindow(self))).pack(pady=5)
+        return top
 
     def on_show(self):
         user = self.controller.current_user
@@ -318,9 +494,8 @@ class Dashboard(BaseFrame):
 
         # Unpack user
         try:
-            # Fetch fresh from DB
-            cursor.execute("SELECT * FROM users WHERE id=?", (user[0],))
-            user = cursor.fetchone()
+            # Fetch fresh (served from the session cache between changes)
+            user = get_user(user[0])
             self.controller.current_user = user 
             
             # Helper to safely unpack (id, username, password, area, role, province, municipality)
@@ -345,6 +520,9 @@ class Dashboard(BaseFrame):
         # Format: "Name - Area"
         loc_values = [f"{loc[1]} - {loc[4]}" for loc in self.locations]
         self.location_selector['values'] = loc_values
+        window = self.windows.get("all_locations")
+        if window is not None and window.winfo_exists():
+            window.set_locations(self.locations)
         
         if self.locations:
             self.location_selector.current(0)
@@ -355,14 +533,87 @@ class Dashboard(BaseFrame):
             
         self.setup_admin_controls(role)
         
+    def on_changes(self, events):
+        """Applies changes made by other instances (see database.ChangeFeed), refreshing only what they touch."""
+        if any(kind in ("stage", "schedule", "reset") for kind, _ in events):
+            live_analytics.refresh() # May include backfilled days or a new schedule
+        if not self.controller.current_user or not hasattr(self, 'user_id'):
+            return
+        user_subject = str(self.user_id)
+        if any(kind == "reset" or (kind in ("user", "locations") and subject == user_subject) for kind, subject in events):
+            if self.background:
+                self.needs_full_refresh = True # Rebuilt on restore
+                self.update_timer()
+                return
+            if get_user(self.user_id) is None:
+                self.logout() # Account deleted by an admin elsewhere
+            else:
+                self.on_show() # Role, locations or the account itself changed
+            return
+        if not self.current_location_data:
+            return
+        area = self.current_location_data['area']
+        if any(kind == "stage" or (kind == "schedule" and subject in (None, area)) for kind, subject in events):
+            if not self.background:
+                self.load_schedule(area)
+            self.update_timer()
+
+    def on_engine_results(self, results):
+        self.engine_results = results
+        window = self.windows.get("all_locations")
+        if window is not None and window.winfo_exists() and not self.background:
+            window.tick()
+
+    # --- Background (tray) mode ---
+
+    def enter_background(self):
+        self.background = True
+        self.set_window_cadence(ALL_LOCATIONS_BACKGROUND_TICK_MS)
+        self.schedule_list.delete(0, tk.END) # Nobody sees it; rebuilt on restore
+        if self.controller.current_user:
+            self.update_timer() # Re-arm at the background cadence
+
+    def leave_background(self):
+        self.background = False
+        self.set_window_cadence(ALL_LOCATIONS_TICK_MS)
+        if not self.controller.current_user:
+            return
+        if self.needs_full_refresh:
+            self.needs_full_refresh = False
+            if get_user(self.user_id) is None:
+                self.logout()
+            else:
+                self.on_show()
+        elif self.current_location_data:
+            self.load_schedule(self.current_location_data['area'])
+            self.update_timer()
+
+    def set_window_cadence(self, tick_ms):
+        window = self.windows.get("all_locations")
+        if window is not None and window.winfo_exists():
+            window.tick_ms = tick_ms
+            window.tick() # Re-arm at the new cadence
+
+    def background_delay_ms(self, state, seconds_diff):
+        """Sleeps until the alert window or the next outage start/end, whichever comes first."""
+        if state == "FUTURE" and seconds_diff > ALERT_LEAD_SECONDS:
+            wake_in = seconds_diff - ALERT_LEAD_SECONDS + 10 # Lands inside the alert window
+        elif state in ("FUTURE", "ACTIVE"):
+            wake_in = seconds_diff + 1 # Just past the boundary, so the state has flipped
+        else:
+            return BACKGROUND_MAX_SLEEP_MS
+        return max(1000, min(int(wake_in * 1000), BACKGROUND_MAX_SLEEP_MS))
+
     def update_timer(self):
         # Cancel existing timer if any to avoid duplicates
         if hasattr(self, 'timer_id') and self.timer_id:
             self.after_cancel(self.timer_id)
             
+        delay_ms = BACKGROUND_MAX_SLEEP_MS if self.background else 60000
         stage = get_current_stage()
         if stage == 0 or not self.current_location_data:
-            self.countdown_label.config(text="")
+            if not self.background:
+                self.countdown_label.config(text="")
         else:
             area = self.current_location_data['area']
             schedule = load_schedule_from_db(area)
@@ -379,14 +630,17 @@ class Dashboard(BaseFrame):
             else:
                 countdown_text = "No upcoming outages"
             
-            self.countdown_label.config(text=countdown_text)
+            if not self.background:
+                self.countdown_label.config(text=countdown_text)
+            else:
+                delay_ms = self.background_delay_ms(state, seconds_diff)
             
             # Update Tray Icon Status
             is_power_on = (state != "ACTIVE")
             self.controller.tray.update_status(is_power_on)
         
-        # Schedule next update in 60s
-        self.timer_id = self.after(60000, self.update_timer)
+        # Schedule next update (60s while visible)
+        self.timer_id = self.after(delay_ms, self.update_timer)
 
     def check_alerts(self, seconds_diff, next_start_dt):
         if not next_start_dt:
@@ -426,9 +680,17 @@ class Dashboard(BaseFrame):
             self.schedule_list.insert(tk.END, slot)
 
     def setup_admin_controls(self, role):
+        # Same role as last time: keep the controls (on_show runs on every refresh, e.g. each simulator tick)
+        if role == getattr(self, 'admin_role', None):
+            if role == 'admin':
+                self.stage_var.set(str(get_current_stage()))
+            return
+        self.admin_role = role
+
         # Clear previous admin controls if any
         if hasattr(self, 'admin_frame'):
             self.admin_frame.destroy()
+            del self.admin_frame
 
         if role == 'admin':
             self.admin_frame = ttk.LabelFrame(self, text="Admin Controls", padding=10)
@@ -443,6 +705,7 @@ class Dashboard(BaseFrame):
             self.stage_cb = ttk.Combobox(self.admin_frame, textvariable=self.stage_var, values=[str(i) for i in range(9)], width=3, state="readonly")
             self.stage_cb.pack(side="left", padx=5)
             ttk.Button(self.admin_frame, text="Set", command=self.update_stage).pack(side="left", padx=5)
+            ttk.Button(self.admin_frame, text="Preview", command=self.open_stage_planner).pack(side="left", padx=5)
             
             # Simulator
             ttk.Button(self.admin_frame, text="⚡ Simulator", command=self.open_simulator).pack(side="left", padx=15)
@@ -450,11 +713,24 @@ class Dashboard(BaseFrame):
             # User Management
             ttk.Button(self.admin_frame, text="👥 Manage Users", command=self.open_user_management).pack(side="left", padx=5)
 
+            # Affected Areas
+            ttk.Button(self.admin_frame, text="🌑 Who's Dark", command=self.open_dark_areas).pack(side="left", padx=5)
+
     def open_user_management(self):
-        UserManagementWindow(self)
+        self.open_window("user_management", lambda: UserManagementWindow(self))
+
+    def open_dark_areas(self):
+        self.open_window("dark_areas", lambda: DarkAreasWindow(self))
+
+    def open_stage_planner(self):
+        stage = int(self.stage_var.get() or 0)
+        window = self.open_window("stage_planner", lambda: StagePlannerWindow(self, stage))
+        if window.stage_var.get() != str(stage):
+            window.stage_var.set(str(stage))
+            window.refresh()
 
     def open_simulator(self):
-        SimulatorWindow(self)
+        self.open_window("simulator", lambda: SimulatorWindow(self))
 
     def update_stage(self):
         try:
@@ -468,19 +744,35 @@ class Dashboard(BaseFrame):
     def upload_csv(self):
         file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
         if file_path:
-            # 1. Validate
-            is_valid, error_msg = validate_csv(file_path)
-            if not is_valid:
-                messagebox.showerror("Validation Error", f"CSV Validation Failed:\n{error_msg}")
-                return
+            # 1. Validate (whole file, in parallel, off the UI thread)
+            result = {}
+            valid_areas = get_valid_areas()
+            worker = threading.Thread(target=lambda: result.update(report=validate_csv_full(file_path, valid_areas=valid_areas)), daemon=True)
+            worker.start()
+            self.config(cursor="watch")
+            self.after(100, lambda: self.finish_upload(file_path, worker, result))
+
+    def finish_upload(self, file_path, worker, result):
+        if worker.is_alive():
+            self.after(100, lambda: self.finish_upload(file_path, worker, result))
+            return
+        self.config(cursor="")
 
-            # 2. Import
-            try:
-                import_csv_to_db(file_path)
-                messagebox.showinfo("Success", "Schedule updated and imported to database successfully!")
-                self.on_show() # Refresh current view
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to import to DB: {e}")
+        is_valid, errors = result.get("report", (False, [(0, "Validation did not complete")]))
+        if not is_valid:
+            shown = "\n".join(f"Row {row}: {message}" for row, message in errors[:20])
+            more = f"\n... and {len(errors) - 20} more" if len(errors) > 20 else ""
+            messagebox.showerror("Validation Error", f"CSV Validation Failed ({len(errors)} error(s)):\n{shown}{more}")
+            return
+
+        # 2. Import
+        try:
+            import_csv_to_db_mmap(file_path)
+            live_analytics.refresh()
+            messagebox.showinfo("Success", "Schedule updated and imported to database successfully!")
+            self.on_show() # Refresh current view
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to import to DB: {e}")
 
     def save_location_changes(self):
         if not self.current_location_data:
@@ -493,6 +785,9 @@ class Dashboard(BaseFrame):
         if not area or not province or not municipality:
             messagebox.showerror("Error", "Please select all location fields")
             return
+        if not self.location_is_valid(province, municipality, area):
+            messagebox.showerror("Error", "Please pick an area from the list")
+            return
 
         update_user_location(self.current_location_data['id'], self.user_id, self.current_location_data['name'], province, municipality, area)
         
@@ -500,11 +795,11 @@ class Dashboard(BaseFrame):
         self.on_show() # Refresh dashboard
 
 
-class AddLocationWindow(tk.Toplevel):
+class AddLocationWindow(LocationPickerMixin, tk.Toplevel):
     def __init__(self, parent_dashboard):
         super().__init__(parent_dashboard)
         self.title("Add New Location")
-        self.geometry("400x350")
+        self.geometry("400x480")
         self.parent = parent_dashboard
         
         ttk.Label(self, text="Add New Location", font=("Segoe UI", 14, "bold")).pack(pady=10)
@@ -520,48 +815,27 @@ class AddLocationWindow(tk.Toplevel):
         # Cascading
         self.setup_cascading_combos(frm, 2)
         
-        ttk.Button(frm, text="Save Location", command=self.save).grid(row=5, column=0, pady=20)
+        ttk.Button(frm, text="Save Location", command=self.save).grid(row=8, column=0, pady=20)
 
     def setup_cascading_combos(self, parent_frame, row_start):
-        # Local impl to reuse existing logic but customized layout if needed, 
-        # but easier to just copy logic or instantiate a helper if we were strict.
-        # Function hijacking from BaseFrame since we can't easily inherit because we are Toplevel + Base logic mixed.
-        # Actually, let's just duplicate the setup for simplicity or use a helper class.
-        # We can call the helper method if we make this class inherit helper or just manual.
+        # Same pickers as BaseFrame, stacked with labels above each field
         
         # Province
         ttk.Label(parent_frame, text="Province").grid(row=row_start, column=0, sticky="w", pady=5)
-        self.province_cb = ttk.Combobox(parent_frame, state="readonly", values=list(LOCATIONS.keys()), width=30)
+        self.province_cb = ttk.Combobox(parent_frame, state="readonly", width=30)
         self.province_cb.grid(row=row_start+1, column=0, sticky="w", pady=(0, 10))
-        self.province_cb.bind("<<ComboboxSelected>>", self.on_province_change)
 
         # Municipality
         ttk.Label(parent_frame, text="Municipality").grid(row=row_start+2, column=0, sticky="w", pady=5)
         self.municipality_cb = ttk.Combobox(parent_frame, state="readonly", width=30)
         self.municipality_cb.grid(row=row_start+3, column=0, sticky="w", pady=(0, 10))
-        self.municipality_cb.bind("<<ComboboxSelected>>", self.on_municipality_change)
 
         # Area
-        ttk.Label(parent_frame, text="Area").grid(row=row_start+4, column=0, sticky="w", pady=5)
-        self.area_cb = ttk.Combobox(parent_frame, state="readonly", width=30)
+        ttk.Label(parent_frame, text="Area (type to search)").grid(row=row_start+4, column=0, sticky="w", pady=5)
+        self.area_cb = ttk.Combobox(parent_frame, width=30)
         self.area_cb.grid(row=row_start+5, column=0, sticky="w", pady=(0, 10))
-        
-    def on_province_change(self, event):
-        province = self.province_cb.get()
-        if province in LOCATIONS:
-            municipalities = list(LOCATIONS[province].keys())
-            self.municipality_cb['values'] = municipalities
-            self.municipality_cb.set('')
-            self.area_cb['values'] = []
-            self.area_cb.set('')
 
-    def on_municipality_change(self, event):
-        province = self.province_cb.get()
-        municipality = self.municipality_cb.get()
-        if province in LOCATIONS and municipality in LOCATIONS[province]:
-            areas = LOCATIONS[province][municipality]
-            self.area_cb['values'] = areas
-            self.area_cb.set('')
+        self.bind_location_pickers(parent_frame)
             
     def save(self):
         name = self.name_entry.get()
@@ -572,6 +846,9 @@ class AddLocationWindow(tk.Toplevel):
         if not name or not province or not municipality or not area:
             messagebox.showerror("Error", "All fields are required")
             return
+        if not self.location_is_valid(province, municipality, area):
+            messagebox.showerror("Error", "Please pick an area from the list")
+            return
             
         add_user_location(self.parent.user_id, name, province, municipality, area)
         self.parent.on_show() # Refresh parent
@@ -614,6 +891,13 @@ class SimulatorWindow(tk.Toplevel):
             self.timer_id = None
         self.status_var.set("Status: Stopped")
         
+    def destroy(self):
+        self.running = False
+        if self.timer_id:
+            self.after_cancel(self.timer_id)
+            self.timer_id = None
+        super().destroy()
+
     def run_cycle(self, interval_ms):
         if not self.running:
             return
@@ -622,9 +906,11 @@ class SimulatorWindow(tk.Toplevel):
         new_stage = random.randint(0, 8)
         set_current_stage(new_stage)
         
-        # access Dashboard instance via parent_app.frames
-        dashboard = self.parent_app.frames[Dashboard]
-        dashboard.on_show()
+        # parent_app is the Dashboard that opened the simulator
+        self.parent_app.on_show()
+        
+        stats = get_stage_write_stats()
+        self.status_var.set(f"Running ({interval_ms}ms) - write avg {stats['avg_ms']:.1f}ms, max {stats['max_ms']:.1f}ms, {stats['commits']} commits")
         
         # Schedule next
         self.timer_id = self.after(interval_ms, lambda: self.run_cycle(interval_ms))
@@ -683,7 +969,8 @@ class SettingsWindow(tk.Toplevel):
                 # Better to get absolute path of main.py
                 script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
                 
-                # Create shortcut
+                # Create shortcut (pywin32 is only needed here, so the UI also runs off Windows)
+                from win32com.client import Dispatch
                 shell = Dispatch('WScript.Shell')
                 shortcut = shell.CreateShortCut(shortcut_path)
                 shortcut.Targetpath = target
@@ -701,14 +988,14 @@ class UserManagementWindow(tk.Toplevel):
     def __init__(self, parent_dashboard):
         super().__init__(parent_dashboard)
         self.title("User Management")
-        self.geometry("600x400")
+        self.geometry("650x400")
         self.parent = parent_dashboard
         
         ttk.Label(self, text="Manage Users", font=("Segoe UI", 14, "bold")).pack(pady=10)
         
         # Table
         columns = ("id", "username", "role", "location")
-        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=10)
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=10, selectmode="extended")
         self.tree.heading("id", text="ID")
         self.tree.heading("username", text="Username")
         self.tree.heading("role", text="Role")
@@ -725,169 +1012,572 @@ class UserManagementWindow(tk.Toplevel):
         btn_frame = ttk.Frame(self)
         btn_frame.pack(pady=10)
         
-        ttk.Button(btn_frame, text="Toggle Admin", command=self.toggle_admin).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Make Admin", command=lambda: self.set_role("admin")).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Make User", command=lambda: self.set_role("user")).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Reset Password", command=self.reset_password).pack(side="left", padx=5)
-        ttk.Button(btn_frame, text="Delete User", command=self.delete_selected_user).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Delete", command=self.delete_selected_users).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Refresh", command=self.load_users).pack(side="left", padx=5)
         
         self.load_users()
 
     def load_users(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        self.tree.delete(*self.tree.get_children())
             
         users = get_all_users()
         for user in users:
             # id, username, role, province, municipality, area
             uid, u, r, p, m, a = user
             loc_str = f"{p}, {a}" if p else "N/A"
-            self.tree.insert("", tk.END, values=(uid, u, r, loc_str))
+            # Row iid is the user id, so bulk actions can update rows in place
+            self.tree.insert("", tk.END, iid=str(uid), values=(uid, u, r, loc_str))
             
-    def get_selected_id(self):
-        selected = self.tree.selection()
+    def get_selected_ids(self, action=None):
+        """Selected user ids (multi-select). Pass `action` to refuse one that includes yourself."""
+        selected = [int(iid) for iid in self.tree.selection()]
         if not selected:
-            messagebox.showwarning("Selection", "Please select a user")
-            return None
-        return self.tree.item(selected[0])['values'][0]
-
-    def delete_selected_user(self):
-        uid = self.get_selected_id()
-        if not uid: return
-        
-        if uid == self.parent.user_id:
-            messagebox.showerror("Error", "You cannot delete yourself.")
-            return
-
-        if messagebox.askyesno("Confirm", "Delete this user? This cannot be undone."):
-            delete_user(uid)
-            self.load_users()
-
-    def toggle_admin(self):
-        uid = self.get_selected_id()
-        if not uid: return
-        
-        if uid == self.parent.user_id:
-             messagebox.showerror("Error", "You cannot demote yourself.")
-             return
-
-        # Get current role
-        item = self.tree.item(self.tree.selection()[0])
-        current_role = item['values'][2]
-        new_role = "admin" if current_role == "user" else "user"
-        
-        update_user_role(uid, new_role)
-        self.load_users()
-        messagebox.showinfo("Success", f"User role updated to {new_role}")
+            messagebox.showwarning("Selection", "Please select at least one user")
+            return []
+        if action and self.parent.user_id in selected:
+            messagebox.showerror("Error", f"You cannot {action} yourself.")
+            return []
+        return selected
+
+    def delete_selected_users(self):
+        uids = self.get_selected_ids("delete")
+        if not uids: return
+
+        noun = "this user" if len(uids) == 1 else f"these {len(uids)} users"
+        if messagebox.askyesno("Confirm", f"Delete {noun}? This cannot be undone."):
+            delete_users(uids)
+            self.tree.delete(*[str(uid) for uid in uids])
+
+    def set_role(self, new_role):
+        uids = self.get_selected_ids("demote" if new_role == "user" else None)
+        if not uids: return
+        
+        update_users_role(uids, new_role)
+        for uid in uids:
+            self.tree.set(str(uid), "role", new_role)
+        messagebox.showinfo("Success", f"{len(uids)} user(s) updated to {new_role}")
 
     def reset_password(self):
-        uid = self.get_selected_id()
-        if not uid: return
-        
-        # Simple input dialog for new password would be ideal, but for now we'll just set a default or ask via simpledialog (which we need to import or just create a mini window)
-        # Let's create a mini window
+        uids = self.get_selected_ids()
+        if not uids: return
         
         top = tk.Toplevel(self)
         top.title("Reset Password")
-        ttk.Label(top, text="New Password:").pack(pady=5)
+        label = "New Password:" if len(uids) == 1 else f"New Password for {len(uids)} users:"
+        ttk.Label(top, text=label).pack(pady=5)
         entry = ttk.Entry(top, show="*")
         entry.pack(pady=5)
         
         def save():
             pwd = entry.get()
             if pwd:
-                update_user_password(uid, pwd)
-                messagebox.showinfo("Success", "Password updated.")
-                top.destroy()
+                top.config(cursor="watch")
+                # One KDF run for the whole selection; every user gets the same salted hash
+                future = auth.submit(auth.hash_password, pwd, get_kdf_iterations())
+                auth.when_done(top, future, saved, failed)
+
+        def failed(error):
+            top.config(cursor="")
+            messagebox.showerror("Error", f"Failed to reset password: {error}")
+
+        def saved(password_hash):
+            set_users_password_hash(uids, password_hash)
+            messagebox.showinfo("Success", "Password updated.")
+            top.destroy()
         
         ttk.Button(top, text="Save", command=save).pack(pady=10)
 
+class StagePlannerWindow(tk.Toplevel):
+    """What-if view: who goes dark, and for how long, if a stage is set. Switching stage or days is a lookup."""
+    def __init__(self, parent_dashboard, stage):
+        super().__init__(parent_dashboard)
+        self.title("Stage Planner")
+        self.geometry("450x480")
+        self.parent = parent_dashboard
+        self.plan = StagePlan()
+
+        controls = ttk.Frame(self)
+        controls.pack(pady=10)
+        ttk.Label(controls, text="Stage:").pack(side="left", padx=5)
+        self.stage_var = tk.StringVar(value=str(stage))
+        stage_cb = ttk.Combobox(controls, textvariable=self.stage_var, values=[str(i) for i in range(9)], width=3, state="readonly")
+        stage_cb.pack(side="left", padx=5)
+        ttk.Label(controls, text="Days:").pack(side="left", padx=(15, 5))
+        self.days_var = tk.StringVar(value="7")
+        days_cb = ttk.Combobox(controls, textvariable=self.days_var, values=["1", "3", "7", "14", "30"], width=4, state="readonly")
+        days_cb.pack(side="left", padx=5)
+        for cb in (stage_cb, days_cb):
+            cb.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+
+        self.summary_label = ttk.Label(self, text="", font=("Segoe UI", 11, "bold"))
+        self.summary_label.pack(pady=5)
+
+        columns = ("area", "hours", "users")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=14)
+        self.tree.heading("area", text="Area")
+        self.tree.heading("hours", text="Outage Hours")
+        self.tree.heading("users", text="Users")
+        self.tree.column("area", width=200)
+        self.tree.column("hours", width=100, anchor="e")
+        self.tree.column("users", width=80, anchor="e")
+        self.tree.pack(fill="both", expand=True, padx=20, pady=5)
+
+        ttk.Button(self, text="Apply This Stage", command=self.apply_stage).pack(pady=10)
+        self.refresh()
+
+    def refresh(self):
+        preview = self.plan.preview(int(self.stage_var.get()), int(self.days_var.get()))
+        self.summary_label.config(text=f"{preview['areas']} areas, {preview['users']} users dark · {preview['hours']:,.1f} outage hours")
+        self.tree.delete(*self.tree.get_children())
+        for area, hours, users in preview["rows"]:
+            self.tree.insert("", tk.END, values=(area, f"{hours:,.1f}", users))
+
+    def apply_stage(self):
+        self.parent.stage_var.set(self.stage_var.get())
+        self.parent.update_stage()
+        self.destroy()
+
+class AllLocationsWindow(tk.Toplevel):
+    """Status and countdown for every saved location, from one batched schedule fetch."""
+    def __init__(self, parent_dashboard, locations):
+        super().__init__(parent_dashboard)
+        self.dashboard = parent_dashboard
+        self.title("All My Locations")
+        self.geometry("560x320")
+
+        columns = ("name", "area", "status", "countdown")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=10)
+        for column, heading, width in (("name", "Location", 130), ("area", "Area", 150), ("status", "Status", 100), ("countdown", "Countdown", 150)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width)
+        self.tree.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.cells = {} # (iid, column) -> text currently shown
+        self.schedules = {}
+        self.schedule_generation = None
+        self.timer_id = None
+        self.tick_ms = ALL_LOCATIONS_TICK_MS
+        self.locations = None
+        self.set_locations(locations)
+
+    def destroy(self):
+        # A pending tick would otherwise keep this window alive and fire on dead widgets
+        if self.timer_id:
+            self.after_cancel(self.timer_id)
+            self.timer_id = None
+        super().destroy()
+
+    def set_locations(self, locations):
+        locations = list(locations)
+        if locations == self.locations:
+            return # Dashboard refreshes pass the same list; keep the rows and fetched schedules
+        self.locations = locations
+        self.tree.delete(*self.tree.get_children())
+        self.cells = {}
+        for loc_id, name, _, _, area in self.locations:
+            self.tree.insert("", tk.END, iid=str(loc_id), values=(name, area, "", ""))
+        self.schedule_generation = None # Refetch for the new set of areas
+        self.tick()
+
+    def tick(self):
+        if self.timer_id:
+            self.after_cancel(self.timer_id)
+        generation = get_schedule_generation()
+        if generation != self.schedule_generation:
+            self.schedules = load_schedules_for_areas(loc[4] for loc in self.locations)
+            self.schedule_generation = generation
+
+        stage = get_current_stage()
+        engine_results = self.dashboard.engine_results
+        now = datetime.now()
+        texts = {}
+        for area, schedule in self.schedules.items():
+            result = engine_results.get(area)
+            if result is not None and (result["next"] is None or result["next"][1] > now):
+                # Already computed by the engine; only the countdown is worked out here
+                if result["next"] is None:
+                    texts[area] = ("Power on", "No load shedding" if stage == 0 else "No upcoming outages")
+                    continue
+                outage_start, outage_end, _ = result["next"]
+                active = outage_start <= now
+                hours, minutes = divmod(int(((outage_end if active else outage_start) - now).total_seconds()) // 60, 60)
+                texts[area] = ("OUTAGE", f"Ends in {hours}h {minutes}m") if active else ("Power on", f"Next in {hours}h {minutes}m")
+                continue
+            if stage == 0:
+                texts[area] = ("Power on", "No load shedding")
+                continue
+            state, hours, minutes, _, _ = calculate_next_outage(schedule)
+            if state == "ACTIVE":
+                texts[area] = ("OUTAGE", f"Ends in {hours}h {minutes}m")
+            elif state == "FUTURE":
+                texts[area] = ("Power on", f"Next in {hours}h {minutes}m")
+            else:
+                texts[area] = ("Power on", "No upcoming outages")
+
+        for loc in self.locations:
+            iid = str(loc[0])
+            for column, text in zip(("status", "countdown"), texts[loc[4]]):
+                if self.cells.get((iid, column)) != text:
+                    self.tree.set(iid, column, text)
+                    self.cells[(iid, column)] = text
+        self.timer_id = self.after(self.tick_ms, self.tick)
+
+class DarkAreasWindow(tk.Toplevel):
+    def __init__(self, parent_dashboard):
+        super().__init__(parent_dashboard)
+        self.title("Areas in Outage")
+        self.geometry("450x450")
+
+        ttk.Label(self, text="Areas in Outage", font=("Segoe UI", 14, "bold")).pack(pady=10)
+
+        # Time picker (defaults to now)
+        frm = ttk.Frame(self)
+        frm.pack(pady=5)
+        ttk.Label(frm, text="At (YYYY-MM-DD HH:MM):").pack(side="left", padx=5)
+        self.time_var = tk.StringVar(value=datetime.now().strftime("%Y-%m-%d %H:%M"))
+        ttk.Entry(frm, textvariable=self.time_var, width=18).pack(side="left", padx=5)
+        ttk.Button(frm, text="Check", command=self.refresh).pack(side="left", padx=5)
+
+        self.summary_var = tk.StringVar()
+        ttk.Label(self, textvariable=self.summary_var, font=("Segoe UI", 10, "bold")).pack(pady=5)
+
+        columns = ("area", "users")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=12)
+        self.tree.heading("area", text="Area")
+        self.tree.heading("users", text="Users Affected")
+        self.tree.column("area", width=250)
+        self.tree.column("users", width=100)
+        self.tree.pack(fill="both", expand=True, padx=20, pady=5)
+
+        self.refresh()
+
+    def refresh(self):
+        try:
+            when = datetime.strptime(self.time_var.get().strip(), "%Y-%m-%d %H:%M")
+        except ValueError:
+            messagebox.showerror("Error", "Invalid time. Use YYYY-MM-DD HH:MM", parent=self)
+            return
+
+        stage, areas = get_dark_areas(when)
+        for row in self.tree.get_children():
+            self.tree.delete(row)
+        for area, users in areas:
+            self.tree.insert("", tk.END, values=(area, users))
+
+        total_users = sum(users for _, users in areas)
+        self.summary_var.set(f"Stage {stage}: {len(areas)} area(s) dark, {total_users} user(s) affected")
+
 class CalendarWindow(tk.Toplevel):
+    """Scrollable calendar of past and future weeks; only the visible weeks are drawn."""
+    PAST_WEEKS = 52
+    FUTURE_WEEKS = 12
+    WIDTH = 750
+    MARGIN_LEFT = 60
+    HEADER = 40
+    HOUR_HEIGHT = 12
+    WEEK_HEIGHT = HEADER + 24 * HOUR_HEIGHT + 20
+    DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
     def __init__(self, parent, area):
         super().__init__(parent)
-        self.title(f"Weekly Schedule - {area}")
+        self.title(f"Schedule Calendar - {area}")
         self.geometry("800x600")
         self.area = area
-        
-        self.canvas = tk.Canvas(self, bg="white")
-        self.canvas.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # Determine schedule
-        stage = get_current_stage()
-        if stage == 0:
-            self.schedule = []
-            ttk.Label(self, text="Stage 0: No Load Shedding", font=("Segoe UI", 14, "bold"), foreground="green").place(x=20, y=20)
-        else:
-            self.schedule = load_schedule_from_db(area)
-            
-        self.draw_calendar()
-        
-    def draw_calendar(self):
-        # Config
-        width = 750
-        height = 550
-        margin_left = 60
-        margin_top = 40
-        col_width = (width - margin_left) / 7
-        row_height = (height - margin_top) / 24
-        
-        days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        
-        # 1. Draw Background (Green = Power On)
-        self.canvas.create_rectangle(margin_left, margin_top, width, height, fill="#90EE90", outline="")
-        
-        # 2. Draw Grid & Axes
-        # Y-Axis (Hours)
-        for h in range(25):
-            y = margin_top + (h * row_height)
-            self.canvas.create_text(30, y, text=f"{h:02d}:00", font=("Segoe UI", 8))
-            self.canvas.create_line(margin_left, y, width, y, fill="#e0e0e0")
-            
-        # X-Axis (Days)
-        for i, day in enumerate(days):
-            x = margin_left + (i * col_width)
-            self.canvas.create_text(x + col_width/2, 20, text=day, font=("Segoe UI", 10, "bold"))
-            self.canvas.create_line(x, margin_top, x, height, fill="#e0e0e0")
-            
-        # Right border
-        self.canvas.create_line(width, margin_top, width, height, fill="#e0e0e0")
-            
-        # 3. Draw Outages (Red Blocks)
-        # Since schedule is daily recurring for now, we draw the same blocks for all 7 days
-        for slot in self.schedule:
-            try:
-                start_str, end_str = slot.split(" - ")
-                start_h, start_m = map(int, start_str.split(":"))
-                end_h, end_m = map(int, end_str.split(":"))
-                
-                # Convert to Y pixels
-                # Time = H + M/60. Y = margin + Time * row_height
-                start_y = margin_top + (start_h + start_m/60) * row_height
-                end_y = margin_top + (end_h + end_m/60) * row_height
-                
-                # Handle Wrap Around (e.g. 22:00 to 00:30)
-                # If end_time (00:30) is "sort of" smaller than start_time (22:00) in numeric value on a 24h clock,
-                # actually logic: if end < start, it means it crosses midnight.
-                
-                blocks = []
-                if (end_h + end_m/60) < (start_h + start_m/60):
-                    # Block 1: Start to 24:00
-                    blocks.append((start_y, margin_top + 24 * row_height, f"{start_str} - 24:00"))
-                    # Block 2: 00:00 to End
-                    blocks.append((margin_top, end_y, f"00:00 - {end_str}"))
-                else:
-                    blocks.append((start_y, end_y, slot))
-                
-                # Draw for each day
-                for i in range(7):
-                    x1 = margin_left + (i * col_width)
-                    x2 = x1 + col_width
-                    
-                    for y1, y2, text in blocks:
-                        # Rect
-                        self.canvas.create_rectangle(x1, y1, x2, y2, fill="#FF4444", outline="white")
-                        # Text (centered)
-                        mid_y = (y1 + y2) / 2
-                        self.canvas.create_text((x1+x2)/2, mid_y, text=text, font=("Segoe UI", 8), fill="white")
-                        
-            except ValueError:
-                continue
+
+        if get_current_stage() == 0:
+            ttk.Label(self, text="Stage 0: No Load Shedding", font=("Segoe UI", 14, "bold"), foreground="green").pack(pady=(10, 0))
+
+        frame = ttk.Frame(self)
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.canvas = tk.Canvas(frame, bg="white")
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.on_scroll)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.config(yscrollcommand=scrollbar.set, scrollregion=(0, 0, self.WIDTH, (self.PAST_WEEKS + self.FUTURE_WEEKS + 1) * self.WEEK_HEIGHT))
+
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.today = today
+        self.first_week = today - timedelta(days=today.weekday(), weeks=self.PAST_WEEKS)
+        self.week_count = self.PAST_WEEKS + self.FUTURE_WEEKS + 1
+        self.col_width = (self.WIDTH - self.MARGIN_LEFT) / 7
+
+        self.week_frames = [] # One item set per week on screen, re-targeted as weeks scroll by
+        self.block_items = [] # (rect, text) pairs shared by all visible weeks
+        self.rendered = None
+
+        self.canvas.bind("<Configure>", lambda e: self.render_visible())
+        self.canvas.bind("<MouseWheel>", lambda e: self.on_scroll("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.on_scroll("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.on_scroll("scroll", 1, "units"))
+        self.canvas.config(yscrollincrement=self.HOUR_HEIGHT * 4)
+
+        # Open on the current week
+        self.canvas.yview_moveto(self.PAST_WEEKS / self.week_count)
+        self.render_visible()
+
+    def on_scroll(self, *args):
+        self.canvas.yview(*args)
+        self.render_visible()
+
+    def visible_weeks(self):
+        top = self.canvas.canvasy(0)
+        bottom = top + max(self.canvas.winfo_height(), 1)
+        first = max(0, int(top // self.WEEK_HEIGHT))
+        last = min(self.week_count - 1, int(bottom // self.WEEK_HEIGHT))
+        return range(first, last + 1)
+
+    def render_visible(self):
+        weeks = self.visible_weeks()
+        if weeks == self.rendered:
+            return # Scrolled within the same weeks: items already in place
+        self.rendered = weeks
+
+        while len(self.week_frames) < len(weeks):
+            self.week_frames.append(self.create_week_frame())
+        used_blocks = 0
+        for frame, week in zip(self.week_frames, weeks):
+            self.place_week_frame(frame, week)
+            used_blocks = self.place_blocks(week, used_blocks)
+        for frame in self.week_frames[len(weeks):]:
+            self.set_state(frame["items"], "hidden")
+        for rect, text in self.block_items[used_blocks:]:
+            self.set_state((rect, text), "hidden")
+
+    def set_state(self, items, state):
+        for item in items:
+            self.canvas.itemconfig(item, state=state)
+
+    def create_week_frame(self):
+        c = self.canvas
+        frame = {
+            "title": c.create_text(0, 0, anchor="w", font=("Segoe UI", 10, "bold")),
+            "background": c.create_rectangle(0, 0, 0, 0, fill="#90EE90", outline=""),
+            "days": [c.create_text(0, 0, font=("Segoe UI", 9, "bold")) for _ in range(7)],
+            "hours": [(c.create_line(0, 0, 0, 0, fill="#e0e0e0"), c.create_text(0, 0, font=("Segoe UI", 8))) for _ in range(0, 25, 3)],
+            "columns": [c.create_line(0, 0, 0, 0, fill="#e0e0e0") for _ in range(8)]
+        }
+        frame["items"] = [frame["title"], frame["background"], *frame["days"], *(i for pair in frame["hours"] for i in pair), *frame["columns"]]
+        return frame
+
+    def place_week_frame(self, frame, week):
+        c = self.canvas
+        week_start = self.first_week + timedelta(weeks=week)
+        top = week * self.WEEK_HEIGHT
+        grid_top = top + self.HEADER
+        grid_bottom = grid_top + 24 * self.HOUR_HEIGHT
+        self.set_state(frame["items"], "normal")
+
+        c.coords(frame["title"], 5, top + 10)
+        c.itemconfig(frame["title"], text=f"Week of {week_start:%d %b %Y}")
+        c.coords(frame["background"], self.MARGIN_LEFT, grid_top, self.WIDTH, grid_bottom)
+        for i, item in enumerate(frame["days"]):
+            day = week_start + timedelta(days=i)
+            c.coords(item, self.MARGIN_LEFT + (i + 0.5) * self.col_width, top + 28)
+            c.itemconfig(item, text=f"{self.DAYS[i]} {day.day}", fill="blue" if day == self.today else "black")
+        for (line, label), hour in zip(frame["hours"], range(0, 25, 3)):
+            y = grid_top + hour * self.HOUR_HEIGHT
+            c.coords(line, self.MARGIN_LEFT, y, self.WIDTH, y)
+            c.coords(label, 30, y)
+            c.itemconfig(label, text=f"{hour:02d}:00")
+        for i, line in enumerate(frame["columns"]):
+            x = self.MARGIN_LEFT + i * self.col_width
+            c.coords(line, x, grid_top, x, grid_bottom)
+
+    def place_blocks(self, week, used):
+        c = self.canvas
+        grid_top = week * self.WEEK_HEIGHT + self.HEADER
+        for day, start, end, stage in get_week_blocks(self.area, self.first_week + timedelta(weeks=week)):
+            if used == len(self.block_items):
+                self.block_items.append((
+                    c.create_rectangle(0, 0, 0, 0, fill="#FF4444", outline="white"),
+                    c.create_text(0, 0, font=("Segoe UI", 7), fill="white")
+                ))
+            rect, text = self.block_items[used]
+            used += 1
+            x1 = self.MARGIN_LEFT + day * self.col_width
+            y1 = grid_top + start / 60 * self.HOUR_HEIGHT
+            y2 = grid_top + end / 60 * self.HOUR_HEIGHT
+            c.coords(rect, x1, y1, x1 + self.col_width, y2)
+            c.coords(text, x1 + self.col_width / 2, (y1 + y2) / 2)
+            label = f"{start // 60:02d}:{start % 60:02d} - {end // 60:02d}:{end % 60:02d}"
+            # Labels only where the block is tall enough to hold them
+            c.itemconfig(text, text=label, state="normal" if y2 - y1 >= 10 else "hidden")
+            c.itemconfig(rect, state="normal")
+            c.tag_raise(rect)
+            c.tag_raise(text)
+        return used
+
+class HeatmapWindow(tk.Toplevel):
+    RANGES = {"Last 4 weeks": 28, "Last 3 months": 91, "Last year": 365, "All history": None}
+    DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+    def __init__(self, parent, area):
+        super().__init__(parent)
+        self.title("Outage Heatmap")
+        self.geometry("760x360")
+        self.area = area
+
+        controls = ttk.Frame(self)
+        controls.pack(pady=10)
+        self.scope_var = tk.StringVar(value=area)
+        scope_cb = ttk.Combobox(controls, textvariable=self.scope_var, values=[area, "All areas"], state="readonly", width=20)
+        scope_cb.pack(side="left", padx=5)
+        self.range_var = tk.StringVar(value="Last 3 months")
+        range_cb = ttk.Combobox(controls, textvariable=self.range_var, values=list(self.RANGES), state="readonly", width=15)
+        range_cb.pack(side="left", padx=5)
+        for cb in (scope_cb, range_cb):
+            cb.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+
+        self.canvas = tk.Canvas(self, bg="white", width=730, height=250)
+        self.canvas.pack(padx=10)
+        self.summary_label = ttk.Label(self, text="")
+        self.summary_label.pack(pady=5)
+
+        self.refresh()
+
+    def get_range(self):
+        # Whole hours up to now, so the cache key holds for the rest of the hour
+        end = datetime.now().replace(minute=0, second=0, microsecond=0)
+        days = self.RANGES[self.range_var.get()]
+        if days is not None:
+            return end.replace(hour=0) - timedelta(days=days), end
+        first = get_first_stage_timestamp()
+        return (datetime.strptime(first[:10], "%Y-%m-%d") if first else end), end
+
+    def refresh(self):
+        area = None if self.scope_var.get() == "All areas" else self.area
+        start, end = self.get_range()
+        try:
+            grid = get_outage_heatmap(area, start, end)
+        except ImportError:
+            messagebox.showerror("Heatmap", "The heatmap needs NumPy (pip install numpy).", parent=self)
+            self.destroy()
+            return
+        self.draw(grid)
+        total_hours = grid.sum() / 60
+        scope = "all areas" if area is None else area
+        self.summary_label.config(text=f"{total_hours:,.1f} outage hours for {scope}, {start:%d %b %Y} - {end:%d %b %Y}")
+
+    def draw(self, grid):
+        self.canvas.delete("all")
+        margin_left, margin_top = 40, 20
+        cell_w, cell_h = 28, 32
+        peak = grid.max() or 1
+        for hour in range(0, 24, 3):
+            self.canvas.create_text(margin_left + hour * cell_w + cell_w / 2, 10, text=f"{hour:02d}", font=("Segoe UI", 8))
+        for day in range(7):
+            y = margin_top + day * cell_h
+            self.canvas.create_text(20, y + cell_h / 2, text=self.DAYS[day], font=("Segoe UI", 9))
+            for hour in range(24):
+                # White (no outages) to red (the busiest hour in the range)
+                shade = 255 - int(200 * grid[day, hour] / peak)
+                x = margin_left + hour * cell_w
+                self.canvas.create_rectangle(x, y, x + cell_w, y + cell_h, fill=f"#ff{shade:02x}{shade:02x}", outline="#e0e0e0")
+
+class StageChartWindow(tk.Toplevel):
+    """Stage over time, downsampled to the visible range. Wheel zooms, dragging pans."""
+    WIDTH, HEIGHT = 720, 300
+    MARGIN_LEFT, MARGIN_TOP, MARGIN_BOTTOM = 40, 15, 30
+    MAX_STAGE = 8
+    MIN_SPAN = timedelta(hours=1)
+    AXIS_LABELS = 6
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Stage History")
+        self.geometry(f"{self.WIDTH + 20}x{self.HEIGHT + 60}")
+
+        self.canvas = tk.Canvas(self, bg="white", width=self.WIDTH, height=self.HEIGHT)
+        self.canvas.pack(padx=10, pady=10)
+        self.range_label = ttk.Label(self, text="")
+        self.range_label.pack()
+
+        # Static frame: stage gridlines, plus items that are only ever moved or relabelled
+        plot_bottom = self.HEIGHT - self.MARGIN_BOTTOM
+        for stage in range(0, self.MAX_STAGE + 1, 2):
+            y = self.stage_y(stage)
+            self.canvas.create_line(self.MARGIN_LEFT, y, self.WIDTH, y, fill="#e0e0e0")
+            self.canvas.create_text(20, y, text=str(stage), font=("Segoe UI", 8))
+        self.canvas.create_line(self.MARGIN_LEFT, plot_bottom, self.WIDTH, plot_bottom)
+        self.time_labels = [self.canvas.create_text(0, plot_bottom + 12, text="", font=("Segoe UI", 8)) for _ in range(self.AXIS_LABELS)]
+        self.series = self.canvas.create_line(0, 0, 0, 0, fill="#d9534f")
+
+        now = datetime.now()
+        first = get_first_stage_timestamp()
+        self.full_start = min(datetime.strptime(first, "%Y-%m-%d %H:%M:%S"), now - self.MIN_SPAN) if first else now - timedelta(days=7)
+        self.full_end = now
+        self.view_start, self.view_end = self.full_start, self.full_end
+        self.redraw_id = None
+        self.drag_x = None
+
+        self.canvas.bind("<MouseWheel>", self.on_wheel) # Windows / macOS
+        self.canvas.bind("<Button-4>", lambda e: self.zoom(0.8, e.x)) # X11
+        self.canvas.bind("<Button-5>", lambda e: self.zoom(1.25, e.x))
+        self.canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<Double-Button-1>", lambda e: self.set_view(self.full_start, self.full_end))
+
+        self.redraw()
+
+    def destroy(self):
+        if self.redraw_id is not None:
+            self.after_cancel(self.redraw_id)
+            self.redraw_id = None
+        super().destroy()
+
+    def stage_y(self, stage):
+        plot_height = self.HEIGHT - self.MARGIN_TOP - self.MARGIN_BOTTOM
+        return self.HEIGHT - self.MARGIN_BOTTOM - plot_height * stage / self.MAX_STAGE
+
+    def time_at(self, x):
+        fraction = min(max((x - self.MARGIN_LEFT) / (self.WIDTH - self.MARGIN_LEFT), 0), 1)
+        return self.view_start + (self.view_end - self.view_start) * fraction
+
+    def set_view(self, start, end):
+        span = max(end - start, self.MIN_SPAN)
+        span = min(span, self.full_end - self.full_start)
+        start = min(max(start, self.full_start), self.full_end - span)
+        self.view_start, self.view_end = start, start + span
+        # Coalesce bursts of wheel / drag events into one redraw
+        if self.redraw_id is None:
+            self.redraw_id = self.after(30, self.redraw)
+
+    def on_wheel(self, event):
+        self.zoom(0.8 if event.delta > 0 else 1.25, event.x)
+
+    def zoom(self, factor, x):
+        anchor = self.time_at(x)
+        self.set_view(anchor - (anchor - self.view_start) * factor, anchor + (self.view_end - anchor) * factor)
+
+    def on_drag_start(self, event):
+        self.drag_x = event.x
+
+    def on_drag(self, event):
+        if self.drag_x is None:
+            return
+        shift = (self.view_end - self.view_start) * ((self.drag_x - event.x) / (self.WIDTH - self.MARGIN_LEFT))
+        self.drag_x = event.x
+        self.set_view(self.view_start + shift, self.view_end + shift)
+
+    def redraw(self):
+        self.redraw_id = None
+        columns = self.WIDTH - self.MARGIN_LEFT
+        buckets = get_stage_buckets(self.view_start, self.view_end, columns)
+
+        # One vertical min..max stroke per pixel column, joined into a single polyline
+        points = []
+        for i, (low, high) in enumerate(buckets):
+            x = self.MARGIN_LEFT + i
+            points.extend((x, self.stage_y(high), x, self.stage_y(low)) if i % 2 else (x, self.stage_y(low), x, self.stage_y(high)))
+        self.canvas.coords(self.series, *points)
+
+        span = self.view_end - self.view_start
+        label_format = "%d %b %H:%M" if span <= timedelta(days=3) else "%d %b %Y"
+        for i, item in enumerate(self.time_labels):
+            x = self.MARGIN_LEFT + 30 + i * (columns - 60) / (self.AXIS_LABELS - 1)
+            self.canvas.coords(item, x, self.HEIGHT - self.MARGIN_BOTTOM + 12)
+            self.canvas.itemconfig(item, text=self.time_at(x).strftime(label_format))
+        self.range_label.config(text=f"{self.view_start:%d %b %Y %H:%M} - {self.view_end:%d %b %Y %H:%M}  (wheel: zoom, drag: pan, double-click: all)")
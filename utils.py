@@ -1,33 +1,27 @@
-import re
 import csv
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
+from functools import lru_cache
+from validation import TIME_SLOT_PATTERN, validate_csv_report
 # Import DB functions needed for logic
-from database import load_schedule_from_db, cursor
+from database import get_area_catalog_generation, get_all_area_names, load_schedule_from_db, get_outage_minutes, get_outage_minutes_by_area, load_all_schedules, get_schedule_generation, get_stage_before, get_stage_history, get_stage_generation, get_current_stage, get_user_counts_by_area, get_area_impact, get_dark_user_count, get_schedule_at, get_schedules_at, get_schedule_changes, get_schedule_version_at, get_last_schedule_change, stage_writer
+from schedule import NO_SCHEDULE, OutageIndex, compile_slots, daily_outage_minutes, to_timestamp, from_timestamp
 
 # --- Data Sources ---
-LOCATIONS = {
-    "Gauteng": {
-        "City of Johannesburg": ["Sandton", "Soweto", "Johannesburg", "Midrand", "Roodepoort", "Randburg"],
-        "City of Tshwane": ["Pretoria", "Centurion"],
-        "Ekurhuleni": ["Benoni", "Boksburg", "Kempton Park", "Germiston", "Alberton", "Springs", "Brakpan"],
-        "Mogale City": ["Krugersdorp"],
-        "Emfuleni": ["Vereeniging"]
-    },
-    "Limpopo": {
-        "Polokwane": ["Polokwane"]
-    }
-}
+# The province / municipality / area catalog lives in the areas table (see database.sync_area_catalog)
+_valid_areas = None
+_valid_areas_generation = None
 
 def get_valid_areas():
-    areas = set()
-    for prov in LOCATIONS:
-        for muni in LOCATIONS[prov]:
-            for area in LOCATIONS[prov][muni]:
-                areas.add(area)
-    return areas
+    # Built once per catalog load and shared (including with validation workers)
+    global _valid_areas, _valid_areas_generation
+    generation = get_area_catalog_generation()
+    if _valid_areas is None or _valid_areas_generation != generation:
+        _valid_areas = frozenset(get_all_area_names())
+        _valid_areas_generation = generation
+    return _valid_areas
 
 def validate_csv(file_path):
-    time_pattern = re.compile(r"^([0-1]?[0-9]|2[0-3]):[0-5][0-9]\s*-\s*([0-1]?[0-9]|2[0-3]):[0-5][0-9]$")
+    time_pattern = TIME_SLOT_PATTERN
     valid_areas = get_valid_areas()
     
     try:
@@ -53,66 +47,160 @@ def validate_csv(file_path):
 
     return True, None
 
+def validate_csv_full(file_path, workers=None, valid_areas=None):
+    """Like validate_csv, but returns (is_valid, [(row_number, message)]) with every error."""
+    try:
+        return validate_csv_report(file_path, get_valid_areas() if valid_areas is None else valid_areas, workers)
+    except Exception as e:
+        return False, [(0, f"Error reading CSV: {e}")]
+
 def calculate_daily_outage_hours(area):
     """Calcs total hours per day for a given area based on schedule slots."""
-    schedule = load_schedule_from_db(area)
-    total_hours = 0.0
-    for slot in schedule:
-        try:
-            start_str, end_str = slot.split(" - ")
-            start_dt = datetime.strptime(start_str, "%H:%M")
-            end_dt = datetime.strptime(end_str, "%H:%M")
-            
-            diff = (end_dt - start_dt).seconds / 3600
-            if diff < 0: diff += 24 # Handle wrap around if needed, though usually dealt with in delta
-            total_hours += diff
-        except ValueError:
-            pass
-    return total_hours
-
-def get_analytics(area):
-    now = datetime.now()
-    
-    # Time Ranges
-    start_this_week = now - timedelta(days=now.weekday()) # Monday
-    start_this_week = start_this_week.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    start_this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    last_month_end = start_this_month - timedelta(seconds=1)
-    start_last_month = last_month_end.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    daily_hours = calculate_daily_outage_hours(area)
-    
-    def calculate_hours_in_range(start_date, end_date):
-        total = 0
-        current = start_date
-        while current <= end_date:
-            # Find stage active on 'current' day
-            # Get last stage change before end of 'current' day
-            day_end_str = current.replace(hour=23, minute=59, second=59).strftime("%Y-%m-%d %H:%M:%S")
-            cursor.execute("SELECT stage FROM stage_history WHERE timestamp <= ? ORDER BY timestamp DESC LIMIT 1", (day_end_str,))
-            res = cursor.fetchone()
-            stage = res[0] if res else 0
-            
-            if stage > 0:
-                total += daily_hours
-            
-            current += timedelta(days=1)
-        return total
+    return daily_outage_minutes(load_schedule_from_db(area)) / 60
 
+def _analytics_ranges():
+    today = datetime.now().date()
+    start_this_month = today.replace(day=1)
+    last_month_end = start_this_month - timedelta(days=1)
     return {
-        "this_week": calculate_hours_in_range(start_this_week, now),
-        "this_month": calculate_hours_in_range(start_this_month, now),
-        "last_month": calculate_hours_in_range(start_last_month, last_month_end)
+        "this_week": (today - timedelta(days=today.weekday()), today), # From Monday
+        "this_month": (start_this_month, today),
+        "last_month": (last_month_end.replace(day=1), last_month_end)
     }
 
+def get_analytics(area):
+    # Range-sums over the materialized daily rollup (see database.refresh_rollup)
+    return {name: get_outage_minutes(area, start, end) / 60 for name, (start, end) in _analytics_ranges().items()}
+
+def get_all_analytics():
+    """get_analytics for every area at once: one grouped rollup scan per range."""
+    totals = {name: get_outage_minutes_by_area(start, end) for name, (start, end) in _analytics_ranges().items()}
+    areas = set().union(*totals.values())
+    return {area: {name: minutes.get(area, 0) / 60 for name, minutes in totals.items()} for area in areas}
+
+# --- Live Analytics ---
+
+class AnalyticsAccumulator:
+    """Running get_analytics totals for one area, updated in constant time."""
+    def __init__(self, area):
+        self.area = area
+        self.seed()
+
+    def seed(self):
+        ranges = _analytics_ranges()
+        self.day = datetime.now().date()
+        yesterday = self.day - timedelta(days=1)
+        self.week_minutes = get_outage_minutes(self.area, ranges["this_week"][0], yesterday)
+        self.month_minutes = get_outage_minutes(self.area, ranges["this_month"][0], yesterday)
+        self.last_month_minutes = get_outage_minutes(self.area, *ranges["last_month"])
+        self.daily_minutes = daily_outage_minutes(load_schedule_from_db(self.area))
+        self.generation = get_schedule_generation()
+        self.stage = get_current_stage()
+
+    def today_minutes(self):
+        return self.daily_minutes if self.stage > 0 else 0
+
+    def roll(self, today):
+        """Folds the finished day into the week/month totals; reseeds after a longer gap."""
+        if today == self.day:
+            return
+        if today - self.day != timedelta(days=1):
+            self.seed()
+            return
+        finished = self.today_minutes() # The stage it ended on, as in daily_stage
+        self.week_minutes = 0 if today.weekday() == 0 else self.week_minutes + finished
+        if today.day == 1:
+            self.last_month_minutes = self.month_minutes + finished
+            self.month_minutes = 0
+        else:
+            self.month_minutes += finished
+        self.day = today
+
+    def set_stage(self, stage):
+        self.roll(datetime.now().date())
+        self.stage = stage
+
+    def totals(self):
+        today = self.today_minutes()
+        return {
+            "this_week": (self.week_minutes + today) / 60,
+            "this_month": (self.month_minutes + today) / 60,
+            "last_month": self.last_month_minutes / 60
+        }
+
+class LiveAnalytics:
+    """Pushes fresh analytics totals to subscribers of each watched area."""
+    def __init__(self):
+        self.accumulators = {}
+        self.subscribers = {}
+        self.scheduler = None
+        self.rollover_armed = False
+        stage_writer.listeners.append(self.on_stage)
+
+    def subscribe(self, area, callback):
+        """callback(totals) now and after every change until unsubscribed."""
+        if area not in self.accumulators:
+            self.accumulators[area] = AnalyticsAccumulator(area)
+        self.subscribers.setdefault(area, []).append(callback)
+        self._arm_rollover()
+        callback(self.accumulators[area].totals())
+
+    def unsubscribe(self, area, callback):
+        callbacks = self.subscribers.get(area, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self.subscribers.pop(area, None)
+            self.accumulators.pop(area, None)
+
+    def on_stage(self, stage):
+        if not self.accumulators:
+            return
+        generation = get_schedule_generation()
+        for accumulator in self.accumulators.values():
+            if accumulator.generation != generation:
+                accumulator.seed()
+            else:
+                accumulator.set_stage(stage)
+        self._notify()
+
+    def refresh(self):
+        for accumulator in self.accumulators.values():
+            accumulator.seed()
+        self._notify()
+
+    def _notify(self):
+        for area, callbacks in self.subscribers.items():
+            totals = self.accumulators[area].totals()
+            for callback in list(callbacks):
+                callback(totals)
+
+    def _arm_rollover(self):
+        if self.scheduler is None or self.rollover_armed:
+            return
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+        self.rollover_armed = True
+        self.scheduler(int((midnight - now).total_seconds() * 1000) + 1000, self._rollover)
+
+    def _rollover(self):
+        self.rollover_armed = False
+        if not self.accumulators:
+            return
+        today = datetime.now().date()
+        for accumulator in self.accumulators.values():
+            accumulator.roll(today)
+        self._notify()
+        self._arm_rollover()
+
+live_analytics = LiveAnalytics()
+
 def calculate_next_outage(schedule_slots):
     """
     Returns (state, hours, minutes, seconds_diff, next_start_dt)
     state: "ACTIVE", "FUTURE", "NONE"
     """
-    if not schedule_slots or schedule_slots == ["No schedule available for this area"]:
+    if not schedule_slots or schedule_slots == [NO_SCHEDULE]:
         return "NONE", 0, 0, 0, None
         
     now = datetime.now()
@@ -164,3 +252,187 @@ def calculate_next_outage(schedule_slots):
     hours += diff.days * 24
     
     return "FUTURE", hours, minutes, diff.total_seconds(), next_dt
+
+# --- Outage Index ---
+_outage_index = None
+_outage_index_generation = None
+
+def get_outage_index():
+    """Inverted minute-of-day index over all schedules, rebuilt when a new CSV is imported."""
+    global _outage_index, _outage_index_generation
+    generation = get_schedule_generation()
+    if _outage_index is None or _outage_index_generation != generation:
+        _outage_index = OutageIndex(load_all_schedules())
+        _outage_index_generation = generation
+    return _outage_index
+
+@lru_cache(maxsize=8)
+def _historical_index(effective_from, schedule_generation):
+    # An import in the same second replaces the version at effective_from, so the generation is part of the key
+    return OutageIndex(get_schedules_at(effective_from) if effective_from else {})
+
+def get_stage_at(when):
+    if when >= datetime.now():
+        return get_current_stage()
+    return get_stage_before(to_timestamp(when + timedelta(seconds=1)))
+
+def get_dark_areas(when=None):
+    """Returns (stage, [(area, user_count)]) for every area in outage at `when` (default now)."""
+    when = when or datetime.now()
+    stage = get_stage_at(when)
+    if stage == 0:
+        return stage, []
+    index = get_outage_index()
+    when_ts = to_timestamp(when)
+    last_change = get_last_schedule_change()
+    if last_change and when_ts < last_change:
+        index = _historical_index(get_schedule_version_at(when_ts), get_schedule_generation()) # A past moment under an older schedule
+    areas = index.areas_at(when.hour * 60 + when.minute)
+    counts = get_user_counts_by_area(areas) if areas else {}
+    return stage, [(area, counts.get(area, 0)) for area in areas]
+
+# --- Outage Range Queries ---
+
+# A moment is in an outage when the schedule version in effect at that moment
+# covers it (see database.get_schedule_at), so slots are clipped to the window
+# in which their version applied.
+
+def _schedule_windows(area, start, end):
+    """[(valid_from, valid_to, compiled_slots)] for the versions of `area` in effect over [start, end)."""
+    valid_from, slots = start, compile_slots(get_schedule_at(area, to_timestamp(start)))
+    windows = []
+    for effective_from, _, new_slots in get_schedule_changes(to_timestamp(start), to_timestamp(end), area):
+        changed_at = from_timestamp(effective_from)
+        if changed_at >= end:
+            break
+        windows.append((valid_from, changed_at, slots))
+        valid_from, slots = changed_at, compile_slots(new_slots)
+    windows.append((valid_from, end, slots))
+    return windows
+
+@lru_cache(maxsize=4096)
+def _expand_day(area, day, generation):
+    """Concrete (start, end) datetimes of every slot starting on `day`, under the versions that applied."""
+    midnight = datetime.combine(day, time.min)
+    intervals = []
+    # Slots starting today can run past midnight, so look two days ahead
+    for valid_from, valid_to, slots in _schedule_windows(area, midnight, midnight + timedelta(days=2)):
+        for start, end in slots:
+            if start == end:
+                continue
+            end_day = midnight if end > start else midnight + timedelta(days=1)
+            lo = max(midnight + timedelta(minutes=start), valid_from)
+            hi = min(end_day + timedelta(minutes=end), valid_to)
+            if lo < hi:
+                intervals.append((lo, hi))
+    intervals.sort()
+    return tuple(intervals)
+
+def _stage_spans(start, end):
+    """Yields (span_start, span_end, stage) covering [start, end) from the stage timeline."""
+    stage = get_stage_before(to_timestamp(start))
+    current = start
+    for timestamp, new_stage in get_stage_history(to_timestamp(start), to_timestamp(end)):
+        changed_at = from_timestamp(timestamp)
+        if changed_at > current:
+            yield current, changed_at, stage
+            current = changed_at
+        stage = new_stage
+    if current < end:
+        # Beyond the last recorded change the current stage carries forward
+        yield current, end, stage
+
+def get_stage_spans(start, end):
+    """[(span_start, span_end, stage)] covering [start, end), e.g. to hand to worker processes."""
+    return list(_stage_spans(start, end))
+
+def outages_between(area, start, end):
+    """Lazily yields (outage_start, outage_end, stage) for `area` within [start, end) while the stage is above 0."""
+    generation = get_schedule_generation()
+    spans = _stage_spans(start, end)
+    span = next(spans, None)
+
+    # Start a day early to catch slots that cross midnight into the range
+    day = start.date() - timedelta(days=1)
+    while span and day <= end.date():
+        for slot_start, slot_end in _expand_day(area, day, generation):
+            lo, hi = max(slot_start, start), min(slot_end, end)
+            # Walk the stage spans overlapping this slot
+            while span and lo < hi:
+                span_start, span_end, stage = span
+                if span_end <= lo:
+                    span = next(spans, None)
+                    continue
+                piece_start, piece_end = max(lo, span_start), min(hi, span_end)
+                if piece_start >= hi:
+                    break
+                if stage > 0 and piece_start < piece_end:
+                    yield piece_start, piece_end, stage
+                lo = piece_end
+        day += timedelta(days=1)
+
+# --- Stage Planner ---
+
+MAX_STAGE = 8
+
+class StagePlan:
+    """Area x stage matrix of daily outage minutes and affected users."""
+    def __init__(self, impact=None, dark_users=None):
+        impact = get_area_impact() if impact is None else impact
+        dark = tuple(row for row in impact if row[1] > 0)
+        dark_users = get_dark_user_count() if dark_users is None else dark_users
+        self.matrix = {stage: dark if stage > 0 else () for stage in range(MAX_STAGE + 1)}
+        self.users = {stage: dark_users if stage > 0 else 0 for stage in range(MAX_STAGE + 1)}
+        self.daily_minutes = {stage: sum(row[1] for row in rows) for stage, rows in self.matrix.items()}
+
+    def preview(self, stage, days=1):
+        """Impact of running `stage` for `days` days: totals plus [(area, outage_hours, users)]."""
+        rows = self.matrix[stage]
+        return {
+            "areas": len(rows),
+            "users": self.users[stage],
+            "hours": self.daily_minutes[stage] * days / 60,
+            "rows": [(area, minutes * days / 60, users) for area, minutes, users in rows]
+        }
+
+# --- Calendar Layout ---
+
+def get_week_blocks(area, week_start):
+    """((day_index, start_minute, end_minute, stage), ...) for the week from `week_start`, cached."""
+    return _week_blocks(area, week_start, get_schedule_generation(), get_stage_generation())
+
+@lru_cache(maxsize=128)
+def _week_blocks(area, week_start, schedule_generation, stage_generation):
+    blocks = []
+    for start, end, stage in outages_between(area, week_start, week_start + timedelta(days=7)):
+        while start < end:
+            midnight = datetime.combine(start.date() + timedelta(days=1), time.min)
+            block_end = min(end, midnight)
+            end_minute = 24 * 60 if block_end == midnight else block_end.hour * 60 + block_end.minute
+            blocks.append(((start - week_start).days, start.hour * 60 + start.minute, end_minute, stage))
+            start = block_end
+    return tuple(blocks)
+
+# --- Heatmap Analytics ---
+
+def get_outage_heatmap(area, start, end):
+    """Read-only 7x24 NumPy array of outage minutes by [weekday, hour]; area=None sums all areas."""
+    return _outage_heatmap(area, start, end, get_schedule_generation(), get_stage_generation())
+
+@lru_cache(maxsize=32)
+def _outage_heatmap(area, start, end, schedule_generation, stage_generation):
+    from heatmap import daily_coverage, weekday_hour_minutes # Optional dependency (NumPy)
+    # One vectorized pass per schedule version in effect over the range
+    changes = sorted({from_timestamp(ts) for ts, _, _ in get_schedule_changes(to_timestamp(start), to_timestamp(end), area)})
+    bounds = [start] + [t for t in changes if t < end] + [end]
+    result = None
+    for segment_start, segment_end in zip(bounds, bounds[1:]):
+        timestamp = to_timestamp(segment_start)
+        if area is None:
+            slots = [slot for area_slots in get_schedules_at(timestamp).values() for slot in compile_slots(area_slots)]
+        else:
+            slots = compile_slots(get_schedule_at(area, timestamp))
+        grid = weekday_hour_minutes(daily_coverage(slots), _stage_spans(segment_start, segment_end), segment_start, segment_end)
+        result = grid if result is None else result + grid
+    result.setflags(write=False) # Shared by every caller of the cache
+    return result
@@ -0,0 +1,92 @@
+import os
+import re
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Schedule CSV Validation ---
+# Kept free of database imports so process-pool workers start cheaply
+# (on Windows each worker re-imports this module).
+
+TIME_SLOT_PATTERN = re.compile(r"^([0-1]?[0-9]|2[0-3]):[0-5][0-9]\s*-\s*([0-1]?[0-9]|2[0-3]):[0-5][0-9]$")
+
+# Files smaller than this are validated in-process; pool start-up would dominate
+PARALLEL_THRESHOLD_BYTES = 4 * 1024 * 1024
+CHUNKS_PER_WORKER = 4
+
+_worker_areas = None
+
+def _init_worker(valid_areas):
+    global _worker_areas
+    _worker_areas = valid_areas
+
+def validate_lines(lines, area_idx, slot_idx, valid_areas):
+    """Returns (line_count, [(line_offset, message)]) for decoded data lines."""
+    errors = []
+    count = 0
+    for offset, row in enumerate(csv.reader(lines)):
+        count += 1
+        if not row:
+            continue # Blank line
+        area = row[area_idx].strip() if area_idx < len(row) else ""
+        time_slot = row[slot_idx].strip() if slot_idx < len(row) else ""
+        if area not in valid_areas:
+            errors.append((offset, f"Unknown area '{area}'"))
+        if not TIME_SLOT_PATTERN.match(time_slot):
+            errors.append((offset, f"Invalid time format '{time_slot}'. Expected HH:MM - HH:MM"))
+    return count, errors
+
+def _validate_chunk(file_path, start, end, area_idx, slot_idx):
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.decode("utf-8").split("\n")
+    if lines and lines[-1] == "":
+        lines.pop() # Chunks end just after a newline
+    return validate_lines(lines, area_idx, slot_idx, _worker_areas)
+
+def _read_header(file_path):
+    with open(file_path, "rb") as f:
+        header_line = f.readline()
+        data_start = f.tell()
+    header = next(csv.reader([header_line.decode("utf-8-sig").strip()]), [])
+    return header, data_start
+
+def _chunk_bounds(file_path, data_start, size, chunk_count):
+    """Splits [data_start, size) into byte ranges that end on line boundaries."""
+    chunk_size = max(1, (size - data_start) // chunk_count)
+    bounds = []
+    with open(file_path, "rb") as f:
+        start = data_start
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline() # Advance to the end of the current line
+            end = min(f.tell(), size)
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+def validate_csv_report(file_path, valid_areas, workers=None):
+    """Returns (is_valid, [(row_number, message)]); large files are validated across a process pool."""
+    header, data_start = _read_header(file_path)
+    if "area" not in header or "time_slot" not in header:
+        return False, [(1, "CSV missing 'area' or 'time_slot' columns")]
+    area_idx, slot_idx = header.index("area"), header.index("time_slot")
+
+    size = os.path.getsize(file_path)
+    workers = workers or os.cpu_count() or 1
+    if size < PARALLEL_THRESHOLD_BYTES or workers == 1:
+        _init_worker(valid_areas)
+        results = [_validate_chunk(file_path, data_start, size, area_idx, slot_idx)]
+    else:
+        bounds = _chunk_bounds(file_path, data_start, size, workers * CHUNKS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(valid_areas,)) as pool:
+            futures = [pool.submit(_validate_chunk, file_path, start, end, area_idx, slot_idx) for start, end in bounds]
+            results = [future.result() for future in futures]
+
+    # Re-base each chunk's line offsets onto absolute row numbers
+    errors = []
+    first_row = 2
+    for count, chunk_errors in results:
+        errors.extend((first_row + offset, message) for offset, message in chunk_errors)
+        first_row += count
+    return not errors, errors